@@ -0,0 +1,63 @@
+# === 🎙️ 文字起こしに送る録音の大きさ：そのまま vs 前処理（ネットワーク不要） ===
+#   ① 今までの方式：st.audio_input の WAV をそのまま送る
+#   ② common/audio_prep：前後の無音を削り、モノラル・16kHz にして、WAV（劣化なし）/ MP3 で送る
+# の、送るバイト数・前処理にかかる時間・上り回線（UPLINK_MBPS）での送信時間の目安を比べる。
+# 録音はその場で作る：考えている間の無音（小さな雑音）→ 声の代わりの音（音程が変わる倍音＋抑揚）→ 言い終わってからの無音。
+#   python bench/bench_audio_prep.py > bench_output.txt
+import io
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import audio_prep
+
+UPLINK_MBPS = float(os.environ.get("BENCH_UPLINK_MBPS", 1.0))
+
+def recording(rate, channels, lead, speech, tail, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * speech)) / rate
+    pitch = 180 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6)) * (0.5 + 0.5 * np.abs(np.sin(2 * np.pi * 2.5 * t))) * 0.25
+    x = np.concatenate([np.zeros(int(rate * lead)), voice, np.zeros(int(rate * tail))])
+    x = x + rng.normal(0, 0.002, len(x))   # 部屋の雑音
+    pcm = (np.clip(np.repeat(x[:, None], channels, axis=1), -1, 1) * 32767).astype("<i2").tobytes()
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm)
+    return out.getvalue()
+
+CASES = [
+    ("roleplay answer, 16k mono", 16000, 1, 1.0, 4.0, 1.5),
+    ("kids, long pauses, 16k mono", 16000, 1, 3.0, 1.5, 4.0),
+    ("older widget, 48k stereo", 48000, 2, 1.0, 4.0, 1.5),
+]
+
+def upload_ms(nbytes):
+    return nbytes * 8 / (UPLINK_MBPS * 1e6) * 1000
+
+def main():
+    print(f"uplink={UPLINK_MBPS}Mbps (upload time is bytes / uplink, not measured)")
+    for codec in ["wav", "mp3"]:
+        audio_prep.AUDIO_CODEC = codec
+        for label, rate, channels, lead, speech, tail in CASES:
+            raw = recording(rate, channels, lead, speech, tail)
+            t0 = time.perf_counter()
+            data, mime = audio_prep.prepare(raw)
+            prep = (time.perf_counter() - t0) * 1000
+            report = audio_prep.reports()[-1]
+            print(f"{codec:<4} {label:<30} {len(raw) / 1024:7.1f}KB -> {len(data) / 1024:6.1f}KB ({len(data) / len(raw):4.0%})  "
+                  f"{report['seconds_in']:4.1f}s -> {report['seconds_out']:4.1f}s (speech {speech:.1f}s)  "
+                  f"prep {prep:5.1f}ms  upload {upload_ms(len(raw)):6.0f}ms -> {upload_ms(len(data)):5.0f}ms")
+    print(f"total: {audio_prep.stats()}")
+
+if __name__ == "__main__":
+    main()
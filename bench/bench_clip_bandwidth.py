@@ -0,0 +1,123 @@
+# === ⏱️ 再実行1回あたりの転送バイト数のベンチマーク（ネットワーク不要） ===
+# このファイル自体を Streamlit で動かし（40件の会話の音声を並べるだけのページ。serve.py と同じく st.App でルートを足す）、
+#   ① st.audio(bytes)（今までの方式。/media/... に毎回登録し直す）
+#   ② render_audio（中身のハッシュの URL + ETag + immutable）
+# について、WebSocket で届くメッセージと、ブラウザが音声を取りに行く HTTP のバイト数を再実行ごとに数える。
+# ブラウザのキャッシュは HTTP の規則どおりに真似る（immutable / max-age の間は取りに行かない、ETag があれば条件付き GET）。
+#   python bench/bench_clip_bandwidth.py > bench_output.txt
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+N_MESSAGES = int(os.environ.get("BENCH_MESSAGES", 40))
+CLIP_BYTES = 144 * 200   # 約 4.8 秒ぶんの MP3
+RERUNS = 3
+
+def clip(i):
+    return (bytes.fromhex("fff364c4") + bytes([i % 256]) * 140) * (CLIP_BYTES // 144)
+
+def render_page():
+    import streamlit as st
+    from common.media_routes import render_audio
+    mode = st.query_params.get("mode", "bytes")
+    for i in range(N_MESSAGES):
+        st.write(f"message {i}")
+        if mode == "bytes": st.audio(clip(i), format="audio/mp3")
+        else: render_audio(clip(i))
+
+# ---------- ここから下はベンチマーク本体（ブラウザ役） ----------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def http_get(port, path, headers):
+    with socket.create_connection(("127.0.0.1", port)) as s:
+        extra = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        s.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n{extra}\r\n".encode())
+        raw = b""
+        while True:
+            data = s.recv(65536)
+            if not data: break
+            raw += data
+    head = raw.split(b"\r\n\r\n", 1)[0].decode("latin-1")
+    response_headers = dict(line.split(": ", 1) for line in head.split("\r\n")[1:] if ": " in line)
+    return len(raw), {k.lower(): v for k, v in response_headers.items()}
+
+class BrowserCache:
+    def __init__(self):
+        self.entries = {}   # url -> (etag, fresh)
+
+    def fetch(self, port, url):
+        etag, fresh = self.entries.get(url, (None, False))
+        if fresh: return 0
+        size, headers = http_get(port, url, {"If-None-Match": etag} if etag else {})
+        cache_control = headers.get("cache-control", "")
+        self.entries[url] = (headers.get("etag"), "immutable" in cache_control or "max-age" in cache_control)
+        return size
+
+async def one_session(port, mode):
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    cache, rows = BrowserCache(), []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as ws:
+        for _ in range(RERUNS):
+            back = BackMsg()
+            back.rerun_script.query_string = f"mode={mode}"
+            back.rerun_script.page_script_hash = ""
+            await ws.send(back.SerializeToString())
+            ws_bytes, urls = 0, []
+            while True:
+                raw = await ws.recv()
+                ws_bytes += len(raw)
+                msg = ForwardMsg()
+                msg.ParseFromString(raw)
+                if msg.WhichOneof("type") == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                    element = msg.delta.new_element
+                    if element.WhichOneof("type") == "audio": urls.append(element.audio.url)
+                    elif element.WhichOneof("type") == "markdown": urls += re.findall(r'src="([^"]+)"', element.markdown.body)
+                if msg.WhichOneof("type") == "script_finished": break
+            http_bytes = sum(cache.fetch(port, url) for url in urls)
+            rows.append((ws_bytes, http_bytes, len(urls)))
+    return rows
+
+def main():
+    import asyncio
+    port = free_port()
+    env = dict(os.environ, APP_CACHE_DIR=os.environ.get("APP_CACHE_DIR", "/tmp/bench-clip-cache"))
+    server = subprocess.Popen([sys.executable, "-m", "streamlit", "run", os.path.abspath(__file__), "--server.headless", "true",
+                               "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                if http_get(port, "/_stcore/health", {})[0]: break
+            except OSError:
+                time.sleep(0.1)
+        print(f"messages={N_MESSAGES} clip={CLIP_BYTES} bytes reruns={RERUNS}")
+        for mode, label in [("bytes", "st.audio(bytes)"), ("url", "render_audio (hash URL)")]:
+            for n, (ws_bytes, http_bytes, n_urls) in enumerate(asyncio.run(one_session(port, mode)), 1):
+                print(f"{label:<24} rerun {n}: websocket {ws_bytes:8d} B  audio HTTP {http_bytes:9d} B  ({n_urls} clips)")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ != "__main__":
+    # streamlit run がこのファイルを st.App として読み込んだ時（ページとして動く時の __name__ は "__main__"）
+    import streamlit as st
+    from common.media_routes import routes
+    app = st.App(__file__, routes=routes())
+
+if __name__ == "__main__":
+    try:
+        from streamlit.runtime import exists as running_in_streamlit
+    except ImportError:
+        running_in_streamlit = lambda: False
+    if running_in_streamlit(): render_page()
+    else: main()
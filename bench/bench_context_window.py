@@ -0,0 +1,57 @@
+# === 🪟 1ターンごとに送る履歴の大きさ：件数で切る（直近8件） vs トークンの上限＋要約（ネットワーク不要） ===
+# ロールプレイを TURNS ターン続け、GIVEUP_EVERY ターンごとにギブアップ（長い解説つきの返事）を混ぜる。
+#   ① 今までの方式：直近8件をそのまま送る
+#   ② ConversationMemory：上限（CONTEXT_HISTORY_BUDGET）に収まる直近の分＋それより前の要約
+# の、ターンごとの「履歴＋要約」の見積もりトークン数を比べる。要約は偽物の LLM（LLM_BACKEND=fake）で作り、
+# ユーザーが考えている間に終わる想定で、ターンの間に待つ。
+#   python bench/bench_context_window.py > bench_output.txt
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "fake"
+
+from common.context_window import ConversationMemory
+from common.retrieval import estimate_tokens
+
+TURNS = int(os.environ.get("BENCH_TURNS", 40))
+GIVEUP_EVERY = int(os.environ.get("BENCH_GIVEUP_EVERY", 4))
+
+QUESTION = "[フィードバック]\n- いいですね！\n[英語の質問]\nThat sounds great. What did you do after that, and who were you with? (turn {i})"
+ANSWER = "I went to the park with my sister and we played tennis for two hours. (turn {i})"
+GIVEUP = ("[フィードバック]\n- 直前の質問: What did you do after that? （そのあと何をしましたか？）\n"
+          "- 質問の意図: 出来事の続きを聞いています。\n"
+          + "- 回答例の解説: 過去形 went / played を使い、誰と・どこで・どのくらい を足すと自然になります。" * 12
+          + "\n[リピート練習]\nAfter that, I went to a cafe with my friend and we talked for an hour. (turn {i})")
+
+def conversation():
+    messages = [{"role": "assistant", "content": QUESTION.format(i=0)}]
+    for i in range(1, TURNS + 1):
+        if i % GIVEUP_EVERY == 0:
+            messages.append({"role": "user", "content": "（🏳️ ギブアップして、解説と回答例をリクエストしました）"})
+            messages.append({"role": "assistant", "content": GIVEUP.format(i=i)})
+        else:
+            messages.append({"role": "user", "content": ANSWER.format(i=i)})
+            messages.append({"role": "assistant", "content": QUESTION.format(i=i)})
+        yield messages
+
+def tokens(messages):
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+def main():
+    memory = ConversationMemory()
+    old_sizes, new_sizes = [], []
+    for messages in conversation():
+        old_sizes.append(tokens(messages[-8:]))
+        start = memory.window_start([(m["role"], m["content"]) for m in messages])
+        new_sizes.append(tokens(messages[start:]) + estimate_tokens(memory.summary))
+        memory.wait()   # 要約はユーザーが考えている間に終わる
+    print(f"turns={TURNS} giveup every {GIVEUP_EVERY} turns, budget={memory.budget} tokens")
+    for label, sizes in [("last 8 messages (before)", old_sizes), ("token budget + summary", new_sizes)]:
+        print(f"{label:<26} history tokens per turn: mean {statistics.mean(sizes):7.1f}  max {max(sizes):6d}  "
+              f"last 10 turns mean {statistics.mean(sizes[-10:]):7.1f}")
+    print(f"turns folded into summary: {memory.folded} messages")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# === ⏱️ 内蔵英和辞書のベンチマーク（ネットワーク不要） ===
+# 辞書ツールに来そうな問い合わせを、内蔵辞書（common/dictionary.py）がどれだけ通信なしで答えられるかと、1回あたりの時間を測る。
+#   python bench/bench_dictionary.py > bench_output.txt
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("APP_CACHE_DIR", tempfile.mkdtemp(prefix="dict-bench-"))
+
+from common import dictionary
+
+QUERIES = ["evidence", "Evidence", "went", "studies", "running", "stopped", "children", "happier", "recommend",
+           "comfortable", "neighbours", "promised", "looking forward to", "現在完了形", "used to の使い方", "serendipity"]
+ROUNDS = 20000
+
+def main():
+    t0 = time.perf_counter()
+    d = dictionary.get_dictionary()
+    print(f"index build + open: {(time.perf_counter() - t0) * 1000:.1f}ms  entries={len(d)}  file={os.path.getsize(d.path)} bytes")
+    local = [q for q in QUERIES if dictionary.local_lookup(q)]
+    print(f"answered locally: {len(local)}/{len(QUERIES)}  (LLM only for: {', '.join(q for q in QUERIES if q not in local)})")
+    t0 = time.perf_counter()
+    for i in range(ROUNDS):
+        dictionary.local_lookup(QUERIES[i % len(QUERIES)])
+    print(f"local lookup: {(time.perf_counter() - t0) / ROUNDS * 1e6:.1f}us per query (mean over {ROUNDS})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# === ⏱️ 資料の抜粋（BM25）のベンチマーク（ネットワーク不要） ===
+# 50ページ相当の資料を作り、ロールプレイ1ターンで system_instruction に入る資料のトークン数を
+#   ① 今までの方式：資料の全文
+#   ② common/retrieval.py：直近の会話に関係する段落だけ（上限 TOKEN_BUDGET）
+# で比べる。話題の段落がちゃんと選ばれているか（当たり率）と、索引づくり・検索の時間も出す。
+#   python bench/bench_doc_retrieval.py > bench_output.txt
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import retrieval
+
+TOPICS = {
+    "refund": ["refund", "receipt", "purchase", "return", "store credit"],
+    "shipping": ["shipping", "delivery", "courier", "tracking number", "parcel"],
+    "warranty": ["warranty", "repair", "defect", "replacement", "technician"],
+    "membership": ["membership", "points", "discount", "annual fee", "card"],
+    "hotel": ["check-in", "reservation", "front desk", "room key", "breakfast"],
+    "airport": ["boarding pass", "gate", "luggage", "security check", "passport"],
+    "restaurant": ["menu", "allergy", "table", "waiter", "bill"],
+    "meeting": ["agenda", "deadline", "minutes", "presentation", "client"],
+}
+FILLER = ["The policy applies to every branch in the region.", "Staff should always stay polite and patient.",
+          "Please read the following section carefully before you talk to a customer.",
+          "Exceptions must be approved by a manager.", "Write a short note in the system after each case."]
+PAGES = 50
+
+def make_document(rng):
+    sections = []
+    for page in range(PAGES):
+        topic, words = list(TOPICS.items())[page % len(TOPICS)]
+        sentences = [f"Section {page + 1}: {topic.title()} rules."]
+        for _ in range(14):
+            a, b = rng.sample(words, 2)
+            sentences.append(f"When a customer asks about the {a}, explain the {b} clearly and check the details.")
+            sentences.append(rng.choice(FILLER))
+        sections.append(" ".join(sentences))
+    return "\n\n".join(sections)
+
+def main():
+    rng = random.Random(0)
+    doc = make_document(rng)
+    t0 = time.perf_counter()
+    index = retrieval.get_index(doc)
+    build = time.perf_counter() - t0
+    print(f"document: {PAGES} pages, {len(doc)} chars, ~{retrieval.estimate_tokens(doc)} tokens -> {len(index.passages)} passages "
+          f"(index build {build * 1000:.0f}ms)")
+
+    full, selected, hits, search = [], [], 0, []
+    turns = 40
+    for turn in range(turns):
+        topic, words = rng.choice(list(TOPICS.items()))
+        query = f"I'd like to ask about my {rng.choice(words)}. What about the {rng.choice(words)}?"
+        t0 = time.perf_counter()
+        excerpt = index.select(query)
+        search.append(time.perf_counter() - t0)
+        full.append(retrieval.estimate_tokens(doc))
+        selected.append(retrieval.estimate_tokens(excerpt))
+        hits += any(w in excerpt for w in words)
+    print(f"document tokens per turn: full {statistics.mean(full):8.0f}   BM25 top-k {statistics.mean(selected):6.0f}   "
+          f"({statistics.mean(full) / statistics.mean(selected):.0f}x fewer)")
+    print(f"topic passage included: {hits}/{turns} turns   select(): mean {statistics.mean(search) * 1000:.2f}ms")
+    t0 = time.perf_counter()
+    retrieval.get_index(doc)
+    print(f"index reuse for the same document: {(time.perf_counter() - t0) * 1000:.2f}ms (hash lookup)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# === ⏱️ キッズ：「つぎへ」を押してから、次の質問（と読み上げの音）がそろうまでのベンチマーク（ネットワーク不要） ===
+# 録音が届いてから子供がボタンを押すまで（THINK 秒）の間に、
+#   ① 今までの方式：ボタンを押してから 文字起こし → 次の質問を生成 → 質問とヒントを読み上げ
+#   ② 先読み：録音が届いた時点で 文字起こし と「お手本どおりに言えた時の次の質問＋読み上げ」を始めておき、
+#      ボタンで文字起こしをお手本と比べて、合っていればそのまま使う（違えば①と同じく作り直す）
+# を、偽物の LLM（LLM_BACKEND=fake）とモックの edge-tts サーバーで比べる。
+# 子供が言えた割合（HIT_RATE）の分だけお手本どおりに、残りは違う文を言ったことにする。
+#   python bench/bench_kids_speculation.py > bench_output.txt
+import asyncio
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY", "0.6")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0.05")
+
+from common import llm, speculation, tts, tts_pool
+from common.tts import TTSService, clean_text_for_tts
+from common.tts_store import TTSStore
+from mock_tts_server import start_mock_server
+
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", 10))
+THINK = float(os.environ.get("BENCH_THINK", 1.5))     # 録音が届いてから「つぎへ」を押すまで
+HIT_RATE = float(os.environ.get("BENCH_HIT_RATE", 0.8))
+KIDS_INSTRUCTION = "【厳守フォーマット】XMLタグのみ。\n<ai_en>（英語の質問。1文のみ）</ai_en>..."
+EXPECTED = "Yes, I do."
+
+def fresh_service():
+    tts._service = TTSService(store=TTSStore(tempfile.mkdtemp(prefix="tts-bench-")))
+    return tts._service
+
+def close_service(service):
+    async def close_pool(): await tts_pool.get_pool().close()
+    asyncio.run_coroutine_threadsafe(close_pool(), service._loop).result()
+    service.close()
+
+def child_said(turn):
+    # 偽物の文字起こしの待ち時間はそのままに、子供が言った内容だけ差し替える
+    def transcribe():
+        llm.transcribe(b"RIFF-fake-wav", llm.LITE_MODEL)
+        return EXPECTED if (turn % 10) < HIT_RATE * 10 else "I like bananas."
+    return transcribe
+
+def extract_tag(text, tag):
+    match = re.search(f"<{tag}>(.*?)</{tag}>", text, re.DOTALL)
+    return match.group(1).strip() if match else ""
+
+def make_turn(chat, spoken, turn):
+    res = llm.send_message(chat, f"子供は「{spoken}」と言いました。({turn})")
+    return chat, res
+
+def speak(service, res, wait=True):
+    futures = [service.submit(clean_text_for_tts(text)) for text in
+               (extract_tag(res, "ai_en"), extract_tag(res, "hint_en"))]
+    if wait:
+        for f in futures: f.result()
+
+def sequential(turn):
+    service = fresh_service()
+    chat = llm.start_chat(system_instruction=KIDS_INSTRUCTION)
+    transcribe = child_said(turn)
+    time.sleep(THINK)
+    t0 = time.perf_counter()
+    spoken = transcribe()
+    _, res = make_turn(chat, spoken, turn)
+    speak(service, res)
+    ready = time.perf_counter() - t0
+    close_service(service)
+    return ready, True
+
+def speculative(turn):
+    service = fresh_service()
+    chat = llm.start_chat(system_instruction=KIDS_INSTRUCTION)
+
+    def generate(fork=llm.fork_chat(chat)):
+        fork, res = make_turn(fork, EXPECTED, turn)
+        speak(service, res, wait=False)
+        return fork, res
+
+    spec = speculation.SpeculativeTurn(turn, EXPECTED, child_said(turn), generate)
+    time.sleep(THINK)
+    t0 = time.perf_counter()
+    spoken, spec_turn = spec.resolve()
+    if spec_turn: chat, res = spec_turn
+    else: chat, res = make_turn(chat, spoken, turn)
+    speak(service, res)
+    ready = time.perf_counter() - t0
+    close_service(service)
+    return ready, spec_turn is not None
+
+def main():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    runner, app, url = asyncio.run_coroutine_threadsafe(start_mock_server(first_byte=0.15, audio_delay=0.05), loop).result()
+    tts_pool.WSS_URL = url
+    print(f"rounds={ROUNDS} think={THINK * 1000:.0f}ms hit_rate={HIT_RATE:.0%} llm ttft={llm.FAKE_LATENCY * 1000:.0f}ms tts first_byte=150ms")
+    for label, fn in [("sequential (before)", sequential), ("speculative", speculative)]:
+        rows = [fn(i) for i in range(ROUNDS)]
+        ready = [r[0] for r in rows]
+        hits = [r[0] for r in rows if r[1]]
+        misses = [r[0] for r in rows if not r[1]]
+        line = f"{label:<20} next question ready: mean {statistics.mean(ready) * 1000:7.1f}ms  p50 {statistics.median(ready) * 1000:7.1f}ms"
+        if fn is speculative:
+            line += f"   (used {len(hits)}/{ROUNDS}: {statistics.mean(hits) * 1000 if hits else 0:.1f}ms, " \
+                    f"discarded: {statistics.mean(misses) * 1000 if misses else 0:.1f}ms)"
+        print(line)
+    print(f"speculation stats: {speculation.stats()}")
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# === 🧹 シャドーイング：「AIで英文のみ抽出」で AI に送る量（ネットワーク不要） ===
+#   ① 今までの方式：PDF の文字をまるごと AI に送る
+#   ② 手元でふるい分け：英文・日本語だけ・ページ番号・ヘッダーは手元で決め、迷う行だけを AI に送る
+# の、送るトークン数（見積もり）と、手元の判定が正解とどれくらい合っているかを比べる。
+# 教材の PDF はリポジトリに入っていないので、中学〜高校の英語教科書によくある形（毎ページのヘッダー・ページ番号・
+# 本文・日本語の解説・語句の注・設問）をまねたページを作って使う。
+#   python bench/bench_line_filter.py > bench_output.txt
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY", "0")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0")
+
+from common.line_filter import extract_english, prefilter, token_report
+
+PAGES = int(os.environ.get("BENCH_PAGES", 12))
+
+PEOPLE = ["Emma", "Ken", "Mr. Brown", "Yuki", "Tom", "Aya"]
+PLACES = ["Kyoto", "Hokkaido", "the sea", "my grandmother's house", "a music festival", "Okinawa"]
+WORDS = [("vacation", "休み"), ("temple", "寺"), ("weather", "天気"), ("festival", "祭り"), ("visit", "訪れる"), ("enjoy", "楽しむ")]
+
+# (行, 正解)。正解は "en"（残す）/ "drop"（捨てる）。本文はページごとに変える
+def textbook_page(n):
+    a, b = PEOPLE[n % 6], PEOPLE[(n + 1) % 6]
+    place = PLACES[n % 6]
+    w1, w2 = WORDS[n % 6], WORDS[(n + 3) % 6]
+    return [
+        ("NEW HORIZON English Course 2", "drop"),
+        (f"Unit {n // 3 + 1}  My Summer Vacation", "drop"),
+        ("本文を読んで、あとの問いに答えましょう。", "drop"),
+        (f"{b}: Where did you go during the summer vacation, {a}?", "en"),
+        (f"{a}: I went to {place} with my family. We stayed there for {n % 4 + 2} days.", "en"),
+        (f"{b}: That sounds nice. What did you do in {place}?", "en"),
+        (f"{a}: We walked a lot and took many pictures. It was very hot, but we enjoyed it.", "en"),
+        ("【解説】 過去の出来事は 動詞の過去形（went, took）で表します。", "drop"),
+        ("「〜しましたか」とたずねる時は did を使い、動詞は原形にもどします。", "drop"),
+        ("Words & Phrases", "drop"),
+        (f"{w1[0]} {w1[1]}", "drop"),
+        (f"{w2[0]} {w2[1]}", "drop"),
+        (f"Q1. Where did {a} go?（{a}はどこへ行きましたか）", "en"),
+        ("Q2. 天気はどうでしたか。英語で答えましょう。", "drop"),
+        ("Let's Try! 自分の夏休みについて、ペアで話してみよう。", "drop"),
+        (f"I went to {PLACES[(n + 2) % 6]} with my friends last summer.", "en"),
+        ("© Tokyo Shoseki", "drop"),
+        (f"- {n + 10} -", "drop"),
+    ]
+
+def main():
+    book = [textbook_page(n) for n in range(PAGES)]
+    pages = ["\n".join(line for line, _ in page) for page in book]
+    truth = [label for page in book for _, label in page]
+
+    labeled = prefilter(pages)
+    report = token_report(pages, labeled)
+    sure = [(label, want) for (_, label), want in zip(labeled, truth) if label != "ask"]
+    wrong = sum(1 for label, want in sure if label != want)
+    print(f"pages={PAGES} lines={report['lines']}  en={report.get('en', 0)} drop={report.get('drop', 0)} ask={report.get('ask', 0)}")
+    print(f"local decisions wrong: {wrong} / {len(sure)}")
+    print(f"{'whole text (before)':<24} tokens sent {report['raw_tokens']:6d}")
+    print(f"{'prefilter + ask lines':<24} tokens sent {report['sent_tokens']:6d}  ({report['sent_tokens'] / report['raw_tokens']:.0%})")
+
+    lines, _ = extract_english(pages)
+    print(f"lines kept after asking the (fake) model: {len(lines)}  (sentences in the sample: {truth.count('en')}; "
+          f"the fake model keeps the English part of every asked line, so headings / word lists stay until unchecked)")
+
+if __name__ == "__main__":
+    main()
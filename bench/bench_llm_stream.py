@@ -0,0 +1,45 @@
+# === ⏱️ LLM の「最初の文字が見えるまで」のベンチマーク（ネットワーク不要） ===
+# common/llm.py の偽物バックエンド（LLM_BACKEND=fake）に、最初の文字までの待ちと、かたまりごとの待ちを付けて
+#   ① send_message / generate（全文がそろってから表示する今までの方式）
+#   ② stream_message / stream_generate（st.write_stream で届いた順に表示する方式）
+# の、最初の文字が画面に出るまでの時間と、全文がそろうまでの時間を比べる。
+#   python bench/bench_llm_stream.py > bench_output.txt
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY", "0.6")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0.08")
+
+from common import llm
+
+ROLEPLAY_INSTRUCTION = "【指定フォーマット】[フィードバック] ... [英語の質問] ..."
+EVAL_PROMPT = "あなたは情熱的な発音コーチ。以下の履歴をもとに褒めて総評を出力。" + " This was a good try." * 20
+
+def blocking(fn):
+    t0 = time.perf_counter()
+    text = fn()
+    elapsed = time.perf_counter() - t0
+    return elapsed, elapsed, text
+
+def streaming(stream):
+    for _ in stream: pass
+    return stream.ttft, stream.total, stream.text
+
+def report(label, ttft, total, text):
+    print(f"{label:<34} first text {ttft * 1000:7.1f}ms  full text {total * 1000:7.1f}ms  ({len(text)} chars)")
+
+def main():
+    print(f"fake ttft={llm.FAKE_LATENCY * 1000:.0f}ms chunk_delay={llm.FAKE_CHUNK_DELAY * 1000:.0f}ms")
+    chat = llm.start_chat(system_instruction=ROLEPLAY_INSTRUCTION)
+    report("Roleplay turn, send_message", *blocking(lambda: llm.send_message(chat, "I like hiking.")))
+    report("Roleplay turn, stream_message", *streaming(llm.stream_message(chat, "I like hiking.")))
+    report("Shadowing 総評, generate", *blocking(lambda: llm.generate(EVAL_PROMPT)))
+    report("Shadowing 総評, stream_generate", *streaming(llm.stream_generate(EVAL_PROMPT)))
+    for (kind, model), m in sorted(llm.metrics().items()):
+        print(f"  metrics {kind:<16} {model:<18} calls {m['calls']}  seconds {m['seconds']:.2f}  ttft {m['ttft_seconds']:.2f}")
+
+if __name__ == "__main__":
+    main()
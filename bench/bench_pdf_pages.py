@@ -0,0 +1,81 @@
+# === 📄 PDF の読み込み：全ページまとめて vs ページごと（ネットワーク不要） ===
+#   ① 今までの方式：extract_text_from_pdf（全ページ読み終わってから返す。st.cache_data はファイル全体のバイト列をキーにハッシュ）
+#   ② common/pdf_pages：ページごとに返し、(ハッシュ, ページ) ごとにディスクへ覚える。未読が多い時はプロセスを分けて読む
+# の、最初のページが出るまで・全ページ・2回目（再実行）・ページ範囲だけ の時間を比べる。
+# 教材の PDF はリポジトリに入っていないので、文字だけの PDF をその場で作って使う。
+#   python bench/bench_pdf_pages.py > bench_output.txt
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("PDF_CACHE_DIR", os.path.join(tempfile.mkdtemp(), "pdf"))
+
+import PyPDF2
+
+from common import pdf_pages
+from common.pdf_pages import digest_of, iter_pages
+
+PAGES = int(os.environ.get("BENCH_PAGES", 200))
+LINES = 40
+
+def make_pdf(pages):
+    # 1ページに LINES 行の英文を置いただけの PDF
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for n in range(pages):
+        lines = " ".join(f"(Page {n + 1} line {i}: Ken went to the library and read a book about old trains.) Tj T*" for i in range(LINES))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for off in offsets: out.write(f"{off:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+def whole_file(data):
+    # pages/*.py の元の extract_text_from_pdf と同じ（st.cache_data はキーを作るためにバイト列をハッシュする）
+    hashlib.sha256(data).hexdigest()
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return "".join([page.extract_text() + "\n" for page in reader.pages])
+
+def streamed(data, file_id, first=0, last=None):
+    t0 = time.perf_counter()
+    first_page = None
+    for _ in iter_pages(data, digest_of(data, file_id), first, last):
+        if first_page is None: first_page = time.perf_counter() - t0
+    return first_page, time.perf_counter() - t0
+
+def main():
+    data = make_pdf(PAGES)
+    print(f"pages={PAGES} size={len(data) / 1024:.0f}KB workers={pdf_pages.PDF_WORKERS} (cpus={os.cpu_count()})")
+
+    t0 = time.perf_counter()
+    whole_file(data)
+    total = time.perf_counter() - t0
+    print(f"{'whole file (before)':<30} first page {total:6.2f}s  all pages {total:6.2f}s")
+    t0 = time.perf_counter()
+    hashlib.sha256(data).hexdigest()
+    print(f"{'  rerun: hash bytes again':<30} {(time.perf_counter() - t0) * 1000:8.2f}ms per rerun (before parsing is cached)")
+
+    first, total = streamed(data, "upload-1", 0, 9)
+    print(f"{'per page, pages 1-10 only':<30} first page {first:6.2f}s  all pages {total:6.2f}s")
+    first, total = streamed(data, "upload-1")
+    print(f"{'per page, cold (1-10 cached)':<30} first page {first:6.2f}s  all pages {total:6.2f}s")
+    first, total = streamed(data, "upload-1")
+    print(f"{'per page, rerun (cached)':<30} first page {first:6.2f}s  all pages {total:6.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# === ⏱️ ロールプレイ：「会話を終了して評価をもらう」から復習リストが出るまで（ネットワーク不要） ===
+#   ① 今までの方式：評価を流し終わってから、集めた [英語の質問] をまとめて1回で翻訳
+#   ② 裏で翻訳：質問が届くたびに翻訳用の実行役（common/lookup_cache）で訳しておき、終了時は評価だけ（訳し残しは評価と同時に、まとめて1回待つ）
+# を、偽物の LLM（LLM_BACKEND=fake）で比べる。会話中のターンの間（THINK 秒）に裏の翻訳が進む想定。
+#   python bench/bench_review_ready.py > bench_output.txt
+import concurrent.futures
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY", "0.6")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0.05")
+
+from common import llm
+from common.lookup_cache import _executor
+
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", 3))
+QUESTIONS = int(os.environ.get("BENCH_QUESTIONS", 12))
+THINK = float(os.environ.get("BENCH_THINK", 0.1))   # 返事が届いてから次に話すまで（短めにして、最後の質問の訳が残るようにする）
+INSTRUCTION = "【指定フォーマット】\n[フィードバック]\n- ...\n[英語の質問]\n..."
+
+def session(round_no, translate_early):
+    chat = llm.start_chat(system_instruction=INSTRUCTION)
+    questions, jobs = [], {}
+    for i in range(QUESTIONS):
+        q = llm.send_message(chat, f"answer {round_no}-{i}").split("[英語の質問]")[1].strip() + f" ({round_no}-{i})"
+        questions.append(q)
+        if translate_early: jobs[q] = _executor.submit(llm.generate, f"以下を日本語に翻訳して:\n{q}", llm.DEFAULT_MODEL)
+        time.sleep(THINK)
+    t0 = time.perf_counter()
+    stream = llm.stream_message(chat, "会話を終了します。本日の評価を出力してください。")
+    for _ in stream: pass
+    if translate_early:
+        concurrent.futures.wait(jobs.values(), timeout=llm.TIMEOUT)
+        review = [(q, jobs[q].result(0)) for q in questions]
+    else:
+        res = llm.generate("以下の英文を日本語に翻訳してください。\n\n" + "\n".join(questions))
+        review = [(q, res) for q in questions]
+    return time.perf_counter() - t0, len(review)
+
+def main():
+    print(f"rounds={ROUNDS} questions={QUESTIONS} llm ttft={llm.FAKE_LATENCY * 1000:.0f}ms")
+    for label, early in [("summary then batch (before)", False), ("background per question", True)]:
+        times = [session(r, early)[0] for r in range(ROUNDS)]
+        print(f"{label:<28} end click -> review ready: mean {statistics.mean(times) * 1000:7.1f}ms  p50 {statistics.median(times) * 1000:7.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# === ⏱️ シャドーイング：長いスクリプトの「1文ずつ」分割の待ち時間（ネットワーク不要） ===
+#   ① 今までの方式：スクリプト全体を1回の generate で分割＋和訳
+#   ② ブロックごとに並列：split_script_into_blocks と同じ要領で手元でブロックに分け、並列で分割して順番どおりに並べる
+# を、偽物の LLM（LLM_BACKEND=fake。返事が長いほど時間がかかる）で比べる。
+# ②では、最初のブロックが画面に出るまでの時間と、1ブロックだけ極端に遅い時（SPLIT_TIMEOUT で手元の分割に切り替え）も測る。
+#   python bench/bench_script_split.py > bench_output.txt
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY", "0.6")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0.03")
+
+from common import script_split
+from common.script_split import SPLIT_BLOCK_WORDS, ai_chunks, split_in_parallel
+from common.tts import split_sentences
+
+SENTENCES = int(os.environ.get("BENCH_SENTENCES", 60))
+SCRIPT = " ".join(f"In chapter {i}, the small robot walked to the old library and asked the librarian about the history of the town."
+                  for i in range(SENTENCES))
+
+def blocks_of(text, max_words):
+    # pages/2_Shadowing.py の split_script_into_blocks と同じ区切り方
+    blocks, current, count = [], [], 0
+    for s in split_sentences(text):
+        words = len(s.split())
+        if count + words > max_words and current:
+            blocks.append(" ".join(current))
+            current, count = [s], words
+        else:
+            current.append(s)
+            count += words
+    if current: blocks.append(" ".join(current))
+    return blocks
+
+def main():
+    words = len(SCRIPT.split())
+    print(f"script={words} words, block={SPLIT_BLOCK_WORDS} words, workers={script_split.SPLIT_WORKERS}")
+
+    t0 = time.perf_counter()
+    chunks = ai_chunks(SCRIPT)
+    print(f"{'single call (before)':<30} all chunks {time.perf_counter() - t0:6.2f}s  chunks={len(chunks)}")
+
+    blocks = blocks_of(SCRIPT, SPLIT_BLOCK_WORDS)
+    first = {}
+    def on_progress(results):
+        if results[0] is not None: first.setdefault("t", time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    chunks, fallbacks = split_in_parallel(blocks, on_progress)
+    print(f"{'parallel blocks':<30} all chunks {time.perf_counter() - t0:6.2f}s  first block on screen {first['t']:5.2f}s  "
+          f"chunks={len(chunks)} blocks={len(blocks)} local fallback={fallbacks}")
+
+    def one_slow_block(block):
+        if block is blocks[-1]: time.sleep(30)
+        return ai_chunks(block)
+    t0 = time.perf_counter()
+    chunks, fallbacks = split_in_parallel(blocks, timeout=8, split_block=one_slow_block)
+    print(f"{'parallel, one block hangs':<30} all chunks {time.perf_counter() - t0:6.2f}s  chunks={len(chunks)} local fallback={fallbacks}")
+    os._exit(0)   # 止まったままのブロックを待たずに終える
+
+if __name__ == "__main__":
+    main()
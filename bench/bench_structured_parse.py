@@ -0,0 +1,81 @@
+# === 🧩 モデルの答えの読み取り：今までのバラバラな読み取り vs common/structured（ネットワーク不要） ===
+# 実際に起きやすい崩れ方（```json で囲まれる / 途中で切れる / 余計な前置き / 値の中に ] や , がある）をした答えを作り、
+#   ① 今までの方式：re.search(r'\[.*\]') + json.loads、"英語 || 日本語" の行分け、<タグ> の extract_tag
+#   ② JSONScanner：1回なめて、閉じ終わった要素・項目だけ拾う
+# で、何件の答えから何項目を取り出せたか・1回あたりの時間を比べる。
+#   python bench/bench_structured_parse.py > bench_output.txt
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.structured import KidsTurn, Pair, parse
+
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", 2000))
+WORDS = [{"en": w, "ja": f"（{w}）"} for w in ["dog", "cat", "bird", "fish", "lion", "tiger", "rabbit", "horse"]]
+TURN = {"ai_en": "Do you like apples, [Ken]?", "ai_ja": "りんご は すき？", "hint_en": "Yes, I do.", "hint_ja": "うん、すきだよ。",
+        "ai_ruby": "Do(ドゥ) you(ユー) like(ライク) apples(アップルズ)?", "hint_ruby": "Yes(イエス), I(アイ) do(ドゥ)."}
+
+def word_cases():
+    full = json.dumps(WORDS, ensure_ascii=False)
+    return {
+        "clean": full,
+        "fenced": f"```json\n{full}\n```",
+        "preamble [x]": f"はい、[8個]作りました。\n{full}",
+        "truncated": full[:len(full) * 2 // 3],
+        "comma in value": json.dumps(WORDS[:3] + [{"en": "ice cream", "ja": "アイス, クリーム"}], ensure_ascii=False),
+    }
+
+def turn_cases():
+    full = json.dumps(TURN, ensure_ascii=False)
+    return {
+        "clean": full,
+        "fenced": f"```json\n{full}\n```",
+        "truncated ruby": full[:full.index('"hint_ruby"') + 20],
+        "legacy xml": "".join(f"<{k}>{v}</{k}>" for k, v in TURN.items()),
+    }
+
+def old_words(text):
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    try:
+        return json.loads(match.group(0)) if match else []
+    except ValueError:
+        return []
+
+def old_turn(text):
+    # 今までの extract_tag を6回（JSON で返ってきたら何も取れない）
+    out = {}
+    for tag in TURN:
+        match = re.search(f"<{tag}>(.*?)</{tag}>", text, re.DOTALL)
+        out[tag] = match.group(1).strip() if match else ""
+    return out if out["ai_en"] and out["hint_en"] else None
+
+def new_words(text):
+    return parse(text, Pair, many=True)[0]
+
+def new_turn(text):
+    return parse(text, KidsTurn)[0]
+
+def timed(fn, text):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = fn(text)
+    return result, (time.perf_counter() - started) / ROUNDS * 1e6
+
+def main():
+    print(f"rounds={ROUNDS}")
+    print(f"{'case':<22} {'old items':>10} {'old µs':>8} {'new items':>10} {'new µs':>8}")
+    for name, text in word_cases().items():
+        old, old_us = timed(old_words, text)
+        new, new_us = timed(new_words, text)
+        print(f"{'words: ' + name:<22} {len(old):>10} {old_us:>8.1f} {len(new):>10} {new_us:>8.1f}")
+    for name, text in turn_cases().items():
+        old, old_us = timed(old_turn, text)
+        new, new_us = timed(new_turn, text)
+        print(f"{'kids: ' + name:<22} {'ok' if old else 'NG':>10} {old_us:>8.1f} {'ok' if new else 'NG':>10} {new_us:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# === ⏱️ コネクションプールのベンチマーク（ネットワーク不要） ===
+# bench/mock_tts_server.py を同じプロセスで立ち上げ、
+#   ① edge_tts.Communicate（1回ごとに接続し直す今までの方式）
+#   ② common/tts_pool.py の EdgeTTSPool（接続を使い回す）
+# のレイテンシと接続回数、途中で接続が切れた時の回復を比べる。
+#   python bench/bench_tts_pool.py > bench_output.txt
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import edge_tts
+import edge_tts.communicate
+from common.tts_pool import EdgeTTSPool
+from mock_tts_server import start_mock_server
+
+N_REQUESTS = int(os.environ.get("BENCH_REQUESTS", 30))
+CONNECT_DELAY = float(os.environ.get("BENCH_CONNECT_DELAY", 0.15))
+VOICE = "en-US-AriaNeural"
+TEXTS = [f"Would you like some fries with your burger number {i}?" for i in range(N_REQUESTS)]
+
+async def communicate_once(text):
+    audio = []
+    async for chunk in edge_tts.Communicate(text, VOICE, rate="+0%").stream():
+        if chunk["type"] == "audio": audio.append(chunk["data"])
+    return b"".join(audio)
+
+def report(label, latencies, total, stats):
+    print(f"{label:<34} total {total:6.2f}s  mean {statistics.mean(latencies) * 1000:7.1f}ms  "
+          f"p50 {statistics.median(latencies) * 1000:7.1f}ms  server connections {stats['connections']:3d}")
+
+async def timed(fn, text):
+    t0 = time.perf_counter()
+    await fn(text)
+    return time.perf_counter() - t0
+
+async def run_sequential(label, fn, app):
+    app["stats"].update(connections=0, requests=0, dropped=0)
+    t0 = time.perf_counter()
+    latencies = [await timed(fn, t) for t in TEXTS]
+    report(label, latencies, time.perf_counter() - t0, app["stats"])
+
+async def run_concurrent(label, fn, app, limit=4):
+    app["stats"].update(connections=0, requests=0, dropped=0)
+    sem = asyncio.Semaphore(limit)
+    async def one(t):
+        async with sem: return await timed(fn, t)
+    t0 = time.perf_counter()
+    latencies = await asyncio.gather(*(one(t) for t in TEXTS))
+    report(label, latencies, time.perf_counter() - t0, app["stats"])
+
+async def main():
+    runner, app, url = await start_mock_server(connect_delay=CONNECT_DELAY)
+    # Communicate は WSS_URL の後ろに "&ConnectionId=..." を足すので、クエリ付きの URL にしておく
+    edge_tts.communicate.WSS_URL = f"{url}?TrustedClientToken=mock"
+    print(f"requests={N_REQUESTS} connect_delay={CONNECT_DELAY * 1000:.0f}ms (TLS + WebSocket handshake stand-in)")
+
+    pool = EdgeTTSPool(size=4, url=url)
+    await run_sequential("Communicate, sequential", communicate_once, app)
+    await run_sequential("EdgeTTSPool, sequential", lambda t: pool.synthesize(t, VOICE, "+0%"), app)
+    await run_concurrent("Communicate, 4 concurrent", communicate_once, app)
+    await run_concurrent("EdgeTTSPool, 4 concurrent", lambda t: pool.synthesize(t, VOICE, "+0%"), app)
+    print(f"pool stats: {pool.stats}")
+    await pool.close()
+    await runner.cleanup()
+
+    # サーバーが 5 リクエストに1回、接続を切る場合
+    runner, app, url = await start_mock_server(connect_delay=CONNECT_DELAY, fail_every=5)
+    pool = EdgeTTSPool(size=2, url=url)
+    ok = 0
+    for t in TEXTS:
+        try:
+            audio, words = await pool.synthesize(t, VOICE, "+0%")
+            ok += bool(audio and words)
+        except Exception as e:
+            print(f"  failed: {e!r}")
+    print(f"with dropped connections: {ok}/{N_REQUESTS} ok, server dropped {app['stats']['dropped']}, pool stats {pool.stats}")
+    await pool.close()
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
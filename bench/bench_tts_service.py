@@ -0,0 +1,94 @@
+# === ⏱️ TTS マイクロベンチマーク ===
+# 旧 get_tts_audio（呼ぶたびに new_event_loop ＋ bytes の +=）と、
+# 常駐ループの TTSService（Future ＋ チャンクを join）を、偽の edge-tts で比べる。
+# ネットワークは使わない。使い方: python bench/bench_tts_service.py > bench_output.txt
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TTS_POOL", "0")  # 偽の Communicate だけを通す
+
+import edge_tts
+from common.tts import TTSService
+from common.tts_store import TTSStore
+
+N_TEXTS = int(os.environ.get("BENCH_TEXTS", 30))
+CHUNKS_PER_CLIP = int(os.environ.get("BENCH_CHUNKS", 120))   # 1チャンク ≒ 0.1 秒ぶんの MP3
+CHUNK_BYTES = 720
+LATENCY = float(os.environ.get("BENCH_LATENCY", 0.002))     # 1チャンクごとの擬似的な通信待ち
+
+class FakeCommunicate:
+    def __init__(self, text, voice, rate="+0%", **kwargs):
+        self.text = text
+    async def stream(self):
+        payload = b"\xff" * CHUNK_BYTES
+        for _ in range(CHUNKS_PER_CLIP):
+            await asyncio.sleep(LATENCY)
+            yield {"type": "audio", "data": payload}
+
+# ベースライン時点の pages/*.py にあった実装そのまま（@st.cache_data だけ外したもの）
+def legacy_get_tts_audio(text, voice="en-US-AriaNeural", rate="+0%"):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    async def _generate():
+        communicate = edge_tts.Communicate(text, voice, rate=rate)
+        audio_data = b""
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio_data += chunk["data"]
+        return audio_data
+    result = loop.run_until_complete(_generate())
+    loop.close()
+    return result
+
+# service 側の peak は、全クリップの結果を Future に持ったままの値（legacy は1本ずつ捨てている）
+def measure(label, fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    total = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:8.3f}s  {N_TEXTS / elapsed:7.1f} clips/s  peak {peak / 1024:9.1f} KiB  audio {total / 1024:8.1f} KiB")
+
+def main():
+    edge_tts.Communicate = FakeCommunicate
+    texts = [f"Sentence number {i} for the benchmark." for i in range(N_TEXTS)]
+    print(f"clips={N_TEXTS} chunks/clip={CHUNKS_PER_CLIP} chunk={CHUNK_BYTES}B latency/chunk={LATENCY * 1000:.1f}ms")
+
+    measure("legacy (sequential)", lambda: sum(len(legacy_get_tts_audio(t)) for t in texts))
+
+    for concurrency in (1, 4, 8):
+        with tempfile.TemporaryDirectory() as d:
+            service = TTSService(store=TTSStore(d), max_concurrency=concurrency)
+            def run():
+                futures = [service.submit(t) for t in texts]
+                return sum(len(f.result()) for f in futures)
+            measure(f"service (concurrency={concurrency})", run)
+            service.close()
+
+    # 連結だけの比較（長い全文音声ほど差が出る）
+    payload = b"\xff" * CHUNK_BYTES
+    def concat_plus():
+        data = b""
+        for _ in range(CHUNKS_PER_CLIP * 10): data += payload
+        return len(data)
+    def concat_join():
+        parts = []
+        for _ in range(CHUNKS_PER_CLIP * 10): parts.append(payload)
+        return len(b"".join(parts))
+    for label, fn in (("concat bytes +=", concat_plus), ("concat list + join", concat_join)):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:<28} {elapsed * 1000:8.2f}ms  peak {peak / 1024:9.1f} KiB")
+
+if __name__ == "__main__":
+    main()
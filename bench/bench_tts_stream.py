@@ -0,0 +1,68 @@
+# === ⏱️ 全文再生の「最初の音が出るまで」のベンチマーク（ネットワーク不要） ===
+# bench/mock_tts_server.py を立ち上げ、10文の台本について
+#   ① get_long_tts_audio（全部そろってから st.audio に渡す今までの方式）
+#   ② TTSService.stream（メディアルートが返すのと同じ、届いた順に流す方式）
+# の「最初のバイトが手に入るまで」と「最後のバイトまで」を比べる。毎回まっさらなストアで測る。
+#   python bench/bench_tts_stream.py > bench_output.txt
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import tts, tts_pool
+from common.tts import TTSService
+from common.tts_store import TTSStore
+from mock_tts_server import start_mock_server
+
+N_SENTENCES = int(os.environ.get("BENCH_SENTENCES", 10))
+FIRST_BYTE = float(os.environ.get("BENCH_FIRST_BYTE", 0.15))
+AUDIO_DELAY = float(os.environ.get("BENCH_AUDIO_DELAY", 0.05))   # 240ms ぶんの音声ごとの合成待ち
+SCRIPT = " ".join(f"Sentence number {i} is a little longer so that the voice has something to say." for i in range(N_SENTENCES))
+
+def fresh_service():
+    return TTSService(store=TTSStore(tempfile.mkdtemp(prefix="tts-bench-")))
+
+async def close_pool():
+    await tts_pool.get_pool().close()
+
+async def close_service(service):
+    # モックサーバーを止める前に、サービスのループ側で張った接続も閉じておく
+    await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(close_pool(), service._loop))
+    service.close()
+
+async def run_buffered():
+    tts._service = fresh_service()
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    audio = await loop.run_in_executor(None, tts.get_long_tts_audio, SCRIPT)
+    elapsed = time.perf_counter() - t0
+    await close_service(tts._service)
+    return elapsed, elapsed, len(audio)
+
+async def run_streaming():
+    service = fresh_service()
+    t0 = time.perf_counter()
+    first, size = None, 0
+    async for chunk in service.stream(SCRIPT):
+        if first is None: first = time.perf_counter() - t0
+        size += len(chunk)
+    elapsed = time.perf_counter() - t0
+    await close_service(service)
+    await close_pool()
+    return first, elapsed, size
+
+async def main():
+    runner, app, url = await start_mock_server(connect_delay=0.15, first_byte=FIRST_BYTE, audio_delay=AUDIO_DELAY)
+    tts_pool.WSS_URL = url
+    print(f"sentences={N_SENTENCES} first_byte={FIRST_BYTE * 1000:.0f}ms audio_delay={AUDIO_DELAY * 1000:.0f}ms per 240ms of audio")
+    for label, fn in [("buffered (st.audio bytes)", run_buffered), ("streaming (media route)", run_streaming)]:
+        first, total, size = await fn()
+        print(f"{label:<28} first byte {first * 1000:7.1f}ms  last byte {total * 1000:7.1f}ms  {size:7d} bytes")
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+# === ⏱️ 「話し終わってから、相手の声が聞こえ始めるまで」のベンチマーク（ネットワーク不要） ===
+# 文字起こし → 返事の生成 → 読み上げ を、偽物の LLM（LLM_BACKEND=fake）とモックの edge-tts サーバーでつなぎ、
+#   ① 今までの方式：返事が全部そろってから [英語の質問] を切り出し、まるごと合成して再生
+#   ② パイプライン：返事を流しながら ReplySpeaker が言い終わった文から合成し、stream_feed で流す
+# の、最初の音声バイトが手に入るまでの時間を比べる（ブラウザへの送信と再実行の時間は含まない）。
+#   python bench/bench_voice_latency.py > bench_output.txt
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("LLM_FAKE_LATENCY", "0.5")
+os.environ.setdefault("LLM_FAKE_CHUNK_DELAY", "0.06")
+
+from common import llm, tts, tts_pool
+from common.tts import ReplySpeaker, TTSService, clean_text_for_tts
+from common.tts_store import TTSStore
+from mock_tts_server import start_mock_server
+
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", 5))
+MARKERS = ["[英語の質問]", "[リピート練習]"]
+ROLEPLAY_INSTRUCTION = "【指定フォーマット】\n[フィードバック]\n- ...\n[英語の質問]\n..."
+
+def fresh_service():
+    tts._service = TTSService(store=TTSStore(tempfile.mkdtemp(prefix="tts-bench-")))
+    return tts._service
+
+def close_service(service):
+    async def close_pool(): await tts_pool.get_pool().close()
+    asyncio.run_coroutine_threadsafe(close_pool(), service._loop).result()
+    service.close()
+
+def sequential(turn):
+    service = fresh_service()
+    t0 = time.perf_counter()
+    user_text = llm.transcribe(b"RIFF-fake-wav")
+    reply = llm.send_message(llm.start_chat(system_instruction=ROLEPLAY_INSTRUCTION), f"{user_text} ({turn})")
+    english = reply.split("[英語の質問]")[1].strip()
+    service.submit(clean_text_for_tts(english)).result()
+    first_sound = time.perf_counter() - t0
+    close_service(service)
+    return first_sound, first_sound
+
+def pipelined(turn):
+    service = fresh_service()
+    speaker = ReplySpeaker(MARKERS)
+    result = {}
+
+    async def consume():
+        async for _ in service.stream_feed(speaker.feed):
+            result.setdefault("first_sound", time.perf_counter() - t0)
+        await tts_pool.get_pool().close()
+
+    consumer = threading.Thread(target=lambda: asyncio.run(consume()))
+    t0 = time.perf_counter()
+    consumer.start()
+    user_text = llm.transcribe(b"RIFF-fake-wav")
+    for piece in llm.stream_message(llm.start_chat(system_instruction=ROLEPLAY_INSTRUCTION), f"{user_text} ({turn})"):
+        speaker.add(piece)
+    speaker.finish()
+    text_done = time.perf_counter() - t0
+    consumer.join()
+    close_service(service)
+    return result["first_sound"], text_done
+
+def main():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    runner, app, url = asyncio.run_coroutine_threadsafe(start_mock_server(first_byte=0.15, audio_delay=0.05), loop).result()
+    tts_pool.WSS_URL = url
+    print(f"rounds={ROUNDS} llm ttft={llm.FAKE_LATENCY * 1000:.0f}ms chunk={llm.FAKE_CHUNK_DELAY * 1000:.0f}ms tts first_byte=150ms")
+    for label, fn in [("sequential (before)", sequential), ("pipelined LLM -> TTS", pipelined)]:
+        rows = [fn(i) for i in range(ROUNDS)]
+        sound = [r[0] for r in rows]
+        text = [r[1] for r in rows]
+        print(f"{label:<22} partner starts speaking: mean {statistics.mean(sound) * 1000:7.1f}ms  "
+              f"p50 {statistics.median(sound) * 1000:7.1f}ms   (reply text complete at {statistics.mean(text) * 1000:7.1f}ms)")
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# === 🧪 edge-tts のローカル代役（WebSocket）サーバー ===
+# 本物と同じ形のメッセージ（turn.start / audio.metadata / audio / turn.end）を返すので、
+# edge_tts.Communicate もコネクションプール（common/tts_pool.py）もそのまま向けられる。
+# 接続のたびの TLS + WebSocket ハンドシェイクの重さは --connect-delay で、
+# 途中で切れる接続は --fail-every で、合成しながら少しずつ届く音声は --audio-delay で再現する。
+#   python bench/mock_tts_server.py --port 8765
+#   EDGE_TTS_WSS_URL=ws://127.0.0.1:8765/tts streamlit run app.py
+import argparse
+import asyncio
+import json
+import re
+import uuid
+
+from aiohttp import WSMsgType, web
+
+# MPEG-2 Layer III / 24kHz / 48kbps の無音フレーム（144 バイト = 24ms）
+SILENT_FRAME = bytes.fromhex("fff364c4") + b"\x00" * 140
+FRAMES_PER_MESSAGE = 10
+WORD_SECONDS = 0.3
+
+def _parse(raw):
+    sep = raw.find("\r\n\r\n")
+    headers = dict(line.split(":", 1) for line in raw[:sep].split("\r\n") if ":" in line)
+    return headers, raw[sep + 4:]
+
+def _text_message(request_id, path, body):
+    return f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\nPath:{path}\r\n\r\n{body}"
+
+def _audio_message(request_id, payload):
+    header = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nX-StreamId:{uuid.uuid4().hex}\r\nPath:audio\r\n".encode()
+    return len(header).to_bytes(2, "big") + header + payload
+
+async def handle(request):
+    app = request.app
+    cfg, stats = app["cfg"], app["stats"]
+    await asyncio.sleep(cfg["connect_delay"])  # TLS + WebSocket ハンドシェイク相当
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    stats["connections"] += 1
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT: continue
+        headers, body = _parse(msg.data)
+        if headers.get("Path") != "ssml": continue
+        stats["requests"] += 1
+        if cfg["fail_every"] and stats["requests"] % cfg["fail_every"] == 0:
+            stats["dropped"] += 1
+            await ws.close()
+            break
+        request_id = headers.get("X-RequestId", uuid.uuid4().hex)
+        text = re.sub(r"<[^>]+>", "", body)
+        words = re.findall(r"[\w']+", text)
+        await asyncio.sleep(cfg["first_byte"])  # 合成が始まるまでの待ち
+        await ws.send_str(_text_message(request_id, "turn.start", "{}"))
+        for i, word in enumerate(words):
+            meta = {"Metadata": [{"Type": "WordBoundary", "Data": {
+                "Offset": int(i * WORD_SECONDS * 1e7), "Duration": int(WORD_SECONDS * 0.8 * 1e7),
+                "text": {"Text": word, "Length": len(word), "BoundaryType": "WordBoundary"}}}]}
+            await ws.send_str(_text_message(request_id, "audio.metadata", json.dumps(meta)))
+        n_frames = int(len(words) * WORD_SECONDS / 0.024) + 1
+        for start in range(0, n_frames, FRAMES_PER_MESSAGE):
+            await ws.send_bytes(_audio_message(request_id, SILENT_FRAME * min(FRAMES_PER_MESSAGE, n_frames - start)))
+            if cfg["audio_delay"]: await asyncio.sleep(cfg["audio_delay"])  # 次のチャンクが合成されるまでの待ち
+        await ws.send_str(_text_message(request_id, "turn.end", "{}"))
+    return ws
+
+def make_app(connect_delay=0.15, first_byte=0.03, fail_every=0, audio_delay=0.0):
+    app = web.Application()
+    app["cfg"] = {"connect_delay": connect_delay, "first_byte": first_byte, "fail_every": fail_every, "audio_delay": audio_delay}
+    app["stats"] = {"connections": 0, "requests": 0, "dropped": 0}
+    app.router.add_get("/tts", handle)
+    return app
+
+async def start_mock_server(port=0, **cfg):
+    # ベンチマークから同じプロセス内で立ち上げる用。(runner, app, url) を返す
+    app = make_app(**cfg)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, app, f"ws://127.0.0.1:{port}/tts"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connect-delay", type=float, default=0.15)
+    parser.add_argument("--first-byte", type=float, default=0.03)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--audio-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(make_app(args.connect_delay, args.first_byte, args.fail_every, args.audio_delay), host="127.0.0.1", port=args.port)
@@ -0,0 +1 @@
+# 全ページ（pages/*.py）で共有する部品置き場
@@ -0,0 +1,126 @@
+import collections
+import io
+import os
+import threading
+import time
+import wave
+
+# === 🎙️ 文字起こしの前に、録音を小さくする（前後の無音を削る・モノラル・16kHz・圧縮） ===
+# st.audio_input の録音は WAV のまま Gemini に送っていた。話し始めるまでの間や、言い終わってからの無音も全部入る
+# （キッズは特に、考えている間の無音が長い）。Streamlit の版やブラウザによっては 44.1 / 48kHz のこともある。
+# 文字起こしには 16kHz のモノラルで十分なので、送る前に
+#   ① 20ms ごとの音の大きさ（RMS）で、声のある区間の前後だけを残す（少し余白をつける）
+#   ② チャンネルを平均してモノラルに、16kHz に間引く（先にローパスをかけて折り返しを防ぐ）
+#   ③ AUDIO_CODEC=wav（そのまま・劣化なし） / mp3（lameenc。さらに数分の1）
+# にする。numpy が無い・WAV として読めない録音は、そのまま送る。
+# 1回ごとの 送る前 / 送った バイト数は reports() / stats() で見られる（usage の台帳にも bytes_in / bytes として両方残る）。
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import lameenc
+except ImportError:
+    lameenc = None
+
+ENABLED = os.environ.get("AUDIO_PREP", "1") != "0"
+TARGET_RATE = 16000
+AUDIO_CODEC = os.environ.get("AUDIO_CODEC", "wav")          # wav / mp3
+MP3_KBPS = int(os.environ.get("AUDIO_MP3_KBPS", 32))
+FRAME_SECONDS = 0.02
+PAD_SECONDS = float(os.environ.get("AUDIO_TRIM_PAD", 0.25))   # 声の前後に残す余白（語頭・語尾の子音を切らない）
+FLOOR_DB = -50.0                                             # これより小さい音は、雑音の大きさに関係なく無音
+ABOVE_NOISE_DB = 12.0                                        # 雑音の大きさ（静かな方から1割のフレーム）よりこれだけ大きければ声
+
+_lock = threading.Lock()
+_reports = collections.deque(maxlen=50)
+
+def available():
+    return ENABLED and np is not None
+
+def _read_wav(data):
+    with wave.open(io.BytesIO(data)) as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 2:
+        x = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 4:
+        x = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif width == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        raise ValueError(f"{width * 8}bit の WAV には対応していません")
+    return x.reshape(-1, channels), rate
+
+def voiced_range(x, rate):
+    # 声のある区間 (開始, 終わり) をサンプル位置で。見つからなければ None
+    frame = max(1, int(rate * FRAME_SECONDS))
+    n = len(x) // frame
+    if n == 0: return None
+    rms = np.sqrt(np.mean(x[:n * frame].reshape(n, frame) ** 2, axis=1) + 1e-12)
+    db = 20 * np.log10(rms)
+    threshold = max(FLOOR_DB, np.percentile(db, 10) + ABOVE_NOISE_DB)
+    voiced = np.flatnonzero(db > threshold)
+    if len(voiced) == 0: return None
+    pad = int(rate * PAD_SECONDS)
+    return max(0, voiced[0] * frame - pad), min(len(x), (voiced[-1] + 1) * frame + pad)
+
+def resample(x, rate, target=TARGET_RATE):
+    if rate == target or len(x) == 0: return x
+    if rate > target:
+        # 窓つき sinc のローパス（新しいナイキスト周波数の少し手前まで）
+        cutoff = 0.45 * target / rate
+        taps = np.arange(-32, 33)
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+        x = np.convolve(x, (kernel / kernel.sum()).astype(np.float32), mode="same")
+    positions = np.arange(0, len(x) * target // rate) * (rate / target)
+    return np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+
+def _encode(x):
+    pcm = (np.clip(x, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    if AUDIO_CODEC == "mp3" and lameenc is not None:
+        encoder = lameenc.Encoder()
+        encoder.set_bit_rate(MP3_KBPS)
+        encoder.set_in_sample_rate(TARGET_RATE)
+        encoder.set_channels(1)
+        encoder.set_quality(5)
+        return bytes(encoder.encode(pcm) + encoder.flush()), "audio/mp3"
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(TARGET_RATE)
+        w.writeframes(pcm)
+    return out.getvalue(), "audio/wav"
+
+def prepare(audio_bytes, mime_type="audio/wav"):
+    # (送るバイト列, mime_type)。小さくできない時は受け取ったまま
+    if not available() or "wav" not in mime_type: return audio_bytes, mime_type
+    started = time.perf_counter()
+    try:
+        x, rate = _read_wav(audio_bytes)
+    except Exception:
+        return audio_bytes, mime_type   # 読めない録音は、そのまま Gemini に任せる
+    mono = x.mean(axis=1)
+    span = voiced_range(mono, rate)
+    if span is None:
+        # 声が見つからない（とても小さい声かもしれない）ので、削らずに小さくするだけ
+        span = (0, len(mono))
+    data, out_type = _encode(resample(mono[span[0]:span[1]], rate))
+    if len(data) >= len(audio_bytes):
+        data, out_type, span = audio_bytes, mime_type, (0, len(mono))
+    report = {"bytes_in": len(audio_bytes), "bytes_out": len(data), "seconds_in": round(len(mono) / rate, 2),
+              "seconds_out": round((span[1] - span[0]) / rate, 2), "codec": out_type, "prep_ms": round((time.perf_counter() - started) * 1000, 1)}
+    with _lock:
+        _reports.append(report)
+    return data, out_type
+
+def reports():
+    with _lock:
+        return list(_reports)
+
+def stats():
+    rows = reports()
+    bytes_in = sum(r["bytes_in"] for r in rows)
+    bytes_out = sum(r["bytes_out"] for r in rows)
+    return {"requests": len(rows), "bytes_in": bytes_in, "bytes_out": bytes_out, "ratio": bytes_out / bytes_in if bytes_in else 1.0}
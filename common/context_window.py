@@ -0,0 +1,90 @@
+import os
+import threading
+
+from common import llm
+from common.retrieval import estimate_tokens
+from common.speculation import run_in_background
+
+# === 🪟 会話の履歴を「トークンの上限」で切り、はみ出した昔の分は要約にたたむ ===
+# 直近8件・直近6件のように件数で切ると、ギブアップの長い解説が続くと重くなり、短いやりとりが続くと最初の設定（名前・物語の流れ）を忘れる。
+# ここでは各発言のトークン数を手元で見積もり、新しい方から上限までをそのまま履歴として送る。
+# 上限からはみ出した発言は、軽いモデルで「これまでの要約」に少しずつ足していく（バックグラウンドで。ターンは待たせない）。
+# 要約が追いつくまでは、はみ出した発言も履歴に残しておくので、途中の話が抜け落ちることはない。
+#   start = memory.window_start([(role, text), ...])  … 履歴として送る最初の位置（ここより前は memory.summary に入っている）
+
+HISTORY_BUDGET = int(os.environ.get("CONTEXT_HISTORY_BUDGET", 600))   # そのまま送る履歴のトークン数の上限（目安）
+SUMMARY_CHARS = int(os.environ.get("CONTEXT_SUMMARY_CHARS", 400))      # 要約の長さの上限（文字）
+MIN_RECENT = 2                                                          # 上限を超えても、直近の1往復は必ずそのまま送る
+SUMMARY_MODEL = llm.LITE_MODEL
+
+SUMMARY_PROMPT = """以下は、進行中の会話の「これまでの要約」と、その続きのやりとりです。
+続きの内容を足して、要約を{chars}字以内の日本語に更新してください。
+次のターンで必要になる事実（名前・設定・物語や話題の流れ・約束ごと・ユーザーがよく間違える表現）を優先して残し、あいさつや言い直しは省いてください。
+要約の本文だけを出力してください。
+
+【これまでの要約】
+{summary}
+
+【続きのやりとり】
+{turns}"""
+
+class ConversationMemory:
+    def __init__(self, budget=HISTORY_BUDGET, summary="", folded=0, feature="memory"):
+        self.budget = budget
+        self.summary = summary
+        self.folded = folded           # 要約に入れ終わった発言の数（先頭から）
+        self.feature = feature
+        self._pending = None           # (たたみ終わる位置, Future)
+        self._lock = threading.Lock()
+
+    def _apply_pending(self):
+        if self._pending and self._pending[1].done():
+            end, future = self._pending
+            self._pending = None
+            try:
+                self.summary, self.folded = future.result(), end
+            except Exception:
+                pass   # 要約に失敗したら、次のターンでもう一度たたむ（それまでは履歴にそのまま残る）
+
+    def window_start(self, turns):
+        # turns: [(role, text), ...]（古い順）。送る履歴の最初の位置を返す
+        with self._lock:
+            if self.folded > len(turns) or (self._pending and self._pending[0] > len(turns)):
+                # やり直し（Undo）で要約した所より短くなった時は、最初から
+                self.summary, self.folded, self._pending = "", 0, None
+            self._apply_pending()
+            cut, used = len(turns), 0
+            while cut > 0:
+                tokens = estimate_tokens(turns[cut - 1][1])
+                if len(turns) - cut >= MIN_RECENT and used + tokens > self.budget: break
+                used += tokens
+                cut -= 1
+            # 履歴はユーザーの発言から始める（モデルの返事だけが先頭に残らないように）
+            while 0 < cut < len(turns) and turns[cut][0] != "user":
+                cut += 1
+            if cut > self.folded and self._pending is None:
+                summary, new_turns = self.summary, turns[self.folded:cut]
+                self._pending = (cut, run_in_background(self._summarize, summary, new_turns))
+            return min(cut, self.folded)
+
+    def forget(self, count):
+        # 呼び出し側が先頭の count 件（要約に入れ終わった分）を捨てた時に、位置をずらす
+        with self._lock:
+            self.folded = max(0, self.folded - count)
+            if self._pending: self._pending = (self._pending[0] - count, self._pending[1])
+
+    def _summarize(self, summary, turns):
+        lines = "\n".join(f"{'ユーザー' if role == 'user' else '相手'}: {text.strip()}" for role, text in turns)
+        prompt = SUMMARY_PROMPT.format(chars=SUMMARY_CHARS, summary=summary or "（まだありません）", turns=lines)
+        return llm.generate(prompt, SUMMARY_MODEL, feature=self.feature).strip()[:SUMMARY_CHARS * 2]
+
+    def wait(self, timeout=None):
+        # ベンチマーク・保存用：たたみ途中の要約を待って反映する
+        pending = self._pending
+        if pending: pending[1].result(timeout)
+        with self._lock:
+            self._apply_pending()
+
+def chat_turns(history):
+    # genai の履歴（Content）→ [(role, text), ...]
+    return [(h.role, "".join(getattr(p, "text", "") for p in h.parts)) for h in history]
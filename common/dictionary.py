@@ -0,0 +1,196 @@
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+
+from common.tts_store import CACHE_ROOT
+
+# === 📕 内蔵の英和辞書（通信なしで1単語を引く） ===
+# 「見出し語<TAB>意味」の単語リスト（EJDict と同じ形式）を、見出し語の順に並べた1つのファイルにまとめて mmap で開き、二分探索で引く。
+#   ヘッダー  : b"EJIX" + 件数(uint32)
+#   目次      : 各レコードの開始位置(uint32) × 件数
+#   レコード  : b"見出し語\t意味\n" を見出し語の順に
+# 元の単語リストが変わった時だけ作り直す。went → go, studies → study のような活用形は原形に戻してから引く。
+# そのままの形が見出し語になく、原形も安全に決められない時（butter → but, notes → not のような取り違え）は None で LLM に任せる。
+# 文法の質問や2語以上のフレーズは引かず（None）、呼び出し側が今までどおり LLM に聞く。
+
+BUNDLED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "en_ja_basic.tsv")
+# もっと大きな辞書（例: パブリックドメインの EJDict-hand を1つにまとめたもの）を足す時は、ここにパスを書く（":" 区切り）
+EXTRA_PATHS = [p for p in os.environ.get("EN_JA_DICT_PATH", "").split(os.pathsep) if p]
+INDEX_DIR = os.path.join(CACHE_ROOT, "dictionary")
+MAGIC = b"EJIX"
+FORMAT_VERSION = 1
+
+IRREGULAR = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be",
+    "has": "have", "had": "have", "does": "do", "did": "do", "done": "do",
+    "ate": "eat", "eaten": "eat", "began": "begin", "begun": "begin", "bought": "buy", "brought": "bring",
+    "broke": "break", "broken": "break", "built": "build", "caught": "catch", "chose": "choose", "chosen": "choose",
+    "came": "come", "drank": "drink", "drew": "draw", "drawn": "draw", "drove": "drive", "driven": "drive",
+    "fell": "fall", "fallen": "fall", "felt": "feel", "flew": "fly", "flown": "fly", "forgot": "forget", "forgotten": "forget",
+    "found": "find", "gave": "give", "given": "give", "got": "get", "gotten": "get", "went": "go", "gone": "go",
+    "grew": "grow", "grown": "grow", "heard": "hear", "held": "hold", "kept": "keep", "knew": "know", "known": "know",
+    "left": "leave", "lent": "lend", "lost": "lose", "made": "make", "meant": "mean", "met": "meet", "paid": "pay",
+    "ran": "run", "rode": "ride", "ridden": "ride", "rose": "rise", "risen": "rise", "said": "say", "sang": "sing", "sung": "sing",
+    "sat": "sit", "saw": "see", "seen": "see", "sold": "sell", "sent": "send", "slept": "sleep", "spoke": "speak", "spoken": "speak",
+    "spent": "spend", "stood": "stand", "swam": "swim", "swum": "swim", "taught": "teach", "took": "take", "taken": "take",
+    "thought": "think", "told": "tell", "understood": "understand", "woke": "wake", "woken": "wake",
+    "wore": "wear", "worn": "wear", "won": "win", "wrote": "write", "written": "write",
+    "children": "child", "men": "man", "women": "woman", "feet": "foot", "teeth": "tooth", "mice": "mouse",
+    "better": "good", "best": "good", "worse": "bad", "worst": "bad", "more": "many", "most": "many",
+}
+
+_WORD_RE = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+
+# 語尾を外した結果がこれらになる時は、活用形とみなさない（notes → not, its → it, ones → on, shed → she など）
+FUNCTION_WORDS = {
+    "a", "an", "the", "and", "but", "or", "nor", "not", "no", "so", "if", "as", "than", "then",
+    "at", "by", "for", "from", "in", "into", "of", "off", "on", "onto", "out", "to", "up", "with",
+    "i", "you", "he", "she", "it", "we", "they", "me", "him", "her", "us", "them",
+    "my", "your", "his", "its", "our", "their", "this", "that", "these", "those", "there", "here",
+    "what", "who", "whom", "which", "when", "where", "why", "how",
+    "am", "is", "are", "be", "was", "were", "can", "will", "shall", "may", "must", "would", "could", "should", "might",
+}
+MIN_STEM = 3   # 語尾を外したあとの長さ（これより短い stem は、たまたま見出し語と同じ形になりやすい）
+
+# 引いてみる順。+e の形を先に（cares → care, notes → note, caring → care が car / not より先）
+# -er / -ly は活用ではなく別の単語のことが多い（butter, manner, homely, timely）ので、語尾の規則には入れない
+SUFFIX_RULES = [("ies", "y"), ("ied", "y"), ("ier", "y"), ("iest", "y"),
+                ("ed", "e"), ("es", "e"), ("ing", "e"), ("est", "e"),
+                ("es", ""), ("s", ""), ("ed", ""), ("ing", ""), ("est", "")]
+
+def _safe_base(stem, base):
+    return len(stem) >= MIN_STEM and len(base) >= MIN_STEM and base not in FUNCTION_WORDS
+
+def lemma_candidates(word):
+    # 引いてみる順の候補（そのまま → 不規則変化 → 語尾の規則）。語尾の規則では、安全な原形だけを出す
+    w = word.lower()
+    yield w
+    if w in IRREGULAR: yield IRREGULAR[w]
+    if w.endswith("'s"): w = w[:-2]; yield w
+    for suffix, repl in SUFFIX_RULES:
+        if not w.endswith(suffix): continue
+        if suffix == "ed" and w.endswith("eed"): continue                         # seed, weed, need は過去形ではない
+        if suffix == "s" and w.endswith(("ss", "us", "is")): continue             # glass, bus, this
+        stem = w[:-len(suffix)]
+        if _safe_base(stem, stem + repl): yield stem + repl
+        # stopped → stop, running → run, biggest → big
+        if not repl and suffix in ("ed", "ing", "est") and len(stem) >= 4 and stem[-1] == stem[-2] and _safe_base(stem[:-1], stem[:-1]):
+            yield stem[:-1]
+
+def _read_sources(paths):
+    entries = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#") or "\t" not in line: continue
+                heads, meaning = line.rstrip("\n").split("\t", 1)
+                meaning = meaning.strip()
+                for head in heads.split(","):
+                    head = head.strip().lower()
+                    if not head or not meaning: continue
+                    entries[head] = f"{entries[head]} / {meaning}" if head in entries and meaning not in entries[head] else meaning
+    return entries
+
+def build_index(paths, index_path):
+    entries = _read_sources(paths)
+    records = [f"{head}\t{meaning}\n".encode("utf-8") for head, meaning in sorted(entries.items(), key=lambda e: e[0].encode("utf-8"))]
+    header = MAGIC + struct.pack("<I", len(records))
+    offsets, pos = [], len(header) + 4 * len(records)
+    for record in records:
+        offsets.append(pos)
+        pos += len(record)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.writelines(records)
+    os.replace(tmp_path, index_path)
+
+def _index_path(paths):
+    sig = [FORMAT_VERSION] + [(os.path.abspath(p), os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in paths]
+    return os.path.join(INDEX_DIR, f"en_ja-{hashlib.sha256(repr(sig).encode()).hexdigest()[:16]}.idx")
+
+class Dictionary:
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != MAGIC: raise ValueError(f"not a dictionary index: {index_path}")
+        self.count = struct.unpack_from("<I", self._mm, 4)[0]
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, i):
+        start = struct.unpack_from("<I", self._mm, 8 + 4 * i)[0]
+        end = self._mm.find(b"\n", start)
+        return self._mm[start:end]
+
+    def _key(self, i):
+        record = self._record(i)
+        return record[:record.find(b"\t")]
+
+    def _bisect(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key: lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def get(self, head):
+        key = head.lower().encode("utf-8")
+        i = self._bisect(key)
+        if i < self.count:
+            found, _, meaning = self._record(i).partition(b"\t")
+            if found == key: return meaning.decode("utf-8")
+        return None
+
+    def prefix(self, prefix, limit=10):
+        # 入力途中の候補（"evi" → evidence, ...）
+        key = prefix.lower().encode("utf-8")
+        out = []
+        for i in range(self._bisect(key), self.count):
+            head = self._key(i)
+            if not head.startswith(key) or len(out) >= limit: break
+            out.append(head.decode("utf-8"))
+        return out
+
+    def lookup(self, word):
+        # (見出し語, 意味) または None
+        for candidate in lemma_candidates(word):
+            meaning = self.get(candidate)
+            if meaning is not None: return candidate, meaning
+        return None
+
+_dictionary = None
+_dictionary_lock = threading.Lock()
+
+def get_dictionary():
+    global _dictionary
+    with _dictionary_lock:
+        if _dictionary is None:
+            paths = [BUNDLED_PATH] + [p for p in EXTRA_PATHS if os.path.exists(p)]
+            index_path = _index_path(paths)
+            if not os.path.exists(index_path):
+                os.makedirs(INDEX_DIR, exist_ok=True)
+                build_index(paths, index_path)
+            _dictionary = Dictionary(index_path)
+        return _dictionary
+
+# 🔍 1単語だけの時に内蔵辞書を引く（フレーズ・文法の質問・見つからない単語は None → LLM へ）
+def local_lookup(text):
+    word = (text or "").strip().strip(".,!?;:\"'“”‘’()").lower()
+    if not _WORD_RE.fullmatch(word): return None
+    try:
+        return get_dictionary().lookup(word)
+    except (OSError, ValueError):
+        return None
+
+def format_entry(query, entry):
+    head, meaning = entry
+    title = f"**{head}**" if head == query.strip().lower() else f"**{head}**（{query.strip()} の元の形）"
+    return title + "\n" + "\n".join(f"- {sense.strip()}" for sense in meaning.split(" / "))
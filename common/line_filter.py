@@ -0,0 +1,84 @@
+import collections
+import re
+
+from common import llm
+from common.retrieval import estimate_tokens
+from common.structured import NumberedLine, StructuredOutputError, generate_structured
+
+# === 🧹 PDF 教材の行を手元でふるい分けてから、迷う行だけ AI に送る ===
+# 「AIで英文のみ抽出」は、日本語の解説・ページ番号・毎ページのヘッダーまで全部 AI に送って、大半を捨てさせていた。
+# ここでは1行ずつ 文字の種類（英字・かな漢字・数字）の割合 と、ページをまたいで繰り返す行（ヘッダー・フッター）を見て、
+#   "en"    … 英語だけの文（そのまま残す）
+#   "drop"  … 日本語だけ・数字や記号だけ・ページ番号・繰り返しのヘッダー（捨てる）
+#   "ask"   … 英語と日本語が混ざっている・1語だけ など、手元では決めにくい行（AI に聞く）
+# に分ける。AI には "ask" の行だけを行番号つきで送り、答えを行番号で元の位置に戻す。
+
+MIN_REPEAT_PAGES = 3          # これ以上のページに同じ形で出てくる行はヘッダー・フッター扱い
+REPEAT_RATIO = 0.3            # （ページ数の3割以上）
+EDGE_LINES = 3                # ヘッダー・フッターを探すのは、各ページの上下この行数だけ（本文の決まり文句は残す）
+MIXED_EN_RATIO = 0.85         # 英字の割合がこれ以上なら、日本語が少し混ざっていても英文とみなす
+MIXED_JA_RATIO = 0.3          # 英字の割合がこれ未満なら、日本語の解説とみなす
+
+EXTRACT_PROMPT = ("以下は教材から取り出した行です（「行番号: 行」）。それぞれの行から英語の文章の部分だけを取り出してください。"
+                  "日本語解説や記号は除外。英語の文章がない行は出力しないでください（no に行番号、en に英語）。\n\n{lines}")
+
+_LATIN = re.compile(r"[A-Za-z]")
+_CJK = re.compile(r"[぀-ヿ㐀-鿿豈-﫿ｦ-ﾟ]")
+_PAGE_NO = re.compile(r"^[\s\-–—(（\[]*(p\.?|page|ページ)?\s*\d+\s*(/\s*\d+)?[\s\-–—)）\]]*$", re.I)
+_SENTENCE_END = re.compile(r"[.!?]['\"”’)]?$")
+
+def _shape(line):
+    # 繰り返しを見つけるための形（数字はそろえる：「Lesson 3 - 12」と「Lesson 3 - 13」を同じに）
+    return re.sub(r"\d+", "#", re.sub(r"\s+", " ", line.strip().lower()))
+
+def repeated_shapes(pages):
+    counts = collections.Counter()
+    for page in pages:
+        lines = [line for line in page.splitlines() if line.strip()]
+        counts.update({_shape(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]})
+    threshold = max(MIN_REPEAT_PAGES, REPEAT_RATIO * len(pages))
+    return {shape for shape, n in counts.items() if n >= threshold} if len(pages) >= MIN_REPEAT_PAGES else set()
+
+def classify_line(line, repeated=frozenset()):
+    text = line.strip()
+    if not text or _PAGE_NO.match(text): return "drop"
+    if _shape(text) in repeated: return "drop"
+    latin = len(_LATIN.findall(text))
+    cjk = len(_CJK.findall(text))
+    if latin == 0: return "drop"                     # 日本語だけ・数字や記号だけ
+    ratio = latin / (latin + cjk)
+    if ratio < MIXED_JA_RATIO: return "drop"         # 日本語の解説に英単語が少し入っているだけ
+    words = re.findall(r"[A-Za-z][A-Za-z'’\-]*", text)
+    if cjk == 0:
+        if len(words) >= 3 or (len(words) >= 2 and _SENTENCE_END.search(text)): return "en"
+        if latin < len(text) * 0.4: return "drop"    # 「Q1.」「(A) 12」のような記号・番号
+        return "ask"                                 # 1〜2語（見出し？ 単語リスト？）
+    return "en" if ratio >= MIXED_EN_RATIO and len(words) >= 3 and cjk <= 2 else "ask"
+
+def prefilter(pages):
+    # pages: ページごとの文字列。[(行, 判定), ...] を元の順番で返す
+    repeated = repeated_shapes(pages)
+    return [(line.strip(), classify_line(line, repeated)) for page in pages for line in page.splitlines() if line.strip()]
+
+def token_report(pages, labeled):
+    raw = sum(estimate_tokens(page) for page in pages)
+    sent = sum(estimate_tokens(line) + 2 for line, label in labeled if label == "ask")   # +2 は行番号の分
+    counts = collections.Counter(label for _, label in labeled)
+    return {"raw_tokens": raw, "sent_tokens": sent, "lines": len(labeled), **counts}
+
+def extract_english(pages):
+    # (英文の行のリスト, token_report)。AI が読めない答えを返した時は、迷った行もそのまま残す（あとでチェックを外せる）
+    labeled = prefilter(pages)
+    asked = [i for i, (_, label) in enumerate(labeled) if label == "ask"]
+    answers = {}
+    if asked:
+        prompt = EXTRACT_PROMPT.format(lines="\n".join(f"{i}: {labeled[i][0]}" for i in asked))
+        try:
+            answers = {line.no: line.en for line in generate_structured(prompt, NumberedLine, many=True, model_name=llm.LITE_MODEL, feature="extract")}
+        except StructuredOutputError:
+            answers = {str(i): labeled[i][0] for i in asked}
+    lines = []
+    for i, (line, label) in enumerate(labeled):
+        if label == "en": lines.append(line)
+        elif label == "ask" and answers.get(str(i)): lines.append(answers[str(i)])
+    return lines, token_report(pages, labeled)
@@ -0,0 +1,370 @@
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from common import audio_prep, usage
+
+try:
+    import google.generativeai as genai
+except ImportError:  # 偽物だけで動かす時は無くてもよい
+    genai = None
+
+# === 🧠 LLM 呼び出しの共通窓口 ===
+# 各ページで毎回 genai.GenerativeModel(...) を作っていたのを、(モデル名, system_instruction) ごとに1つだけ作って使い回す。
+# タイムアウトと計測もここでまとめて付ける（呼び出しごとのトークン数・時間は common/usage.py の台帳へ。feature= で機能名を付ける）。
+# LLM_BACKEND=fake にすると、ネットワークを使わない決まった返事を返す偽物に差し替わる（動作確認・ベンチマーク用）。
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+LITE_MODEL = "gemini-2.5-flash-lite"
+TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))
+FAKE_BACKEND = os.environ.get("LLM_BACKEND", "") == "fake"
+FAKE_LATENCY = float(os.environ.get("LLM_FAKE_LATENCY", 0))          # 偽物の最初の文字までの待ち（秒）
+FAKE_CHUNK_DELAY = float(os.environ.get("LLM_FAKE_CHUNK_DELAY", 0))  # 偽物のストリーミングで、かたまり1つごとの待ち
+
+TRANSCRIBE_PROMPT = "英語を文字起こししてください。文字のみ出力。"
+
+MAX_MODELS = 32  # system_instruction がターンごとに変わる（資料の抜粋など）ので、古いものから捨てる
+
+_models = collections.OrderedDict()
+_lock = threading.Lock()
+_metrics = {}    # (kind, モデル名) -> {"calls", "errors", "seconds", "ttft_seconds"}
+
+def configure(api_key):
+    if not FAKE_BACKEND: genai.configure(api_key=api_key.strip())
+
+def _record(kind, model_name, started, ok, ttft=None, feature=None, usage_metadata=None, nbytes=0, bytes_in=None):
+    seconds = time.perf_counter() - started
+    with _lock:
+        m = _metrics.setdefault((kind, model_name), {"calls": 0, "errors": 0, "seconds": 0.0, "ttft_seconds": 0.0})
+        m["calls"] += 1
+        m["errors"] += 0 if ok else 1
+        m["seconds"] += seconds
+        if ttft is not None: m["ttft_seconds"] += ttft
+    prompt_tokens, candidate_tokens, cached_tokens = usage.usage_counts(usage_metadata)
+    usage.record("gemini", kind, model_name, seconds, feature, ok, prompt_tokens, candidate_tokens, cached_tokens, nbytes,
+                 bytes_in=bytes_in)
+
+def metrics():
+    with _lock:
+        return {key: dict(value) for key, value in _metrics.items()}
+
+# === 🎭 偽物のバックエンド（決まった入力には、いつも同じ返事） ===
+class _FakePart:
+    def __init__(self, text):
+        self.text = text
+
+class _FakeContent:
+    def __init__(self, role, text):
+        self.role = role
+        self.parts = [_FakePart(text)]
+
+class _FakeUsage:
+    # 本物の usage_metadata と同じ名前で、だいたいのトークン数（4文字で1トークン）
+    def __init__(self, prompt, text):
+        self.prompt_token_count = len(prompt) // 4 + 1
+        self.candidates_token_count = len(text) // 4
+        self.cached_content_token_count = 0
+
+class _FakeResponse:
+    def __init__(self, text, prompt=""):
+        self.text = text
+        self.parts = [_FakePart(text)] if text else []
+        self.usage_metadata = _FakeUsage(prompt, text)
+
+def _prompt_text(contents):
+    if isinstance(contents, str): return contents
+    return "\n".join(c for c in contents if isinstance(c, str))
+
+def _fake_chunks(text):
+    # 本物のストリーミングに近い、数語ずつのかたまり
+    words = re.findall(r'\S+\s*', text)
+    return ["".join(words[i:i + 4]) for i in range(0, len(words), 4)] or [text]
+
+def _fake_wait_total(text):
+    return FAKE_LATENCY + FAKE_CHUNK_DELAY * max(0, len(_fake_chunks(text)) - 1)
+
+def _fake_stream(text, prompt=""):
+    if FAKE_LATENCY: time.sleep(FAKE_LATENCY)
+    chunks = _fake_chunks(text)
+    for i, chunk in enumerate(chunks):
+        if i and FAKE_CHUNK_DELAY: time.sleep(FAKE_CHUNK_DELAY)
+        response = _FakeResponse(chunk, prompt)
+        # 本物と同じく、最後のかたまりに全体のトークン数が入る
+        response.usage_metadata = _FakeUsage(prompt, text) if i == len(chunks) - 1 else None
+        yield response
+
+def _fake_json(text, contents, generation_config):
+    # JSON モードの時は、同じ中身を response_schema の形にして返す
+    schema = (generation_config or {}).get("response_schema") or {}
+    if schema.get("type") == "ARRAY":
+        if text.lstrip().startswith("["): return text
+        prompt = _prompt_text(contents)
+        if "no" in schema["items"]["properties"]:
+            rows = re.findall(r'^(\d+): (.*)$', prompt, re.M)
+            return json.dumps([{"no": no, "en": " ".join(re.findall(r"[A-Za-z][A-Za-z ,.'!?\-]*", line)).strip()} for no, line in rows], ensure_ascii=False)
+        words = re.search(r'単語:\s*\[([^\]]*)\]', prompt)
+        rows = [line.split("||", 1) for line in text.splitlines() if "||" in line]
+        if not rows and words:
+            rows = [(w.strip(), f"（{w.strip()}）") for w in words.group(1).split(",") if w.strip()]
+        if not rows:
+            rows = [(s.strip(), f"（訳）{s.strip()}") for s in _fake_sentences(prompt.split("\n\n", 1)[-1].replace("英文:", ""))]
+        if not rows:
+            rows = [("dog", "いぬ"), ("cat", "ねこ"), ("bird", "とり")]
+        return json.dumps([{"en": en.strip(), "ja": ja.strip()} for en, ja in rows], ensure_ascii=False)
+    tags = {name: m.group(1) for name in schema.get("properties", {}) for m in [re.search(f"<{name}>(.*?)</{name}>", text, re.DOTALL)] if m}
+    return json.dumps(tags, ensure_ascii=False)
+
+def _fake_sentences(text):
+    return [s for s in re.split(r'(?<=[.!?])\s+|\n+', text) if re.search(r'[A-Za-z]', s)]
+
+def _fake_reply(contents, system_instruction):
+    prompt = _prompt_text(contents)
+    digest = int(hashlib.sha256(f"{system_instruction}\n{prompt}".encode("utf-8")).hexdigest(), 16)
+    topics = ["your weekend", "your favorite food", "your job", "your hometown", "your hobbies"]
+    topic = topics[digest % len(topics)]
+    if not isinstance(contents, str) and any(isinstance(c, dict) for c in contents):
+        return "I would like to talk about my weekend."
+    if system_instruction and "ai_en" in system_instruction:
+        return ("<ai_en>Do you like apples?</ai_en><ai_ja>りんご は すき？</ai_ja><ai_ruby>Do(ドゥ) you(ユー) like(ライク) apples(アップルズ)?</ai_ruby>"
+                "<hint_en>Yes, I do.</hint_en><hint_ja>うん、すきだよ。</hint_ja><hint_ruby>Yes(イエス), I(アイ) do(ドゥ).</hint_ruby>")
+    if system_instruction and "[英語の質問]" in system_instruction:
+        if "評価" in prompt or "スコア" in prompt:
+            return "すばらしい会話でした！\n本日のスコア: 文法 80 / 語彙 75 / 流暢さ 70\n良かった点: 積極的に話せました。\n今後の課題: 過去形をもう少し正確に。"
+        return f"[フィードバック]\n- いいですね！\n[英語の質問]\nThat sounds great. Can you tell me more about {topic}?"
+    if "総評" in prompt:
+        return ("たくさん練習できましたね！すばらしいです。\n\n【本日のシャドーイングスコア】\n- 発音の正確さ: 80/100点\n- 流暢さ・再現度: 75/100点\n"
+                "- 練習への熱意: 95/100点\n- 総合スコア: 83/100点\n\n【良かった点・褒めポイント】\n- 最後まであきらめずに何度も挑戦できました。\n"
+                "- 文の区切りを意識して読めています。\n\n【今後の課題・アドバイス】\n- 語尾の子音（t, d）が落ちやすいので、最後まで息を止めずに言いましょう。")
+    if "JSON" in prompt:
+        words = re.search(r'単語:\s*\[([^\]]*)\]', prompt)
+        if words:
+            items = [w.strip() for w in words.group(1).split(",") if w.strip()]
+            return "[" + ", ".join(f'{{"en": "{w}", "ja": "（{w}）"}}' for w in items) + "]"
+        return '[{"en": "dog", "ja": "いぬ"}, {"en": "cat", "ja": "ねこ"}, {"en": "bird", "ja": "とり"}]'
+    if "||" in prompt or "英文:" in prompt:
+        body = prompt.split("\n\n", 1)[-1].replace("英文:", "")
+        return "\n".join(f"{s.strip()} || （訳）{s.strip()}" for s in _fake_sentences(body))
+    return f"（テスト用の返事）OK. Let's talk about {topic}."
+
+class _FakeModel:
+    def __init__(self, model_name, system_instruction=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def generate_content(self, contents, stream=False, request_options=None, generation_config=None):
+        text = _fake_reply(contents, self.system_instruction)
+        if generation_config: text = _fake_json(text, contents, generation_config)
+        prompt = f"{self.system_instruction or ''}{_prompt_text(contents)}"
+        if stream: return _fake_stream(text, prompt)
+        time.sleep(_fake_wait_total(text))
+        return _FakeResponse(text, prompt)
+
+    async def generate_content_async(self, contents, request_options=None):
+        text = _fake_reply(contents, self.system_instruction)
+        await asyncio.sleep(_fake_wait_total(text))
+        return _FakeResponse(text, f"{self.system_instruction or ''}{_prompt_text(contents)}")
+
+    def start_chat(self, history=None):
+        return _FakeChat(self, history or [])
+
+class _FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = []
+        for h in history:
+            if isinstance(h, dict):
+                part = h["parts"][0]
+                self.history.append(_FakeContent(h["role"], part if isinstance(part, str) else part.text))
+            else:
+                self.history.append(h)
+
+    def _prompt(self, message):
+        # 本物のチャットは、毎回 system_instruction と履歴をまるごと送る
+        return "".join([self.model.system_instruction or ""] + [h.parts[0].text for h in self.history] + [message])
+
+    def _reply(self, message, generation_config=None):
+        prompt = self._prompt(message)
+        text = _fake_reply(message, self.model.system_instruction)
+        if generation_config: text = _fake_json(text, message, generation_config)
+        self.history.append(_FakeContent("user", message))
+        response = _FakeResponse(text, prompt)
+        self.history.append(_FakeContent("model", response.text))
+        return response
+
+    def _stream(self, message):
+        # 本物と同じく、最後まで読み切った時点で履歴に入る
+        text = _fake_reply(message, self.model.system_instruction)
+        yield from _fake_stream(text, self._prompt(message))
+        self.history.append(_FakeContent("user", message))
+        self.history.append(_FakeContent("model", text))
+
+    def send_message(self, message, stream=False, request_options=None, generation_config=None):
+        if stream: return self._stream(message)
+        response = self._reply(message, generation_config)
+        time.sleep(_fake_wait_total(response.text))
+        return response
+
+    async def send_message_async(self, message, request_options=None):
+        response = self._reply(message)
+        await asyncio.sleep(_fake_wait_total(response.text))
+        return response
+
+    def rewind(self):
+        return self.history.pop(-2), self.history.pop()
+
+# === 🔁 モデルの使い回し ===
+def get_model(model_name=DEFAULT_MODEL, system_instruction=None):
+    key = (model_name, system_instruction)
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+        else:
+            if FAKE_BACKEND:
+                model = _FakeModel(model_name, system_instruction)
+            elif system_instruction:
+                model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+            else:
+                model = genai.GenerativeModel(model_name)
+            _models[key] = model
+            while len(_models) > MAX_MODELS:
+                _models.popitem(last=False)
+        return model
+
+def _options():
+    return {"timeout": TIMEOUT}
+
+def generate(contents, model_name=DEFAULT_MODEL, system_instruction=None, feature=None, generation_config=None):
+    started = time.perf_counter()
+    try:
+        response = get_model(model_name, system_instruction).generate_content(contents, request_options=_options(),
+                                                                              generation_config=generation_config)
+        text = response.text
+    except Exception:
+        _record("generate", model_name, started, False, feature=feature)
+        raise
+    _record("generate", model_name, started, True, feature=feature, usage_metadata=getattr(response, "usage_metadata", None))
+    return text
+
+async def generate_async(contents, model_name=DEFAULT_MODEL, system_instruction=None, feature=None):
+    started = time.perf_counter()
+    try:
+        response = await get_model(model_name, system_instruction).generate_content_async(contents, request_options=_options())
+        text = response.text
+    except Exception:
+        _record("generate", model_name, started, False, feature=feature)
+        raise
+    _record("generate", model_name, started, True, feature=feature, usage_metadata=getattr(response, "usage_metadata", None))
+    return text
+
+# 🎤 音声の文字起こし（聞き取れなかった時は ""）
+def transcribe(audio_bytes, model_name=DEFAULT_MODEL, mime_type="audio/wav", feature="transcribe"):
+    started = time.perf_counter()
+    bytes_in, sent = len(audio_bytes), 0   # 台帳には、録音のバイト数と実際に送ったバイト数を両方残す
+    try:
+        # 前後の無音を削って 16kHz モノラルにしてから送る（common/audio_prep.py）
+        audio_bytes, mime_type = audio_prep.prepare(audio_bytes, mime_type)
+        sent = len(audio_bytes)
+        res = get_model(model_name).generate_content([{"mime_type": mime_type, "data": audio_bytes}, TRANSCRIBE_PROMPT],
+                                                     request_options=_options())
+        text = res.text.strip() if res.parts else ""
+    except Exception:
+        _record("transcribe", model_name, started, False, feature=feature, nbytes=sent, bytes_in=bytes_in)
+        raise
+    _record("transcribe", model_name, started, True, feature=feature, usage_metadata=getattr(res, "usage_metadata", None),
+            nbytes=sent, bytes_in=bytes_in)
+    return text
+
+# === 💬 チャット ===
+# 返すのは genai の ChatSession（偽物の時は同じ形の _FakeChat）なので、history などは今までどおり触れる
+def start_chat(model_name=DEFAULT_MODEL, system_instruction=None, history=None):
+    return get_model(model_name, system_instruction).start_chat(history=history or [])
+
+# 履歴を写した別のチャット（元のチャットの履歴は変わらない。捨てるかもしれない先読みの送信に使う）
+def fork_chat(chat):
+    return chat.model.start_chat(history=list(chat.history))
+
+# 最後の1往復（送った文と返事）を履歴から外す（読み取れなかった答えを聞き直す前に）
+def rewind_chat(chat):
+    return chat.rewind()
+
+def _chat_model_name(chat):
+    model = getattr(chat, "model", None)
+    return getattr(model, "model_name", "chat")
+
+def send_message(chat, message, feature=None, generation_config=None):
+    started = time.perf_counter()
+    name = _chat_model_name(chat)
+    try:
+        response = chat.send_message(message, request_options=_options(), generation_config=generation_config)
+        text = response.text
+    except Exception:
+        _record("chat", name, started, False, feature=feature)
+        raise
+    _record("chat", name, started, True, feature=feature, usage_metadata=getattr(response, "usage_metadata", None))
+    return text
+
+async def send_message_async(chat, message, feature=None):
+    started = time.perf_counter()
+    name = _chat_model_name(chat)
+    try:
+        response = await chat.send_message_async(message, request_options=_options())
+        text = response.text
+    except Exception:
+        _record("chat", name, started, False, feature=feature)
+        raise
+    _record("chat", name, started, True, feature=feature, usage_metadata=getattr(response, "usage_metadata", None))
+    return text
+
+# === 🌊 ストリーミング ===
+# st.write_stream にそのまま渡せるイテレータ。流し終わると text（全文）と ttft / total（秒）が埋まる
+class TextStream:
+    def __init__(self, kind, model_name, open_stream, feature=None):
+        self.kind = kind
+        self.model_name = model_name
+        self.feature = feature
+        self._open_stream = open_stream
+        self.text = ""
+        self.ttft = None
+        self.total = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        parts = []
+        usage_metadata = None
+        try:
+            for chunk in self._open_stream():
+                # トークン数は最後のかたまりに全体の分が入ってくる
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                try:
+                    piece = chunk.text
+                except ValueError:  # 安全フィルタなどで中身の無いかたまり
+                    continue
+                if not piece: continue
+                if self.ttft is None: self.ttft = time.perf_counter() - started
+                parts.append(piece)
+                yield piece
+        except Exception:
+            _record(f"{self.kind}_stream", self.model_name, started, False, feature=self.feature)
+            raise
+        self.text = "".join(parts)
+        self.total = time.perf_counter() - started
+        _record(f"{self.kind}_stream", self.model_name, started, True, self.ttft, self.feature, usage_metadata)
+
+    def timing_caption(self):
+        if self.total is None: return ""
+        return f"⏱️ 最初の文字まで {self.ttft or self.total:.1f}秒 / 全体 {self.total:.1f}秒"
+
+def stream_generate(contents, model_name=DEFAULT_MODEL, system_instruction=None, feature=None):
+    model = get_model(model_name, system_instruction)
+    return TextStream("generate", model_name,
+                      lambda: model.generate_content(contents, stream=True, request_options=_options()), feature)
+
+def stream_message(chat, message, feature=None):
+    return TextStream("chat", _chat_model_name(chat),
+                      lambda: chat.send_message(message, stream=True, request_options=_options()), feature)
@@ -0,0 +1,123 @@
+import concurrent.futures
+import contextvars
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from common import llm
+from common.tts_store import CACHE_ROOT
+
+# === 📚 翻訳・辞書の答えを覚えておくディスクキャッシュ（全ページ・全プロセス・家族みんなで共有） ===
+# st.cache_data は生の文字列がキーなので "Evidence" / "evidence " / "evidence." が別々の通信になり、再起動で消える。
+# ここでは 大文字小文字・空白・前後の句読点 をそろえたキーで SQLite に保存する。
+# キーには モデル名 と プロンプトのハッシュ も入れるので、モデルやプロンプトを変えると自然に別の答えになる（古い答えは使われない）。
+
+DB_PATH = os.environ.get("LOOKUP_CACHE_PATH", os.path.join(CACHE_ROOT, "lookup.sqlite3"))
+MAX_ROWS = int(os.environ.get("LOOKUP_CACHE_MAX_ROWS", 20000))
+LOOKUP_WORKERS = int(os.environ.get("LOOKUP_WORKERS", 4))   # 裏で同時に調べる数
+
+# 先読み（キッズの文字起こし）や要約の実行役とは分けておく（終了時にまとめて訳しても、ほかのセッションを待たせない）
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=LOOKUP_WORKERS, thread_name_prefix="lookup")
+
+_EDGE_PUNCT = "\"'`“”‘’.,!?;:()[]{}<>。、！？：；「」『』（）・…-–— "
+
+def normalize_key(text):
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"\s+", " ", text).strip(_EDGE_PUNCT)
+    return re.sub(r"\s+([,.!?;:])", r"\1", text)
+
+def prompt_version(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+class LookupCache:
+    def __init__(self, path=DB_PATH, max_rows=MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {}   # kind -> {"hits", "misses"}（このプロセスで数えた分）
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS lookups (kind TEXT, model TEXT, version TEXT, key TEXT, value TEXT,"
+                         " created REAL, used REAL, hits INTEGER DEFAULT 0, PRIMARY KEY (kind, model, version, key))")
+            conn.execute("CREATE INDEX IF NOT EXISTS lookups_used ON lookups (used)")
+
+    def _conn(self):
+        # sqlite3 の接続はスレッドをまたげないので、スレッドごとに1本
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _count(self, kind, field):
+        with self._lock:
+            self._stats.setdefault(kind, {"hits": 0, "misses": 0})[field] += 1
+
+    def get(self, kind, model_name, version, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value FROM lookups WHERE kind=? AND model=? AND version=? AND key=?",
+                           (kind, model_name, version, key)).fetchone()
+        if row is None:
+            self._count(kind, "misses")
+            return None
+        with conn:
+            conn.execute("UPDATE lookups SET used=?, hits=hits+1 WHERE kind=? AND model=? AND version=? AND key=?",
+                         (time.time(), kind, model_name, version, key))
+        self._count(kind, "hits")
+        return row[0]
+
+    def put(self, kind, model_name, version, key, value):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO lookups (kind, model, version, key, value, created, used, hits) VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                         (kind, model_name, version, key, value, now, now))
+            # 上限を超えたら、最近使われていないものから捨てる
+            conn.execute("DELETE FROM lookups WHERE rowid IN (SELECT rowid FROM lookups ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                         (self.max_rows,))
+
+    def stats(self):
+        with self._lock:
+            session = {kind: dict(value) for kind, value in self._stats.items()}
+        rows = self._conn().execute("SELECT kind, COUNT(*), SUM(hits) FROM lookups GROUP BY kind").fetchall()
+        for kind, entries, hits in rows:
+            s = session.setdefault(kind, {"hits": 0, "misses": 0})
+            s.update(entries=entries, total_hits=hits or 0)
+        for s in session.values():
+            asked = s["hits"] + s["misses"]
+            s["hit_rate"] = s["hits"] / asked if asked else 0.0
+        return session
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None: _cache = LookupCache()
+        return _cache
+
+# 🔍 prompt の {text} に調べたい文字列を入れて llm.generate し、答えを覚えておく
+def cached_generate(kind, text, prompt, model_name=llm.DEFAULT_MODEL):
+    key = normalize_key(text)
+    version = prompt_version(prompt)
+    cache = get_cache()
+    value = cache.get(kind, model_name, version, key)
+    if value is None:
+        value = llm.generate(prompt.replace("{text}", text.strip()), model_name, feature=kind).strip()
+        if value: cache.put(kind, model_name, version, key, value)
+    return value
+
+# 🧵 cached_generate を裏で動かす（呼び出し元の contextvars＝台帳のページ名などを引き継ぐ）。Future を返す
+def cached_generate_in_background(kind, text, prompt, model_name=llm.DEFAULT_MODEL):
+    return _executor.submit(contextvars.copy_context().run, cached_generate, kind, text, prompt, model_name)
+
+def hit_rate_caption(kind):
+    s = get_cache().stats().get(kind)
+    if not s: return ""
+    return f"📚 キャッシュ: ヒット率 {s['hit_rate'] * 100:.0f}%（{s['hits']}/{s['hits'] + s['misses']}）・保存済み {s.get('entries', 0)}件"
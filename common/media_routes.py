@@ -0,0 +1,174 @@
+import collections
+import hashlib
+import html
+import os
+import secrets
+import threading
+import time
+
+import streamlit as st
+
+from common import usage
+from common.tts import DEFAULT_VOICE, get_tts_service
+
+# === 📡 音声をURLで配る小さなメディアルート ===
+# st.audio(bytes) は音声が全部そろってからでないとブラウザに何も届かず、再実行のたびに同じ音声を登録し直す。
+# Streamlit の Web サーバー（Starlette）に GET ルートを足して、<audio src=...> から直接取りに来てもらう。
+#   /tts-media/stream/<token>.mp3 … 合成しながら流す（長い台本）
+#   /tts-media/clip/<hash>.mp3    … 出来上がった音声を中身のハッシュで配る（ETag + immutable）
+# ルートは streamlit run serve.py の st.App(routes=routes()) で足す（Streamlit 公式の仕組み。1.65.0 で確認）。
+# streamlit run app.py で起動した時など、ルートが無い時は None を返すので、呼び出し側は従来の st.audio に戻る。
+
+PREFIX = "/tts-media"
+STREAM_TTL = 600  # 発行したストリームURLの有効期間（秒）
+# URL で配る短い音声をメモリに置いておく上限（古いものから捨てる。ブラウザ側にはキャッシュが残る）
+# 各セッションの最新の実行で描いた音声は捨てない（画面の <audio> が再生・シークで取りに来る）ので、その分は超えることがある
+CLIP_CACHE_BYTES = int(os.environ.get("TTS_CLIP_CACHE_BYTES", 64 * 1024 * 1024))
+# 画面に出ている音声を覚えておくセッション数（古いものから忘れる）
+CLIP_PIN_SESSIONS = int(os.environ.get("TTS_CLIP_PIN_SESSIONS", 64))
+# 中身のハッシュが URL なので、同じ URL の中身は二度と変わらない
+CLIP_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_streams = {}     # token -> (音声を流す非同期ジェネレーターを作る関数, 期限)
+_clips = collections.OrderedDict()   # digest -> bytes（LRU）
+_clip_bytes = 0
+# session -> (実行の番号, {digest, ...})。そのセッションの最新の実行で描いた音声は、まだ画面に <audio> が残っていて
+# 再生・シークでまた取りに来るので、上限を超えても捨てない
+_pins = collections.OrderedDict()
+_lock = threading.Lock()
+_installed = None
+
+def _base_path():
+    base = (st.get_option("server.baseUrlPath") or "").strip("/")
+    return f"/{base}" if base else ""
+
+async def _stream_endpoint(request):
+    from starlette.responses import Response, StreamingResponse
+    with _lock:
+        entry = _streams.get(request.path_params["token"])
+    if entry is None or entry[1] < time.time():
+        return Response(status_code=404)
+    # Content-Length は分からないので chunked のまま、届いたフレームから順に送る
+    return StreamingResponse(entry[0](), media_type="audio/mpeg", headers={"Cache-Control": "no-store"})
+
+def _parse_range(header, size):
+    # "bytes=start-end" / "bytes=start-" / "bytes=-suffix" の1区間だけ扱う（それ以外は None = 全体を返す）
+    units, _, spec = header.partition("=")
+    if units.strip() != "bytes" or "," in spec or "-" not in spec: return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if not start: return max(0, size - int(end)), size - 1
+        start, end = int(start), int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end: return None
+    return start, min(end, size - 1)
+
+async def _clip_endpoint(request):
+    from starlette.responses import Response
+    digest = request.path_params["digest"]
+    with _lock:
+        data = _clips.get(digest)
+        if data is not None: _clips.move_to_end(digest)
+    if data is None:
+        return Response(status_code=404)
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": CLIP_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    span = _parse_range(request.headers.get("range", ""), len(data))
+    if span is not None:
+        start, end = span
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(data[start:end + 1], status_code=206, media_type="audio/mpeg", headers=headers)
+    return Response(data, media_type="audio/mpeg", headers=headers)
+
+def _route_list():
+    from starlette.routing import Route
+    return [Route(f"{_base_path()}{PREFIX}/stream/{{token}}.mp3", _stream_endpoint),
+            Route(f"{_base_path()}{PREFIX}/clip/{{digest}}.mp3", _clip_endpoint)]
+
+def routes():
+    # serve.py の st.App(routes=...) に渡すルート。呼ばれたら、このプロセスでは URL で配る
+    global _installed
+    with _lock:
+        _installed = True
+    return _route_list()
+
+def install_routes():
+    # ルートがある（serve.py で起動した）時だけ True。無ければ None
+    with _lock:
+        return _installed
+
+def _register_stream(open_stream):
+    if not install_routes(): return None
+    token = secrets.token_urlsafe(16)
+    now = time.time()
+    with _lock:
+        for old in [t for t, entry in _streams.items() if entry[1] < now]:
+            del _streams[old]
+        _streams[token] = (open_stream, now + STREAM_TTL)
+    return f"{_base_path()}{PREFIX}/stream/{token}.mp3"
+
+# 🎧 長い文章を、合成しながら流すURLを発行する（ルートが使えない時は None）
+def stream_audio_url(text, voice=DEFAULT_VOICE, rate="+0%"):
+    tags = usage.current()   # 流すのはサーバーのループなので、台帳用のページ名はここで控えておく
+    return _register_stream(lambda: get_tts_service().stream(text, voice, rate, tags))
+
+# 🧵 SentenceFeed に文が足されるたびに、続けて流すURL（LLM の返事を書きながら読み上げる時）
+def feed_audio_url(feed):
+    return _register_stream(lambda: feed.service.stream_feed(feed))
+
+def _pin(digest):
+    # _lock を持って呼ぶ。ページの外（usage.set_page 前）で描いた音声は留めない
+    tags = usage.current()
+    session = tags.get("session")
+    if session is None: return
+    held = _pins.get(session)
+    if held is None or held[0] != tags.get("run"):
+        held = _pins[session] = (tags.get("run"), set())   # 新しい実行：前の実行で描いた音声はもう画面に無い
+    _pins.move_to_end(session)
+    held[1].add(digest)
+    while len(_pins) > CLIP_PIN_SESSIONS:
+        _pins.popitem(last=False)
+
+def _evict_clips():
+    # _lock を持って呼ぶ。画面に出ている音声は飛ばして、古いものから捨てる
+    global _clip_bytes
+    if _clip_bytes <= CLIP_CACHE_BYTES: return
+    pinned = set().union(*(digests for _, digests in _pins.values()))
+    for digest in [d for d in _clips if d not in pinned]:
+        if _clip_bytes <= CLIP_CACHE_BYTES: break
+        _clip_bytes -= len(_clips.pop(digest))
+
+# 🔗 出来上がった音声を、中身のハッシュの URL で配る（ルートが使えない時は None）
+# 同じ音声は再実行のたびに同じ URL になり、ブラウザは2回目以降キャッシュから再生する
+def clip_url(audio_bytes):
+    global _clip_bytes
+    if not install_routes(): return None
+    data = bytes(audio_bytes)
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    with _lock:
+        if digest in _clips:
+            _clips.move_to_end(digest)
+        else:
+            _clips[digest] = data
+            _clip_bytes += len(data)
+        _pin(digest)
+        _evict_clips()
+    return f"{_base_path()}{PREFIX}/clip/{digest}.mp3"
+
+def audio_html(url, autoplay=False, hidden=False):
+    return (f'<audio {"autoplay" if autoplay else ""} {"" if hidden else "controls"} preload="auto" '
+            f'src="{html.escape(url)}" style="width:100%;{"display:none;" if hidden else ""}"></audio>')
+
+def render_audio_url(url, autoplay=False):
+    st.markdown(audio_html(url, autoplay), unsafe_allow_html=True)
+
+# st.audio(audio_bytes, format="audio/mp3") の代わり。URL で配れない時は st.audio に戻る
+def render_audio(audio_bytes, autoplay=False):
+    url = clip_url(audio_bytes)
+    if url is None:
+        st.audio(audio_bytes, format="audio/mp3", autoplay=autoplay)
+    else:
+        render_audio_url(url, autoplay=autoplay)
@@ -0,0 +1,81 @@
+# === 🎵 MP3 をフレーム単位で扱う小さな道具（デコードはしない） ===
+# edge-tts の出力は audio-24khz-48kbitrate-mono-mp3（MPEG-2 Layer III, 固定ビットレート）。
+# フレームの頭でつなげば、再エンコードなしで1本の MP3 として再生できる。
+
+_BITRATES_V1_L3 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+_BITRATES_V2_L3 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+def parse_header(data, pos):
+    # Layer III のフレームヘッダなら (フレーム長, サンプルレート, 1フレームのサンプル数) を返す
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2 = data[pos + 1], data[pos + 2]
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_idx = (b2 >> 4) & 0x0F
+    sr_idx = (b2 >> 2) & 0x03
+    padding = (b2 >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+    sample_rate = _SAMPLE_RATES[version][sr_idx]
+    if version == 3:
+        bitrate = _BITRATES_V1_L3[bitrate_idx] * 1000
+        return 144 * bitrate // sample_rate + padding, sample_rate, 1152
+    bitrate = _BITRATES_V2_L3[bitrate_idx] * 1000
+    return 72 * bitrate // sample_rate + padding, sample_rate, 576
+
+def _skip_id3(data):
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+def iter_frames(data):
+    # (開始位置, フレーム長, サンプルレート, サンプル数) を順に返す。ゴミは読み飛ばして同期し直す
+    pos = _skip_id3(data)
+    end = len(data)
+    while pos < end:
+        header = parse_header(data, pos)
+        if header is None or pos + header[0] > end:
+            nxt = data.find(b"\xff", pos + 1)
+            if nxt < 0: return
+            pos = nxt
+            continue
+        yield (pos,) + header
+        pos += header[0]
+
+def _is_info_frame(data, pos, length):
+    # Xing / Info / VBRI ヘッダだけのフレーム（無音の目次）は連結時に落とす
+    frame = data[pos:pos + length]
+    return b"Xing" in frame or b"Info" in frame or b"VBRI" in frame
+
+def audio_frames(data):
+    frames = list(iter_frames(data))
+    if frames and _is_info_frame(data, frames[0][0], frames[0][1]):
+        frames = frames[1:]
+    return frames
+
+def duration(data):
+    return sum(samples / sr for _, _, sr, samples in audio_frames(data))
+
+def concat_mp3(parts):
+    # 各パートから音声フレームだけを取り出して、頭から順につなぐ
+    out = []
+    for data in parts:
+        if not data: continue
+        data = bytes(data)
+        out.extend(data[pos:pos + length] for pos, length, _, _ in audio_frames(data))
+    return b"".join(out)
+
+def slice_mp3(data, start, end):
+    # [start, end] 秒にかかるフレームだけを切り出す（フレーム = 24ms 刻み）
+    out, t = [], 0.0
+    data = bytes(data)
+    for pos, length, sr, samples in audio_frames(data):
+        frame_end = t + samples / sr
+        if frame_end > start and t < end:
+            out.append(data[pos:pos + length])
+        t = frame_end
+        if t >= end: break
+    return b"".join(out)
@@ -0,0 +1,133 @@
+import concurrent.futures
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+
+import PyPDF2
+
+from common.tts_store import CACHE_ROOT
+
+# === 📄 PDF をページごとに読み、ページごとに覚えておく ===
+# st.cache_data(extract_text_from_pdf) はファイル全体のバイト列がキーなので、
+#   ・200ページの問題集だと、全ページ読み終わるまで画面が止まる
+#   ・再実行のたびに、そのバイト列をまたハッシュし直す
+#   ・1ページ目だけほしくても全ページ読む
+# ここでは (ファイルのハッシュ, ページ番号) ごとにディスクへ保存し、読めたページから順に返す（iter_pages）。
+# 読むのはページ範囲の分だけ。まだ読んでいないページが多い時は、プロセスを分けて並列に読む（PyPDF2 は純 Python で GIL を離さない）。
+# プロセスは spawn で作る（スレッドの動いているサーバーから fork しない）。
+# ハッシュはアップロードごと（file_id）に1回だけ計算する。
+
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", os.path.join(CACHE_ROOT, "pdf"))
+PDF_CACHE_MAX_DOCS = int(os.environ.get("PDF_CACHE_MAX_DOCS", 50))   # 覚えておくファイル数（古いものから捨てる）
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+PDF_POOL_MIN_PAGES = int(os.environ.get("PDF_POOL_MIN_PAGES", 24))  # 未読のページがこれ以上なら、プロセスを分けて読む
+PDF_BATCH_PAGES = 8                                                  # 1プロセスに1回で渡すページ数（小さいほど早く画面に出る）
+
+_lock = threading.Lock()
+_digests = {}   # file_id -> ハッシュ
+_pool = None
+
+def digest_of(data, file_id=None):
+    if file_id is None: return hashlib.sha256(data).hexdigest()
+    with _lock:
+        if file_id in _digests: return _digests[file_id]
+    digest = hashlib.sha256(data).hexdigest()
+    with _lock:
+        if len(_digests) > 256: _digests.clear()
+        _digests[file_id] = digest
+    return digest
+
+def _doc_dir(digest):
+    return os.path.join(PDF_CACHE_DIR, digest[:32])
+
+def _page_path(digest, page_no):
+    return os.path.join(_doc_dir(digest), f"{page_no:05d}.txt")
+
+def _write(path, text):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def _read_cached(digest, page_no):
+    try:
+        with open(_page_path(digest, page_no), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _evict_old_docs(keep):
+    try:
+        docs = [os.path.join(PDF_CACHE_DIR, d) for d in os.listdir(PDF_CACHE_DIR)]
+    except FileNotFoundError:
+        return
+    docs = sorted((d for d in docs if os.path.isdir(d) and d != keep), key=os.path.getmtime, reverse=True)
+    for d in docs[PDF_CACHE_MAX_DOCS - 1:]:
+        shutil.rmtree(d, ignore_errors=True)
+
+def page_count(data, digest):
+    meta = os.path.join(_doc_dir(digest), "meta.json")
+    try:
+        with open(meta, encoding="utf-8") as f:
+            return json.load(f)["pages"]
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    count = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+    os.makedirs(_doc_dir(digest), exist_ok=True)
+    _evict_old_docs(_doc_dir(digest))
+    _write(meta, json.dumps({"pages": count}))
+    return count
+
+def _parse_pages(data, page_numbers):
+    # 別プロセスからも呼ぶので、モジュール直下の関数にしておく（pickle できるように）
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in page_numbers]
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # fork だと、Streamlit サーバーの動いているスレッド（uvicorn・TTS の asyncio・先読み）が握ったロックまで写して固まることがある
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _parse_missing(data, missing):
+    # 未読のページを (ページ番号, 文字列) で、ページ順に返す
+    jobs = None
+    if len(missing) >= PDF_POOL_MIN_PAGES and PDF_WORKERS > 1:
+        batches = [missing[i:i + PDF_BATCH_PAGES] for i in range(0, len(missing), PDF_BATCH_PAGES)]
+        try:
+            jobs = [_get_pool().submit(_parse_pages, data, batch) for batch in batches]
+        except (RuntimeError, concurrent.futures.BrokenExecutor):
+            jobs = None   # プロセスが使えない環境では、このプロセスで読む
+    if jobs is None:
+        reader = PyPDF2.PdfReader(io.BytesIO(data))
+        for i in missing:
+            yield i, reader.pages[i].extract_text() or ""
+        return
+    for batch, job in zip(batches, jobs):
+        try:
+            texts = job.result()
+        except concurrent.futures.BrokenExecutor:
+            texts = _parse_pages(data, batch)
+        yield from zip(batch, texts)
+
+def iter_pages(data, digest, first=0, last=None):
+    # first〜last（0始まり・last を含む）のページを (ページ番号, 文字列) で、ページ順に返す。覚えているページはすぐ返す
+    last = page_count(data, digest) - 1 if last is None else last
+    wanted = list(range(first, last + 1))
+    cached = {i: text for i in wanted for text in [_read_cached(digest, i)] if text is not None}
+    missing = [i for i in wanted if i not in cached]
+    if missing: os.makedirs(_doc_dir(digest), exist_ok=True)
+    parsed = _parse_missing(data, missing) if missing else iter(())
+    for i in wanted:
+        if i in cached:
+            yield i, cached[i]
+            continue
+        page_no, text = next(parsed)
+        _write(_page_path(digest, page_no), text)
+        yield page_no, text
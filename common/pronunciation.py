@@ -0,0 +1,90 @@
+import html
+import re
+import unicodedata
+
+# === 🎯 手元でできる発音判定（単語ごとのレーベンシュタイン） ===
+# 文字起こしのあとに「句読点と大文字小文字を無視して単語が合っているか」を LLM にもう1回聞いていたのを、
+# お手本と発音を単語に分けて並べ、抜け・言い間違い・余計な単語を手元で数える。
+# LLM を呼ぶのは、ユーザーが「解説してほしい」と頼んだ時だけ。
+
+_NUMBERS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+            "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen", "twenty"]
+_SAME = {"okay": "ok", "alright": "all right"}
+
+def normalize_words(text):
+    # 小文字にし、句読点を外して単語に分ける（don't の ' は残す。数字の 0〜20 は英単語に）
+    text = unicodedata.normalize("NFKC", text or "").lower().replace("’", "'")
+    words = []
+    for raw in re.split(r"[\s\-–—/]+", text):
+        word = re.sub(r"[^\w']", "", raw).strip("'")
+        if not word: continue
+        if word.isdigit() and int(word) < len(_NUMBERS): word = _NUMBERS[int(word)]
+        words.extend(_SAME.get(word, word).split())
+    return words
+
+def align(expected, spoken):
+    # 単語の編集距離の表を作り、後ろからたどって (種類, お手本の単語, 発音した単語) の列にする
+    # 種類: "ok" 一致 / "sub" 言い間違い / "miss" 抜け / "extra" 余計
+    n, m = len(expected), len(spoken)
+    dist = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n + 1): dist[i][0] = i
+    for j in range(m + 1): dist[0][j] = j
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            cost = 0 if expected[i - 1] == spoken[j - 1] else 1
+            dist[i][j] = min(dist[i - 1][j - 1] + cost, dist[i - 1][j] + 1, dist[i][j - 1] + 1)
+    ops, i, j = [], n, m
+    while i or j:
+        if i and j and dist[i][j] == dist[i - 1][j - 1] + (expected[i - 1] != spoken[j - 1]):
+            ops.append(("ok" if expected[i - 1] == spoken[j - 1] else "sub", expected[i - 1], spoken[j - 1]))
+            i, j = i - 1, j - 1
+        elif i and dist[i][j] == dist[i - 1][j] + 1:
+            ops.append(("miss", expected[i - 1], None))
+            i -= 1
+        else:
+            ops.append(("extra", None, spoken[j - 1]))
+            j -= 1
+    return ops[::-1]
+
+def judge(expected_text, spoken_text):
+    expected, spoken = normalize_words(expected_text), normalize_words(spoken_text)
+    ops = align(expected, spoken)
+    errors = sum(1 for kind, _, _ in ops if kind != "ok")
+    return {
+        "ops": ops,
+        "missing": [e for kind, e, _ in ops if kind == "miss"],
+        "substituted": [(e, s) for kind, e, s in ops if kind == "sub"],
+        "extra": [s for kind, _, s in ops if kind == "extra"],
+        "score": max(0, round(100 * (1 - errors / max(len(expected), 1)))),
+        "perfect": errors == 0 and bool(expected),
+    }
+
+def judge_message(result):
+    if result["perfect"]: return "✅ 完全一致！合格です。"
+    parts = []
+    if result["substituted"]: parts.append("言い間違い: " + "、".join(f"{e} → {s}" for e, s in result["substituted"]))
+    if result["missing"]: parts.append("抜け: " + "、".join(result["missing"]))
+    if result["extra"]: parts.append("余計な単語: " + "、".join(result["extra"]))
+    return f"❌ {result['score']}点　" + "／".join(parts)
+
+def kids_message(result):
+    if result["perfect"]: return "パーフェクト！すごい！"
+    words = [e for kind, e, _ in result["ops"] if kind in ("sub", "miss")]
+    return f"おしい！『{' '.join(words)}』っていってみてね！" if words else "おしい！もういっかい いってみてね！"
+
+_STYLES = {
+    "ok": "",
+    "sub": "background:#ffe08a;border-radius:4px;padding:0 3px;",
+    "miss": "background:#ffc9c9;border-radius:4px;padding:0 3px;text-decoration:underline wavy #e03131;",
+    "extra": "color:#868e96;text-decoration:line-through;",
+}
+
+def diff_html(result):
+    # お手本の順に並べて色分け：黄色=言い間違い（小さく実際の発音）、赤=抜け、灰色の取り消し線=余計
+    spans = []
+    for kind, e, s in result["ops"]:
+        if kind == "ok": spans.append(html.escape(e))
+        elif kind == "sub": spans.append(f'<span style="{_STYLES[kind]}">{html.escape(e)} <small>({html.escape(s)})</small></span>')
+        elif kind == "miss": spans.append(f'<span style="{_STYLES[kind]}">{html.escape(e)}</span>')
+        else: spans.append(f'<span style="{_STYLES[kind]}">{html.escape(s)}</span>')
+    return f'<div style="line-height:2;font-size:1.05em;">{" ".join(spans)}</div>'
@@ -0,0 +1,117 @@
+import collections
+import hashlib
+import math
+import re
+import threading
+
+# === 🔎 アップロード資料から、会話に関係する段落だけを選ぶ（BM25） ===
+# 資料をまるごと system_instruction に入れると、50ページの PDF でも毎ターン全部を送り直すことになる。
+# 資料を段落ごとに区切って BM25 の索引を1回だけ作り（資料の中身のハッシュごとに使い回し）、
+# 直近の会話で点数の高い段落を、トークンの上限まで資料の順番のまま渡す。
+# 資料が上限より短い時は、今までどおり全文を渡す。
+
+PASSAGE_WORDS = 120       # 1段落の目安の長さ（英単語数。日本語は文字数の半分で数える）
+PASSAGE_OVERLAP = 1       # 前の段落の最後の文を、次の段落の先頭にも入れる（文脈が切れないように）
+TOKEN_BUDGET = 1200       # 1ターンで資料に使うトークンの上限（目安）
+TOP_K = 6
+K1 = 1.5
+B = 0.75
+MAX_INDEXES = 8
+
+_STOPWORDS = set("a an the and or but if of to in on at for with by from as is are was were be been am do does did "
+                 "it its this that these those i you he she we they me my your our their what which who how when where why "
+                 "not no so can could will would should have has had there here than then just also".split())
+_CJK = r"぀-ヿ㐀-鿿豈-﫿"
+
+def tokenize(text):
+    # 英語は単語（小文字・ストップワード除く）、日本語は2文字ずつ（分かち書き無しでも当たるように）
+    tokens = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in _STOPWORDS and len(w) > 1]
+    for run in re.findall(f"[{_CJK}]+", text):
+        tokens.extend(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+    return tokens
+
+def estimate_tokens(text):
+    # Gemini のトークン数の目安：英語は4文字で1トークン、日本語はおよそ1文字1トークン
+    cjk = len(re.findall(f"[{_CJK}]", text))
+    return cjk + (len(text) - cjk) // 4
+
+def _length(sentence):
+    return len(sentence.split()) + len(re.findall(f"[{_CJK}]", sentence)) // 2
+
+def _split_long(sentence, words):
+    # 句読点の無い長い行（PDF の表など）は、目安の長さで機械的に切る
+    if _length(sentence) <= words: return [sentence]
+    if " " in sentence:
+        parts = sentence.split()
+        return [" ".join(parts[i:i + words]) for i in range(0, len(parts), words)]
+    return [sentence[i:i + words * 2] for i in range(0, len(sentence), words * 2)]
+
+def chunk_passages(text, words=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP):
+    sentences = [piece for s in re.split(r"(?<=[.!?])\s+|(?<=[。！？])\s*|\n\s*\n", text) if s.strip()
+                 for piece in _split_long(s.strip(), words)]
+    passages, current, size = [], [], 0
+    for sentence in sentences:
+        current.append(sentence)
+        size += _length(sentence)
+        if size >= words:
+            passages.append(" ".join(current))
+            current = current[-overlap:] if overlap else []
+            size = sum(_length(s) for s in current)
+    if current and (not passages or len(current) > overlap):
+        passages.append(" ".join(current))
+    return passages
+
+class BM25Index:
+    def __init__(self, passages):
+        self.passages = passages
+        self.tokens = [estimate_tokens(p) for p in passages]
+        self._tf = [collections.Counter(tokenize(p)) for p in passages]
+        self._len = [sum(tf.values()) for tf in self._tf]
+        self._avg = sum(self._len) / max(len(self._len), 1) or 1.0
+        df = collections.Counter()
+        for tf in self._tf:
+            df.update(tf.keys())
+        n = len(passages)
+        self._idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+        self.total_tokens = sum(self.tokens)
+
+    def scores(self, query):
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        out = []
+        for tf, length in zip(self._tf, self._len):
+            score = 0.0
+            for term in terms:
+                f = tf.get(term)
+                if f: score += self._idf[term] * f * (K1 + 1) / (f + K1 * (1 - B + B * length / self._avg))
+            out.append(score)
+        return out
+
+    def select(self, query, budget=TOKEN_BUDGET, k=TOP_K):
+        # 上限に収まる段落を点数順に選び、資料の順番に並べて返す
+        if self.total_tokens <= budget: return "\n\n".join(self.passages)
+        scores = self.scores(query)
+        ranked = sorted((i for i, s in enumerate(scores) if s > 0), key=lambda i: -scores[i])
+        if not ranked: ranked = [0]  # 何も当たらない時は冒頭（たいてい概要）を渡す
+        chosen, used = [], 0
+        for i in ranked[:k]:
+            if used + self.tokens[i] > budget and chosen: continue
+            chosen.append(i)
+            used += self.tokens[i]
+        return "\n\n".join(self.passages[i] for i in sorted(chosen))
+
+_indexes = collections.OrderedDict()   # 資料のハッシュ -> BM25Index（LRU）
+_lock = threading.Lock()
+
+def get_index(text):
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _lock:
+        index = _indexes.get(digest)
+        if index is not None:
+            _indexes.move_to_end(digest)
+            return index
+    index = BM25Index(chunk_passages(text))
+    with _lock:
+        _indexes[digest] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,68 @@
+import concurrent.futures
+import contextvars
+import os
+import re
+
+from common.structured import Pair, as_dict, generate_structured
+from common.tts import split_sentences
+
+# === ✂️ 長いスクリプトの「意味のまとまり＋和訳」への分割を、ブロックごとに並列で ===
+# スクリプト全体を1回の generate で分割すると、PDF 由来の長い文章では遅く、出力の上限にも当たり、1か所崩れると全部やり直しになる。
+# 先に手元でブロックに分け（呼び出し側の split_script_into_blocks）、ブロックごとに並列で AI に分割させて、元の順番に並べ直す。
+# 失敗したブロックや、SPLIT_TIMEOUT 秒までに返ってこないブロックは、手元の文分割（和訳なし）で埋めるので、いちばん遅いブロックを待たない。
+
+SPLIT_BLOCK_WORDS = int(os.environ.get("SPLIT_BLOCK_WORDS", 80))    # AI に1回で渡すブロックの大きさ（英単語数）
+SPLIT_TIMEOUT = float(os.environ.get("SPLIT_TIMEOUT", 20))          # これより遅いブロックは手元の分割にする（秒）
+SPLIT_WORKERS = int(os.environ.get("SPLIT_WORKERS", 6))            # 同時に投げるブロック数
+LOCAL_CHUNK_WORDS = 12                                               # 手元の分割で、これより長い文は , ; : で区切る
+
+# 先読みや要約の実行役とは分けておく（長い PDF でブロックが多くても、ほかの裏仕事を待たせない）
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=SPLIT_WORKERS, thread_name_prefix="split")
+
+SPLIT_PROMPT = "以下の英文を意味のまとまりに分割し、それぞれに日本語訳をつけてください（en に英語、ja に日本語訳）。\n\n英文:\n{text}"
+
+def local_chunks(block, max_words=LOCAL_CHUNK_WORDS):
+    # AI が使えない時の分割：1文ずつ、長い文は句読点で区切る（和訳なし）
+    chunks = []
+    for sentence in split_sentences(block):
+        parts = [sentence] if len(sentence.split()) <= max_words else re.split(r"(?<=[,;:])\s+", sentence)
+        chunks.extend({"en": part.strip(), "ja": ""} for part in parts if part.strip())
+    return chunks
+
+def ai_chunks(block):
+    return as_dict(generate_structured(SPLIT_PROMPT.format(text=block), Pair, many=True, feature="split"))
+
+def split_in_parallel(blocks, on_progress=None, timeout=SPLIT_TIMEOUT, split_block=ai_chunks):
+    # (チャンクのリスト, 手元の分割で埋めたブロック数)
+    # on_progress(results) はブロックが1つ終わるたびに呼ぶ（results は元の順番。まだのブロックは None）
+    jobs = [_executor.submit(contextvars.copy_context().run, split_block, block) for block in blocks]
+    index = {job: i for i, job in enumerate(jobs)}
+    results = [None] * len(blocks)
+    fallbacks = 0
+    try:
+        for job in concurrent.futures.as_completed(jobs, timeout=timeout):
+            i = index[job]
+            try:
+                results[i] = job.result()
+            except Exception:
+                results[i] = None
+            if not results[i]:
+                results[i] = local_chunks(blocks[i])
+                fallbacks += 1
+            if on_progress: on_progress(results)
+    except concurrent.futures.TimeoutError:
+        pass
+    for i, result in enumerate(results):
+        if result is None:
+            jobs[i].cancel()   # 走り出していたら止められないが、結果は使わない
+            results[i] = local_chunks(blocks[i])
+            fallbacks += 1
+    return [chunk for result in results for chunk in result], fallbacks
+
+def ready_prefix(results):
+    # 先頭から続けてそろっている分（画面に順番どおり流す用）
+    out = []
+    for result in results:
+        if result is None: break
+        out.extend(result)
+    return out
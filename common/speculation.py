@@ -0,0 +1,54 @@
+import concurrent.futures
+import contextvars
+import os
+import threading
+
+from common.pronunciation import judge
+
+# === 🔮 先読み：期待どおりの答えが返ってくると仮定して、次のターンを先に作っておく ===
+# 録音が届いた時点で、文字起こしと「お手本どおりに答えた場合の次のターン」を同時に走らせる。
+# ボタンが押されたら文字起こしをお手本と比べ、十分に近ければ先に作ったターンをそのまま使う（待ち時間ほぼ0）。
+# 違っていたら先読みは捨てて、今までどおり実際の発話で作り直す。
+
+MATCH_SCORE = int(os.environ.get("SPECULATION_MATCH_SCORE", 80))   # common/pronunciation.judge の点数がこれ以上なら採用
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculate")
+_lock = threading.Lock()
+_stats = {"started": 0, "committed": 0, "discarded": 0}
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+def stats():
+    with _lock:
+        return dict(_stats)
+
+def run_in_background(fn, *args):
+    # 呼び出し元の contextvars（台帳のページ名など）を引き継いで、別スレッドで動かす
+    return _executor.submit(contextvars.copy_context().run, fn, *args)
+
+class SpeculativeTurn:
+    def __init__(self, key, expected, transcribe, generate):
+        self.key = key
+        self.expected = expected
+        self.transcript = run_in_background(transcribe)
+        self.turn = run_in_background(generate)
+        _count("started")
+
+    def matches(self, spoken):
+        return judge(self.expected, spoken)["score"] >= MATCH_SCORE
+
+    def resolve(self):
+        # (文字起こし, 先に作ったターン or None)。None の時は呼び出し側が作り直す
+        spoken = self.transcript.result()
+        turn = None
+        if self.matches(spoken):
+            try:
+                turn = self.turn.result()
+            except Exception:
+                turn = None
+        else:
+            self.turn.cancel()
+        _count("committed" if turn is not None else "discarded")
+        return spoken, turn
@@ -0,0 +1,221 @@
+import dataclasses
+import json
+import os
+import re
+import threading
+
+from common import llm
+
+# === 🧩 決まった形の答え（JSON モード）を、型つきのオブジェクトで受け取る ===
+# XML タグを6回 extract_tag したり、"英語 || 日本語" を行ごとに split したり、re.search(r'\[.*\]') から json.loads したり、
+# ページごとにバラバラだった読み取りをここにまとめる。
+# 答えの形は dataclass で書き、Gemini には response_schema（response_mime_type="application/json"）として渡す。
+# 読み取りは答え全体を1回なめるだけの JSONScanner で、途中で切れた答えでも「閉じ終わった要素・項目」だけは拾う。
+# （返事は generate / send_message で全部そろってから読む。ストリーミングの途中では読まない）
+# それでも必須の項目がそろわない時だけ、決まった回数まで聞き直す（チャットは聞き直す前に履歴を1往復戻す）。
+# 機能ごとの 成功 / 一部を拾って成功 / 聞き直し / 失敗 の回数は stats() で見られる。
+
+MAX_RETRIES = int(os.environ.get("STRUCTURED_RETRIES", 1))
+RETRY_NOTE = "\n\n【再送】前回の出力は指定の JSON として読み取れませんでした。指定のスキーマどおりの JSON だけを出力してください。"
+
+@dataclasses.dataclass
+class KidsTurn:
+    ai_en: str
+    ai_ja: str
+    hint_en: str
+    hint_ja: str
+    ai_ruby: str = ""
+    hint_ruby: str = ""
+
+@dataclasses.dataclass
+class Pair:
+    en: str
+    ja: str
+
+@dataclasses.dataclass
+class NumberedLine:
+    no: str
+    en: str
+
+class StructuredOutputError(ValueError):
+    pass
+
+_lock = threading.Lock()
+_stats = {}   # feature -> {"calls", "ok", "recovered", "retried", "failed"}
+
+def _count(feature, *names):
+    with _lock:
+        s = _stats.setdefault(feature or "structured", {"calls": 0, "ok": 0, "recovered": 0, "retried": 0, "failed": 0})
+        for name in names: s[name] += 1
+
+def stats():
+    with _lock:
+        out = {feature: dict(s) for feature, s in _stats.items()}
+    for s in out.values():
+        s["failure_rate"] = s["failed"] / s["calls"] if s["calls"] else 0.0
+    return out
+
+# === 📐 dataclass → response_schema ===
+def response_schema(cls, many=False):
+    fields = dataclasses.fields(cls)
+    schema = {
+        "type": "OBJECT",
+        "properties": {f.name: {"type": "STRING"} for f in fields},
+        "required": [f.name for f in fields if f.default is dataclasses.MISSING],
+    }
+    return {"type": "ARRAY", "items": schema} if many else schema
+
+def generation_config(cls, many=False):
+    return {"response_mime_type": "application/json", "response_schema": response_schema(cls, many)}
+
+# === 🔎 1回なめるだけの JSON 読み取り ===
+# 文字を1つずつ読み、いちばん外側の配列の要素 / オブジェクトの項目が閉じた位置を覚えておく。
+# root="[" / "{" を指定すると、その括弧から始まるものだけを外側とみなす（前置きの「{名前}」などは読み飛ばす）。
+# 外側が閉じたら止まり、中身が使えなかった時は restart() で、その続きから次の外側を探す（頭から読み直さない）。
+# 最後まで読めなかった答えでも、閉じ終わった分は items() / fields() で取れる。
+class JSONScanner:
+    def __init__(self, root=None):
+        self.want = root
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._root = None       # "[" か "{"
+        self._start = None      # いま読んでいる要素・項目の開始位置
+        self._items = []        # 閉じ終わった (開始, 終了) の位置
+
+    def feed(self, chunk):
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape: self._escape = False
+                elif c == "\\": self._escape = True
+                elif c == '"': self._in_string = False
+                continue
+            if self._root is None:
+                # ```json のような前置きは読み飛ばす
+                if c in (self.want or "[{"):
+                    self._root, self._depth, self._start = c, 1, i + 1
+                continue
+            if c == '"':
+                self._in_string = True
+            elif c in "[{":
+                self._depth += 1
+            elif c in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close(i)
+                    self._depth = -1   # いちばん外側が閉じたら、いったん止まる（後ろは restart() で）
+                    self._pos = i + 1
+                    return
+            elif c == "," and self._depth == 1:
+                self._close(i)
+                self._start = i + 1
+        self._pos = len(text)
+
+    def restart(self):
+        # 閉じた外側の中身が使えなかった時：その続きから、次の外側を探す
+        self._depth, self._in_string, self._escape = 0, False, False
+        self._root, self._start, self._items = None, None, []
+        self.feed("")
+
+    def _close(self, end):
+        if self._start is not None and self.text[self._start:end].strip():
+            self._items.append((self._start, end))
+
+    @property
+    def complete(self):
+        return self._depth == -1
+
+    def items(self):
+        # 外側が配列の時：閉じ終わった要素（読めないものは飛ばす）
+        out = []
+        for start, end in self._items:
+            try:
+                out.append(json.loads(self.text[start:end]))
+            except ValueError:
+                continue
+        return out
+
+    def fields(self):
+        # 外側がオブジェクトの時：閉じ終わった "キー": 値
+        out = {}
+        for start, end in self._items:
+            try:
+                out.update(json.loads("{" + self.text[start:end] + "}"))
+            except ValueError:
+                continue
+        return out
+
+# === 🧱 読み取った値 → dataclass ===
+def _build(cls, value):
+    if not isinstance(value, dict): return None
+    names = {f.name for f in dataclasses.fields(cls)}
+    kwargs = {k: str(v).strip() for k, v in value.items() if k in names and v is not None}
+    for f in dataclasses.fields(cls):
+        if f.default is dataclasses.MISSING and not kwargs.get(f.name): return None
+    return cls(**kwargs)
+
+def _legacy(cls, text, many):
+    # JSON モードに対応していない時の、今までの形（<タグ>…</タグ> / "英語 || 日本語" の行）
+    names = [f.name for f in dataclasses.fields(cls)]
+    if many:
+        rows = [line.split("||", 1) for line in text.splitlines() if "||" in line]
+        return [item for item in (_build(cls, dict(zip(names, row))) for row in rows) if item]
+    tags = {name: m.group(1) for name in names for m in [re.search(f"<{name}>(.*?)</{name}>", text, re.DOTALL)] if m}
+    return _build(cls, tags)
+
+def _collect(scanner, cls, many):
+    if many:
+        values = scanner.items()
+        items = [item for item in (_build(cls, v) for v in values) if item]
+        return items, not scanner.complete or len(items) < len(values)
+    return _build(cls, scanner.fields()), not scanner.complete
+
+def parse(text, cls, many=False):
+    # (結果, 一部だけ拾ったか)。読めない時は (None / [], True)
+    # 答えは1回だけなめる。前置きの [ や { で外側を取り違えたら、その続きから読み直す
+    text = text or ""
+    scanner = JSONScanner("[" if many else "{")
+    scanner.feed(text)
+    restarted = False
+    while True:
+        result, partial = _collect(scanner, cls, many)
+        if result: return result, partial or restarted
+        if not scanner.complete: break
+        scanner.restart()
+        restarted = True
+    return _legacy(cls, text, many), True
+
+def _run(send, rewind, cls, many, feature):
+    _count(feature, "calls")
+    message_note = ""
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            _count(feature, "retried")
+            rewind()
+            message_note = RETRY_NOTE
+        result, partial = parse(send(message_note), cls, many)
+        if result:
+            _count(feature, "recovered" if partial else "ok")
+            return result
+    _count(feature, "failed")
+    raise StructuredOutputError(f"{cls.__name__} として読み取れませんでした（{MAX_RETRIES + 1}回）")
+
+# 🔍 1回きりの生成。many=True なら dataclass のリスト
+def generate_structured(prompt, cls, many=False, model_name=llm.DEFAULT_MODEL, system_instruction=None, feature=None):
+    config = generation_config(cls, many)
+    return _run(lambda note: llm.generate(prompt + note, model_name, system_instruction, feature, config),
+                lambda: None, cls, many, feature)
+
+# 💬 チャットで送る。読めなかった答えは履歴から外してから聞き直す
+def send_structured(chat, message, cls, many=False, feature=None):
+    config = generation_config(cls, many)
+    return _run(lambda note: llm.send_message(chat, message + note, feature, config),
+                lambda: llm.rewind_chat(chat), cls, many, feature)
+
+def as_dict(result):
+    return [dataclasses.asdict(r) for r in result] if isinstance(result, list) else dataclasses.asdict(result)
@@ -0,0 +1,72 @@
+import os
+
+# === 🐢 ローカル速度変換（WSOLA）：+0% の音声1本から、ゆっくり版を手元で作る ===
+# edge-tts に速度ごとに頼み直すと、速度を変えるたびに台本まるごと再通信になる。
+# ここでは MP3 を PCM に戻し、音程を変えずに伸び縮みさせて（WSOLA）、MP3 に戻す。
+# numpy / miniaudio / lameenc が無い環境では available() が False になり、従来どおり edge-tts の rate を使う。
+try:
+    import numpy as np
+    import miniaudio
+    import lameenc
+except ImportError:
+    np = None
+
+SAMPLE_RATE = 24000          # edge-tts の audio-24khz-48kbitrate-mono-mp3 に合わせる
+BITRATE_KBPS = 48
+WINDOW = 960                 # 40ms
+TOLERANCE = 240              # ±10ms の範囲で一番なめらかにつながる位置を探す
+ENABLED = os.environ.get("TTS_LOCAL_STRETCH", "1") != "0"
+# LAME のエンコーダ遅延（先頭に入る無音）。単語の時刻をずらす時に足す
+ENCODER_DELAY = 1105 / SAMPLE_RATE
+
+def available():
+    return ENABLED and np is not None
+
+def rate_to_speed(rate):
+    # "-25%" -> 0.75, "+0%" -> 1.0
+    return 1.0 + int(rate.rstrip("%")) / 100.0
+
+def wsola(x, speed, window=WINDOW, tolerance=TOLERANCE):
+    if speed == 1.0 or len(x) < window * 2:
+        return x.copy()
+    syn_hop = window // 2
+    ana_hop = syn_hop * speed
+    win = np.hanning(window).astype(np.float32)
+    n_frames = int((len(x) - window - tolerance) / ana_hop)
+    if n_frames < 1:
+        return x.copy()
+    out = np.zeros(n_frames * syn_hop + window, dtype=np.float32)
+    norm = np.zeros_like(out)
+    padded = np.concatenate([np.zeros(tolerance, dtype=np.float32), x, np.zeros(window + tolerance, dtype=np.float32)])
+    prev = 0  # 直前に採用した入力位置（padded 上、tolerance 分ずれている）
+    for k in range(n_frames):
+        nominal = int(k * ana_hop) + tolerance
+        if k == 0:
+            pos = nominal
+        else:
+            # 直前フレームの「自然な続き」と一番似ている候補位置を相互相関で選ぶ
+            ref = padded[prev + syn_hop:prev + syn_hop + window]
+            region = padded[nominal - tolerance:nominal + tolerance + window]
+            corr = np.correlate(region, ref, mode="valid")
+            pos = nominal - tolerance + int(np.argmax(corr))
+        out[k * syn_hop:k * syn_hop + window] += padded[pos:pos + window] * win
+        norm[k * syn_hop:k * syn_hop + window] += win
+        prev = pos
+    norm[norm < 1e-3] = 1.0
+    return out / norm
+
+def stretch_mp3(mp3_bytes, speed):
+    decoded = miniaudio.decode(bytes(mp3_bytes), output_format=miniaudio.SampleFormat.SIGNED16, nchannels=1, sample_rate=SAMPLE_RATE)
+    x = np.frombuffer(decoded.samples, dtype=np.int16).astype(np.float32) / 32768.0
+    y = wsola(x, speed)
+    pcm = (np.clip(y, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(BITRATE_KBPS)
+    encoder.set_in_sample_rate(SAMPLE_RATE)
+    encoder.set_channels(1)
+    encoder.set_quality(2)
+    return bytes(encoder.encode(pcm) + encoder.flush())
+
+def stretch_words(words, speed):
+    # 単語の時刻 [開始秒, 長さ秒, 単語] を、伸ばした音声に合わせて付け替える
+    return [[offset / speed + ENCODER_DELAY, length / speed, word] for offset, length, word in words]
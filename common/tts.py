@@ -0,0 +1,427 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import re
+import struct
+import threading
+import time
+import edge_tts
+
+from common import timestretch, tts_pool, usage
+from common.mp3 import concat_mp3, duration, slice_mp3
+from common.tts_store import get_store, make_key
+
+DEFAULT_VOICE = "en-US-AriaNeural"
+# 同時に投げる edge-tts リクエストの上限（プロセス全体で共有）
+MAX_CONCURRENCY = int(os.environ.get("TTS_MAX_CONCURRENCY", 4))
+# edge-tts の WebSocket をプールして使い回す（TTS_POOL=0 で毎回つなぎ直す従来の方式）
+POOL_ENABLED = os.environ.get("TTS_POOL", "1") != "0"
+
+# === 🧹 読み上げ用のテキスト整形 ===
+def clean_text_for_tts(text):
+    text = re.sub(r'[*_#~]', '', text)
+    text = re.sub(r"(?<!\w)['\"]|['\"](?!\w)", '', text)
+    return text.strip()
+
+# シャドーイングの split_script_into_blocks と同じ区切り方で文に分ける
+def split_sentences(text):
+    return [s for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+
+def sentence_segments(text):
+    return [seg for seg in (clean_text_for_tts(s) for s in split_sentences(text)) if seg]
+
+def _communicate(text, voice, rate):
+    try:
+        return edge_tts.Communicate(text, voice, rate=rate, boundary="WordBoundary")
+    except TypeError:  # boundary 引数が無い古い edge-tts は、最初から WordBoundary を送ってくる
+        return edge_tts.Communicate(text, voice, rate=rate)
+
+# 音声と一緒に、単語ごとの時刻 [開始秒, 長さ秒, 単語] も受け取る（今までは捨てていた）
+async def _generate(text, voice, rate):
+    if POOL_ENABLED:
+        try:
+            return await tts_pool.get_pool().synthesize(text, voice, rate)
+        except Exception:
+            pass  # プールで失敗した時は、従来どおり edge_tts.Communicate で1回つなぐ
+    communicate = _communicate(text, voice, rate)
+    # bytes の += は毎回バッファ全体をコピーするので、チャンクを貯めて最後に1回だけ join
+    chunks, words = [], []
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            chunks.append(chunk["data"])
+        elif chunk["type"] == "WordBoundary":
+            words.append([chunk["offset"] / 1e7, chunk["duration"] / 1e7, chunk["text"]])
+    return b"".join(chunks), words
+
+# _generate と同じだが、音声チャンクを届いた順に返す（単語の時刻は words に足していく）
+async def _stream_chunks(text, voice, rate, words):
+    started = False
+    if POOL_ENABLED:
+        try:
+            async for kind, data in tts_pool.get_pool().stream(text, voice, rate):
+                if kind == "audio":
+                    started = True
+                    yield data
+                else:
+                    words.append(data)
+            return
+        except Exception:
+            if started: raise  # 流し始めた後は、やり直すと音が二重になる
+            words.clear()
+    async for chunk in _communicate(text, voice, rate).stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+        elif chunk["type"] == "WordBoundary":
+            words.append([chunk["offset"] / 1e7, chunk["duration"] / 1e7, chunk["text"]])
+
+# 単語の時刻は音声と同じエントリに入れる（別エントリだと、LRU で時刻だけ捨てられて音声だけ残ることがある）
+#   b"TTSW" + 時刻の JSON の長さ(uint32) + 時刻の JSON + MP3
+RECORD_MAGIC = b"TTSW"
+
+def pack_record(audio, words):
+    meta = json.dumps(words or []).encode("utf-8")
+    return RECORD_MAGIC + struct.pack("<I", len(meta)) + meta + bytes(audio)
+
+def unpack_record(data):
+    # (音声, 単語の時刻)。時刻の入っていない古い形のエントリは (音声, None)
+    data = bytes(data)
+    if not data.startswith(RECORD_MAGIC): return data, None
+    n = struct.unpack_from("<I", data, 4)[0]
+    return data[8 + n:], json.loads(data[8:8 + n])
+
+# 古い形：時刻を別エントリに置いていた頃のキー（読むだけ）
+def words_key(key):
+    return f"{key}.words"
+
+# === 🎙️ TTSサービス：プロセスに1本だけイベントループのスレッドを立てて使い回す ===
+# 呼び出し側には concurrent.futures.Future を返すので、Streamlit のスクリプトスレッドは
+# 必要になるまで待たなくてよい。同じ (text, voice, rate) の合成中リクエストは1本にまとめる。
+class TTSService:
+    def __init__(self, store=None, max_concurrency=MAX_CONCURRENCY, synthesize=_generate):
+        self.store = store if store is not None else get_store()
+        self.synthesize = synthesize
+        self._loop = asyncio.new_event_loop()
+        self._sem = asyncio.Semaphore(max(1, max_concurrency))
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True, name="tts-service")
+        self._thread.start()
+
+    def submit(self, text, voice=DEFAULT_VOICE, rate="+0%", tags=None):
+        # ゆっくり版は +0% を1回だけ合成して手元で伸ばす（速度ごとに別キーで保存）
+        # tags は台帳用のページ名など（サービスのループからは呼び出し元のページが見えないので、ここで受け取っておく）
+        tags = tags if tags is not None else usage.current()
+        local_stretch = rate != "+0%" and timestretch.available()
+        key = make_key(text, voice, f"{rate}@wsola" if local_stretch else rate)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None: return future
+            record = self.store.get(key)
+            if record is not None:
+                future = concurrent.futures.Future()
+                future.set_result(unpack_record(record)[0])
+                return future
+            coro = self._run_stretched(key, text, voice, rate, tags) if local_stretch else self._run(key, text, voice, rate, tags)
+            future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _f: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    async def _run(self, key, text, voice, rate, tags):
+        async with self._sem:
+            started = time.perf_counter()
+            try:
+                audio, words = await self.synthesize(text, voice, rate)
+            except Exception:
+                usage.record("edge-tts", "tts", voice, time.perf_counter() - started, ok=False, tags=tags)
+                raise
+            usage.record("edge-tts", "tts", voice, time.perf_counter() - started, nbytes=len(audio), tags=tags)
+        # ファイル書き込みでループを止めないよう、ストアへの保存は別スレッドで
+        await self._loop.run_in_executor(None, self._save, key, audio, words)
+        return audio
+
+    async def _run_stretched(self, key, text, voice, rate, tags):
+        base = await asyncio.wrap_future(self.submit(text, voice, "+0%", tags))
+        speed = timestretch.rate_to_speed(rate)
+        audio = await self._loop.run_in_executor(None, timestretch.stretch_mp3, base, speed)
+        words = timestretch.stretch_words(self.words(text, voice, "+0%") or [], speed)
+        await self._loop.run_in_executor(None, self._save, key, audio, words)
+        return audio
+
+    async def stream(self, text, voice=DEFAULT_VOICE, rate="+0%", tags=None):
+        feed = SentenceFeed(voice, rate, service=self, tags=tags)
+        for seg in sentence_segments(text): feed.push(seg)
+        feed.close()
+        async for chunk in self.stream_feed(feed):
+            yield chunk
+
+    async def stream_feed(self, feed):
+        # 📡 呼び出し側のイベントループ（Web サーバー）で回す非同期ジェネレーター。MP3 のバイト列を順に返す
+        # 1文目は edge-tts から届いたチャンクをそのまま流し、2文目以降は feed に入った時点で投げてある合成を順番に待って流す
+        index = 0
+        try:
+            while True:
+                item = await feed.get(index)
+                if item is None: return
+                text, future = item
+                sent, arrived = [], None
+                if future is None:
+                    async for chunk in self._stream_direct(text, feed.voice, feed.rate, feed.tags):
+                        arrived = arrived or time.time()
+                        sent.append(chunk)
+                        yield chunk
+                else:
+                    audio = concat_mp3([await asyncio.wrap_future(future)])
+                    arrived = time.time()
+                    sent.append(audio)
+                    yield audio
+                if arrived: feed.sent(b"".join(sent), arrived)
+                index += 1
+        finally:
+            feed.drain()
+
+    async def _stream_direct(self, text, voice, rate, tags):
+        key = make_key(text, voice, rate)
+        with self._lock:
+            known = key in self._inflight or key in self.store
+        if known or (rate != "+0%" and timestretch.available()):
+            # ストアにある・合成中・手元で伸ばす必要がある時は、サービス経由で1文まるごと待つ
+            yield concat_mp3([await asyncio.wrap_future(self.submit(text, voice, rate, tags))])
+            return
+        chunks, words = [], []
+        started = time.perf_counter()
+        async for chunk in _stream_chunks(text, voice, rate, words):
+            chunks.append(chunk)
+            yield chunk
+        usage.record("edge-tts", "tts_stream", voice, time.perf_counter() - started, nbytes=sum(map(len, chunks)), tags=tags)
+        await asyncio.get_running_loop().run_in_executor(None, self._save, key, b"".join(chunks), words)
+
+    def _save(self, key, audio, words):
+        self.store.put(key, pack_record(audio, words))
+
+    def words(self, text, voice=DEFAULT_VOICE, rate="+0%"):
+        if rate != "+0%" and timestretch.available(): rate = f"{rate}@wsola"
+        key = make_key(text, voice, rate)
+        record = self.store.get(key)
+        words = unpack_record(record)[1] if record is not None else None
+        if words is None:
+            data = self.store.get(words_key(key))
+            words = json.loads(bytes(data)) if data else None
+        return words
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_tts_service():
+    global _service
+    with _service_lock:
+        if _service is None: _service = TTSService()
+        return _service
+
+# === 🧵 あとから1文ずつ足していける読み上げ待ち行列 ===
+# スクリプトのスレッドが push し、Web サーバーのループが stream_feed で順に取り出す。
+# 1文目はストリーミング側で edge-tts から直接流すので、2文目以降だけ push した時点で合成を始めておく
+FEED_IDLE_TIMEOUT = 30   # 閉じられないまま、この秒数だれも push しなければ打ち切る
+
+class SentenceFeed:
+    def __init__(self, voice=DEFAULT_VOICE, rate="+0%", service=None, tags=None):
+        self.voice = voice
+        self.rate = rate
+        self.service = service or get_tts_service()
+        self.tags = tags if tags is not None else usage.current()
+        self._items = []   # (text, future or None)
+        self._closed = False
+        self._lock = threading.Lock()
+        self._touched = time.monotonic()
+        self._ends = None       # 送った音声をブラウザが言い終わる時刻の見込み（time.time()）
+        self._drained = False   # stream_feed が最後まで送り終えた（または接続が切れた）
+
+    def push(self, text):
+        with self._lock:
+            future = self.service.submit(text, self.voice, self.rate, self.tags) if self._items else None
+            self._items.append((text, future))
+            self._touched = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def sent(self, audio, arrived):
+        # 1文送るごとに。ブラウザは、前の文を言い終わるか、この文が届くかの遅い方から読み始める
+        with self._lock:
+            self._ends = max(self._ends or arrived, arrived) + duration(audio)
+
+    def drain(self):
+        with self._lock:
+            self._drained = True
+
+    def playing_until(self):
+        # 送り終えていれば、言い終わる時刻の見込み。まだ送っている途中（だれも取りに来ていない時も）は None
+        with self._lock:
+            if not self._drained: return None
+            return self._ends or time.time()
+
+    async def get(self, index, poll=0.03):
+        while True:
+            with self._lock:
+                if index < len(self._items): return self._items[index]
+                if self._closed or time.monotonic() - self._touched > FEED_IDLE_TIMEOUT: return None
+            await asyncio.sleep(poll)
+
+# 🗣️ LLM の返事を流しながら、markers（[英語の質問] など）より後ろの英文を、言い終わった文から feed に入れていく
+class ReplySpeaker:
+    def __init__(self, markers, voice=DEFAULT_VOICE, rate="+0%"):
+        self.markers = markers
+        self.feed = SentenceFeed(voice, rate)
+        self.buffer = ""
+        self.done = 0   # feed に渡し終えた文の数（split_sentences の数え方）
+
+    def _body(self):
+        found = [(self.buffer.find(m), m) for m in self.markers if m in self.buffer]
+        if not found: return None
+        pos, marker = min(found)
+        return self.buffer[pos + len(marker):]
+
+    def _push_until(self, sentences):
+        for sentence in sentences[self.done:]:
+            seg = clean_text_for_tts(sentence)
+            if seg: self.feed.push(seg)
+        self.done = max(self.done, len(sentences))
+
+    def add(self, piece):
+        self.buffer += piece
+        body = self._body()
+        if body is None: return
+        # 最後の1文はまだ続きが来るかもしれないので、次の文が始まるまで待つ
+        self._push_until(split_sentences(body)[:-1])
+
+    def finish(self):
+        body = self._body()
+        if body is not None: self._push_until(split_sentences(body))
+        self.feed.close()
+
+    @property
+    def found(self):
+        return self._body() is not None
+
+    @property
+    def english(self):
+        return self._body() or ""
+
+    @property
+    def started(self):
+        return len(self.feed) > 0
+
+# ✨ (text, voice, rate) のハッシュで永続ストアを引き、無い時だけ edge-tts で作る
+# → ページをまたいでも、サーバーを再起動しても、同じ文は二度と合成しない
+def get_tts_audio(text, voice=DEFAULT_VOICE, rate="+0%"):
+    return get_tts_service().submit(text, voice, rate).result()
+
+# 📜 長い文章は1文ずつの音声（ストアに個別に残る）を作って、MP3フレームの境目でつなぐ
+# → 台本を1文だけ直しても、作り直すのはその1文だけ
+# 戻り値は (音声, [[開始秒, 終了秒, 単語], ...])。単語の時刻はつないだ後の位置にずらしてある
+def get_tts_timeline(text, voice=DEFAULT_VOICE, rate="+0%"):
+    service = get_tts_service()
+    segments = sentence_segments(text)
+    futures = [service.submit(seg, voice, rate) for seg in segments]
+    parts, words, t = [], [], 0.0
+    for seg, future in zip(segments, futures):
+        audio = future.result()
+        for offset, length, word in service.words(seg, voice, rate) or []:
+            words.append([t + offset, t + offset + length, word])
+        parts.append(audio)
+        t += duration(audio)
+    return concat_mp3(parts), words
+
+def get_long_tts_audio(text, voice=DEFAULT_VOICE, rate="+0%"):
+    return get_tts_timeline(text, voice, rate)[0]
+
+def _norm_word(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+def locate_spans(words, pieces):
+    # 各 piece（チャンクの英文）が、全体の単語列のどこからどこまでかを前から順に探す
+    tokens = [_norm_word(w) for _, _, w in words]
+    spans, cursor = [], 0
+    for piece in pieces:
+        piece_tokens = [t for t in (_norm_word(w) for w in piece.split()) if t]
+        if not piece_tokens or cursor >= len(tokens):
+            spans.append(None)
+            continue
+        window = tokens[cursor:cursor + len(piece_tokens) + 8]
+        start = cursor + window.index(piece_tokens[0]) if piece_tokens[0] in window else cursor
+        end = min(start + len(piece_tokens) - 1, len(tokens) - 1)
+        # 最後の単語は、チャンクの長さから見込んだ位置に近いものを取る（同じ単語が少し後にもう一度出ても、そこまで伸ばさない）
+        for j in (end, end + 1, end - 1, end + 2, end - 2, end + 3, end - 3):
+            if start <= j < len(tokens) and tokens[j] == piece_tokens[-1]:
+                end = j
+                break
+        spans.append((start, end))
+        cursor = end + 1
+    return spans
+
+# ✂️ 全文を1回合成した音声から、チャンクごとの音声を単語の時刻で切り出す（追加の通信なし）
+# 前後は隣の単語にかからない範囲で少し余白を付ける。見つからなかったチャンクは None
+def slice_tts_clips(text, pieces, voice=DEFAULT_VOICE, rate="+0%", pad=0.15):
+    audio, words = get_tts_timeline(text, voice, rate)
+    clips = []
+    for span in locate_spans(words, pieces):
+        if span is None:
+            clips.append(None)
+            continue
+        first, last = span
+        start = max(words[first][0] - pad, words[first - 1][1] if first > 0 else 0.0)
+        end = min(words[last][1] + pad, words[last + 1][0] if last + 1 < len(words) else words[last][1] + pad)
+        clips.append(slice_mp3(audio, start, end) or None)
+    return clips
+
+# ストアにあれば返すだけ（無ければ None。合成はしない）
+def peek_tts_audio(text, voice=DEFAULT_VOICE, rate="+0%"):
+    if rate != "+0%" and timestretch.available(): rate = f"{rate}@wsola"
+    record = get_store().get(make_key(text, voice, rate))
+    return unpack_record(record)[0] if record is not None else None
+
+# === 🚀 先読みジョブ：まとめてサービスに投げておき、描画側は終わった分だけ使う ===
+class PrefetchJob:
+    def __init__(self, texts, voice=DEFAULT_VOICE, rate="+0%", service=None):
+        self.texts = list(dict.fromkeys(t for t in texts if t))  # 重複と空文字を除く
+        self.voice = voice
+        self.rate = rate
+        self.service = service or get_tts_service()
+        self.futures = {}
+
+    @property
+    def total(self):
+        return len(self.texts)
+
+    @property
+    def done(self):
+        return sum(1 for f in self.futures.values() if f.done())
+
+    @property
+    def errors(self):
+        return {t: f.exception() for t, f in self.futures.items() if f.done() and f.exception() is not None}
+
+    def start(self):
+        for text in self.texts:
+            self.futures[text] = self.service.submit(text, self.voice, self.rate)
+        return self
+
+    def is_running(self):
+        return any(not f.done() for f in self.futures.values())
+
+def prefetch_tts(texts, voice=DEFAULT_VOICE, rate="+0%"):
+    return PrefetchJob(texts, voice, rate).start()
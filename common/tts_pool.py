@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import re
+import ssl
+import time
+import uuid
+import weakref
+from xml.sax.saxutils import escape
+
+import aiohttp
+from edge_tts import constants
+
+try:
+    from edge_tts.drm import DRM
+except ImportError:  # 古い edge-tts には Sec-MS-GEC トークンが無い
+    DRM = None
+
+try:
+    import certifi
+    _SSL_CTX = ssl.create_default_context(cafile=certifi.where())
+except ImportError:
+    _SSL_CTX = ssl.create_default_context()
+
+# === 🔌 edge-tts の WebSocket を使い回すコネクションプール ===
+# edge_tts.Communicate は1回の読み上げごとに TLS + WebSocket をつなぎ直す。
+# 同じ接続の上で speech.config を1回送れば、あとは SSML を送るたびに1ターン分の音声が返ってくるので、
+# 接続をプールに戻して次の読み上げでも使う。古すぎる・しばらく使っていない・切れている接続は捨てて張り直す。
+
+POOL_SIZE = int(os.environ.get("TTS_POOL_SIZE", 4))
+MAX_AGE = float(os.environ.get("TTS_POOL_MAX_AGE", 240))        # Sec-MS-GEC トークンの有効期間より短く
+IDLE_TIMEOUT = float(os.environ.get("TTS_POOL_IDLE_TIMEOUT", 60))
+RECEIVE_TIMEOUT = float(os.environ.get("TTS_POOL_RECEIVE_TIMEOUT", 60))
+# ローカルのモックサーバー（bench/mock_tts_server.py）に向ける時だけ指定する
+WSS_URL = os.environ.get("EDGE_TTS_WSS_URL", "")
+MAX_SSML_BYTES = 4096
+
+class PoolError(Exception):
+    pass
+
+def _voice_name(voice):
+    match = re.match(r"^([a-z]{2,})-([A-Z]{2,})-(.+Neural)$", voice)
+    if match is None: return voice
+    lang, region, name = match.groups()
+    if "-" in name:
+        region = f"{region}-{name[:name.find('-')]}"
+        name = name[name.find("-") + 1:]
+    return f"Microsoft Server Speech Text to Speech Voice ({lang}-{region}, {name})"
+
+def _timestamp():
+    return time.strftime("%a %b %d %Y %H:%M:%S GMT+0000 (Coordinated Universal Time)", time.gmtime())
+
+def _parse_headers(data):
+    headers = {}
+    for line in data.split(b"\r\n"):
+        if b":" in line:
+            key, value = line.split(b":", 1)
+            headers[key] = value
+    return headers
+
+class EdgeConnection:
+    def __init__(self, session, ws):
+        self.session = session
+        self.ws = ws
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.configured = False
+        self.requests = 0
+
+    def healthy(self):
+        now = time.monotonic()
+        return not self.ws.closed and now - self.created < MAX_AGE and now - self.last_used < IDLE_TIMEOUT
+
+    async def close(self):
+        try:
+            await self.ws.close()
+        finally:
+            await self.session.close()
+
+    async def stream(self, text, voice, rate):
+        # 1ターン分のメッセージを、届いた順に ("audio", bytes) / ("word", [開始秒, 長さ秒, 単語]) で返す
+        if not self.configured:
+            await self.ws.send_str(
+                f"X-Timestamp:{_timestamp()}\r\n"
+                "Content-Type:application/json; charset=utf-8\r\n"
+                "Path:speech.config\r\n\r\n"
+                '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+                '"sentenceBoundaryEnabled":"false","wordBoundaryEnabled":"true"},'
+                '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"}}}}\r\n'
+            )
+            self.configured = True
+        request_id = uuid.uuid4().hex
+        ssml = (
+            "<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>"
+            f"<voice name='{_voice_name(voice)}'><prosody pitch='+0Hz' rate='{rate}' volume='+0%'>"
+            f"{escape(text)}</prosody></voice></speak>"
+        )
+        await self.ws.send_str(
+            f"X-RequestId:{request_id}\r\nContent-Type:application/ssml+xml\r\n"
+            f"X-Timestamp:{_timestamp()}Z\r\nPath:ssml\r\n\r\n{ssml}"
+        )
+        got_audio = False
+        while True:
+            msg = await self.ws.receive(timeout=RECEIVE_TIMEOUT)
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                raw = msg.data.encode("utf-8")
+                sep = raw.find(b"\r\n\r\n")
+                headers, body = _parse_headers(raw[:sep]), raw[sep + 4:]
+                if headers.get(b"X-RequestId", request_id.encode()) != request_id.encode():
+                    continue  # 前のターンの残り
+                path = headers.get(b"Path")
+                if path == b"audio.metadata":
+                    for meta in json.loads(body)["Metadata"]:
+                        if meta["Type"] == "WordBoundary":
+                            data = meta["Data"]
+                            yield "word", [data["Offset"] / 1e7, data["Duration"] / 1e7, data["text"]["Text"]]
+                elif path == b"turn.end":
+                    break
+            elif msg.type == aiohttp.WSMsgType.BINARY:
+                if len(msg.data) < 2: raise PoolError("binary message without header length")
+                header_length = int.from_bytes(msg.data[:2], "big")
+                headers = _parse_headers(msg.data[2:2 + header_length])
+                if headers.get(b"X-RequestId", request_id.encode()) != request_id.encode():
+                    continue
+                if headers.get(b"Path") == b"audio" and headers.get(b"Content-Type") == b"audio/mpeg":
+                    payload = msg.data[2 + header_length:]
+                    if payload:
+                        got_audio = True
+                        yield "audio", payload
+            else:
+                raise PoolError(f"connection closed: {msg.type}")
+        if not got_audio: raise PoolError("no audio received")
+        self.requests += 1
+        self.last_used = time.monotonic()
+
+    async def synthesize(self, text, voice, rate):
+        chunks, words = [], []
+        async for kind, data in self.stream(text, voice, rate):
+            if kind == "audio": chunks.append(data)
+            else: words.append(data)
+        return b"".join(chunks), words
+
+class EdgeTTSPool:
+    def __init__(self, size=POOL_SIZE, url=WSS_URL):
+        self.size = max(1, size)
+        self.url = url
+        self._idle = []
+        self._slots = asyncio.Semaphore(self.size)
+        self.stats = {"requests": 0, "connects": 0, "reused": 0, "reconnects": 0, "failures": 0}
+
+    def _connect_url(self):
+        if self.url:
+            return f"{self.url}{'&' if '?' in self.url else '?'}ConnectionId={uuid.uuid4().hex}"
+        url = f"{constants.WSS_URL}&ConnectionId={uuid.uuid4().hex}"
+        if DRM is not None:
+            url += f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}&Sec-MS-GEC-Version={constants.SEC_MS_GEC_VERSION}"
+        return url
+
+    async def _open(self, retried_403=False):
+        headers = DRM.headers_with_muid(constants.WSS_HEADERS) if DRM is not None and hasattr(DRM, "headers_with_muid") else constants.WSS_HEADERS
+        session = aiohttp.ClientSession(trust_env=True)
+        try:
+            # heartbeat で ping/pong を続け、黙って切れた接続を検出する
+            ws = await session.ws_connect(self._connect_url(), compress=15, headers=headers, heartbeat=20,
+                                          ssl=None if self.url.startswith("ws://") else _SSL_CTX)
+        except aiohttp.WSServerHandshakeError as e:
+            await session.close()
+            if e.status == 403 and not retried_403 and DRM is not None and hasattr(DRM, "handle_client_response_error"):
+                DRM.handle_client_response_error(e)  # 時計ずれを補正してもう1回だけ（edge_tts と同じ）
+                return await self._open(retried_403=True)
+            raise  # 2回目の 403 はそのまま投げて、呼び出し側の edge_tts.Communicate に切り替えてもらう
+        except Exception:
+            await session.close()
+            raise
+        self.stats["connects"] += 1
+        return EdgeConnection(session, ws)
+
+    async def _acquire(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if conn.healthy():
+                self.stats["reused"] += 1
+                return conn
+            await conn.close()
+        return await self._open()
+
+    async def synthesize(self, text, voice, rate):
+        if len(escape(text).encode("utf-8")) > MAX_SSML_BYTES:
+            raise PoolError("text too long for a single turn")
+        self.stats["requests"] += 1
+        async with self._slots:
+            for attempt in range(2):
+                conn = await self._acquire()
+                try:
+                    result = await conn.synthesize(text, voice, rate)
+                except Exception:
+                    self.stats["failures"] += 1
+                    await conn.close()
+                    if attempt == 1: raise
+                    self.stats["reconnects"] += 1  # 使い回しの接続が切れていた時は、新しい接続で1回だけやり直す
+                    continue
+                self._idle.append(conn)
+                return result
+
+    async def stream(self, text, voice, rate):
+        # synthesize と同じだが、音声チャンクを届いた順にそのまま流す。
+        # やり直せるのは最初のチャンクを渡す前だけ（渡した後に切れたら、そのまま例外にする）
+        if len(escape(text).encode("utf-8")) > MAX_SSML_BYTES:
+            raise PoolError("text too long for a single turn")
+        self.stats["requests"] += 1
+        async with self._slots:
+            for attempt in range(2):
+                conn = await self._acquire()
+                started = finished = False
+                try:
+                    async for item in conn.stream(text, voice, rate):
+                        started = True
+                        yield item
+                    finished = True
+                except Exception:
+                    self.stats["failures"] += 1
+                    if started or attempt == 1: raise
+                    self.stats["reconnects"] += 1
+                    continue
+                finally:
+                    # 途中で止まった接続（聞き手が離れた時も含む）はターンの残りが届くので使い回さない
+                    if finished: self._idle.append(conn)
+                    else: await conn.close()
+                return
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+
+# イベントループごとに1つ（TTSService の常駐ループなら、プロセスに1つ）
+_pools = weakref.WeakKeyDictionary()
+
+def get_pool():
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = EdgeTTSPool(url=WSS_URL)
+    return pool
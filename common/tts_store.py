@@ -0,0 +1,176 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間ロックなし（プロセス内ロックのみ）
+    fcntl = None
+
+# === 💾 TTS音声の永続ストア（全ページ・全サーバープロセスで共有） ===
+# pack.bin  : 音声データを後ろに追記していくだけのパックファイル（読み出しは mmap）
+# index.json: key -> {"o": 開始位置, "n": バイト数, "t": 最終アクセス時刻}
+# 合計バイト数が上限を超えたら、最近使われていないものから捨てて詰め直す（LRU）
+
+CACHE_ROOT = os.environ.get("APP_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+STORE_DIR = os.environ.get("TTS_STORE_DIR", os.path.join(CACHE_ROOT, "tts"))
+MAX_BYTES = int(os.environ.get("TTS_STORE_MAX_BYTES", 300 * 1024 * 1024))
+
+def make_key(text, voice, rate):
+    raw = json.dumps([text, voice, rate], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class TTSStore:
+    def __init__(self, directory=STORE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.pack_path = os.path.join(directory, "pack.bin")
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock_path = os.path.join(directory, "store.lock")
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._generation = 0
+        self._index_mtime = None
+        self._mm = None
+        self._mm_file = None
+        self._mm_generation = None
+        with self._lock:
+            self._reload_index()
+
+    # --- プロセス間ロック（書き込みと詰め直しの時だけ取る） ---
+    def _file_lock(self):
+        store = self
+        class _Lock:
+            def __enter__(self):
+                self.f = open(store.lock_path, "a+")
+                if fcntl: fcntl.flock(self.f, fcntl.LOCK_EX)
+                return self
+            def __exit__(self, *exc):
+                if fcntl: fcntl.flock(self.f, fcntl.LOCK_UN)
+                self.f.close()
+        return _Lock()
+
+    def _reload_index(self, force=False):
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if not force and mtime == self._index_mtime:
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # 自分のプロセスで付けたアクセス時刻は消さずに引き継ぐ
+        old = self._entries
+        entries = data.get("entries", {})
+        for key, entry in entries.items():
+            if key in old and data.get("generation") == self._generation:
+                entry["t"] = max(entry.get("t", 0), old[key].get("t", 0))
+        self._entries = entries
+        self._generation = data.get("generation", 0)
+        self._index_mtime = mtime
+
+    def _write_index(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"generation": self._generation, "entries": self._entries}, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def _mapped(self, end):
+        # パックが伸びた・作り直された時だけ mmap を張り直す
+        if self._mm is not None and self._mm_generation == self._generation and len(self._mm) >= end:
+            return self._mm
+        self._close_map()
+        self._mm_file = open(self.pack_path, "rb")
+        size = os.fstat(self._mm_file.fileno()).st_size
+        if size == 0:
+            self._close_map()
+            return None
+        self._mm = mmap.mmap(self._mm_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mm_generation = self._generation
+        return self._mm
+
+    def _close_map(self):
+        if self._mm is not None: self._mm.close()
+        if self._mm_file is not None: self._mm_file.close()
+        self._mm = None
+        self._mm_file = None
+
+    def get(self, key):
+        with self._lock:
+            # 他のプロセスが詰め直した後に古い位置を読まないよう、毎回 index の更新を確認（stat 1回だけ）
+            self._reload_index()
+            entry = self._entries.get(key)
+            if entry is None: return None
+            try:
+                mm = self._mapped(entry["o"] + entry["n"])
+            except FileNotFoundError:
+                return None
+            if mm is None or len(mm) < entry["o"] + entry["n"]:
+                return None
+            entry["t"] = time.time()
+            return mm[entry["o"]:entry["o"] + entry["n"]]
+
+    def __contains__(self, key):
+        with self._lock:
+            if key not in self._entries: self._reload_index()
+            return key in self._entries
+
+    def put(self, key, data):
+        if not data: return
+        with self._lock, self._file_lock():
+            self._reload_index()
+            if key in self._entries:
+                self._entries[key]["t"] = time.time()
+                return
+            with open(self.pack_path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+            self._entries[key] = {"o": offset, "n": len(data), "t": time.time()}
+            if self.total_bytes() > self.max_bytes:
+                self._evict_and_compact()
+            self._write_index()
+
+    def total_bytes(self):
+        return sum(e["n"] for e in self._entries.values())
+
+    def _evict_and_compact(self):
+        # 上限の 8 割まで古い順に捨ててから、生き残りだけで新しいパックを作る
+        target = int(self.max_bytes * 0.8)
+        survivors = sorted(self._entries.items(), key=lambda kv: kv[1]["t"], reverse=True)
+        kept, total = [], 0
+        for key, entry in survivors:
+            if total + entry["n"] > target: continue
+            kept.append((key, entry))
+            total += entry["n"]
+        kept.sort(key=lambda kv: kv[1]["o"])
+        tmp_path = f"{self.pack_path}.{os.getpid()}.tmp"
+        new_entries = {}
+        with open(self.pack_path, "rb") as src, open(tmp_path, "wb") as dst:
+            for key, entry in kept:
+                src.seek(entry["o"])
+                new_entries[key] = dict(entry, o=dst.tell())
+                dst.write(src.read(entry["n"]))
+        os.replace(tmp_path, self.pack_path)
+        self._entries = new_entries
+        self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.total_bytes(), "max_bytes": self.max_bytes}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None: _store = TTSStore()
+        return _store
@@ -0,0 +1,125 @@
+import collections
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+from common.tts_store import CACHE_ROOT
+
+# === 💰 通信ごとの トークン・時間・コスト の台帳 ===
+# Gemini と edge-tts の呼び出し1回ごとに、ページ・機能・モデル・トークン数（usage_metadata）・バイト数・かかった時間を
+# 追記専用の JSONL（.cache/usage/ledger.jsonl）に1行ずつ書く。
+# ページはスクリプトの先頭で set_page()、機能は llm の各関数の feature= で付ける。
+# サイドバーには、この会話（セッション）で機能ごとにどれだけ使ったかを出す。
+#   python -m common.usage  … 台帳全体を機能ごとに集計して表示
+
+LEDGER_PATH = os.environ.get("USAGE_LEDGER_PATH", os.path.join(CACHE_ROOT, "usage", "ledger.jsonl"))
+ENABLED = os.environ.get("USAGE_LEDGER", "1") != "0"
+# 100万トークンあたりの料金（USD）。入力 / 出力 / キャッシュ済み入力
+PRICES = {
+    "gemini-2.5-flash": (0.30, 2.50, 0.075),
+    "gemini-2.5-flash-lite": (0.10, 0.40, 0.025),
+}
+
+_tags = contextvars.ContextVar("usage_tags", default=None)
+_runs = itertools.count(1)   # スクリプトの実行ごとの通し番号（同じ実行で描いたものをまとめる時に使う）
+_lock = threading.Lock()
+_sessions = collections.defaultdict(lambda: collections.defaultdict(collections.Counter))   # session -> feature -> 合計
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else "local"
+    except Exception:
+        return "local"
+
+def set_page(page):
+    _tags.set({"page": page, "session": _session_id(), "run": next(_runs)})
+
+def current():
+    return dict(_tags.get() or {})
+
+def cost_usd(model, prompt_tokens, candidate_tokens, cached_tokens=0):
+    price = PRICES.get(model.split("/")[-1])   # ChatSession のモデル名は "models/gemini-2.5-flash"
+    if price is None: return 0.0
+    fresh = max(0, prompt_tokens - cached_tokens)
+    return (fresh * price[0] + candidate_tokens * price[1] + cached_tokens * price[2]) / 1e6
+
+def usage_counts(usage_metadata):
+    # genai の usage_metadata（無い時は 0）
+    if usage_metadata is None: return 0, 0, 0
+    return (getattr(usage_metadata, "prompt_token_count", 0) or 0,
+            getattr(usage_metadata, "candidates_token_count", 0) or 0,
+            getattr(usage_metadata, "cached_content_token_count", 0) or 0)
+
+def record(service, kind, model, seconds, feature=None, ok=True, prompt_tokens=0, candidate_tokens=0, cached_tokens=0,
+           nbytes=0, tags=None, bytes_in=None):
+    # bytes は送った（音声合成なら受け取った）バイト数。bytes_in は送る前に小さくした時の元のバイト数（文字起こしの録音）
+    tags = tags if tags is not None else current()
+    entry = {
+        "ts": round(time.time(), 3), "service": service, "kind": kind, "page": tags.get("page", ""),
+        "feature": feature or tags.get("feature") or kind, "session": tags.get("session", ""), "model": model,
+        "ok": ok, "prompt_tokens": prompt_tokens, "candidate_tokens": candidate_tokens, "cached_tokens": cached_tokens,
+        "bytes": nbytes, "bytes_in": nbytes if bytes_in is None else bytes_in, "seconds": round(seconds, 4),
+        "cost_usd": round(cost_usd(model, prompt_tokens, candidate_tokens, cached_tokens), 8),
+    }
+    with _lock:
+        totals = _sessions[entry["session"]][(entry["page"], entry["feature"])]
+        totals.update(calls=1, errors=0 if ok else 1, prompt_tokens=prompt_tokens, candidate_tokens=candidate_tokens,
+                      cached_tokens=cached_tokens, bytes=nbytes, bytes_in=entry["bytes_in"], seconds=seconds,
+                      cost_usd=entry["cost_usd"])
+        if not ENABLED: return entry
+        try:
+            os.makedirs(os.path.dirname(LEDGER_PATH), exist_ok=True)
+            # 1行を1回の write で追記する（O_APPEND なので、別プロセスと行が混ざらない）
+            with open(LEDGER_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError:
+            pass  # 台帳に書けなくても、アプリは止めない
+    return entry
+
+def session_summary(session=None):
+    session = session if session is not None else current().get("session", "local")
+    with _lock:
+        return {key: dict(value) for key, value in _sessions.get(session, {}).items()}
+
+def ledger_totals(path=LEDGER_PATH):
+    totals = collections.defaultdict(collections.Counter)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue
+            totals[(e["page"], e["feature"], e["model"])].update(
+                calls=1, prompt_tokens=e["prompt_tokens"], candidate_tokens=e["candidate_tokens"],
+                cached_tokens=e["cached_tokens"], bytes=e["bytes"], bytes_in=e.get("bytes_in", e["bytes"]), seconds=e["seconds"],
+                cost_usd=e["cost_usd"])
+    return totals
+
+def render_usage_summary():
+    # サイドバー用：この会話で、機能ごとに使ったトークン・時間・コスト
+    import streamlit as st
+    rows = session_summary()
+    with st.expander("💰 この会話の通信量・コスト"):
+        if not rows:
+            st.caption("まだ通信していません。")
+            return
+        page = current().get("page", "")
+        table = [{"機能": feature if p == page else f"{p}: {feature}", "回数": t["calls"],
+                  "入力tok": t["prompt_tokens"], "出力tok": t["candidate_tokens"], "音声KB": round(t["bytes"] / 1024),
+                  "秒": round(t["seconds"], 1), "USD": round(t["cost_usd"], 5)}
+                 for (p, feature), t in sorted(rows.items(), key=lambda item: -item[1]["cost_usd"])]
+        st.dataframe(table, hide_index=True, use_container_width=True)
+        st.caption(f"合計 ${sum(t['cost_usd'] for t in rows.values()):.4f} / 待ち時間 {sum(t['seconds'] for t in rows.values()):.1f}秒")
+
+if __name__ == "__main__":
+    totals = ledger_totals()
+    print(f"{'page':<10} {'feature':<18} {'model':<24} {'calls':>6} {'in tok':>9} {'out tok':>8} {'bytes in':>10} {'bytes':>10} {'sec':>8} {'USD':>9}")
+    for (page, feature, model), t in sorted(totals.items(), key=lambda item: -item[1]["cost_usd"]):
+        print(f"{page:<10} {feature:<18} {model:<24} {t['calls']:>6} {t['prompt_tokens']:>9} {t['candidate_tokens']:>8} "
+              f"{t['bytes_in']:>10} {t['bytes']:>10} {t['seconds']:>8.1f} {t['cost_usd']:>9.4f}")
+    print(f"total ${sum(t['cost_usd'] for t in totals.values()):.4f}")
@@ -1,12 +1,16 @@
 import streamlit as st
-import google.generativeai as genai
-import PyPDF2
-import io
+from common import llm, usage
+import concurrent.futures
 import json
-import re
-from datetime import datetime
-import asyncio
-import edge_tts
+import time
+from common.tts import FEED_IDLE_TIMEOUT, ReplySpeaker, get_long_tts_audio
+from common.media_routes import audio_html, feed_audio_url, render_audio
+from common.lookup_cache import cached_generate, cached_generate_in_background, hit_rate_caption
+from common.dictionary import format_entry, local_lookup
+from common.retrieval import TOKEN_BUDGET, get_index
+from common.pronunciation import diff_html, judge, judge_message
+from common.context_window import ConversationMemory
+from common.pdf_pages import digest_of, iter_pages, page_count
 
 # === 🎨 画面デザインのカスタマイズ（CSS） ===
 st.markdown("""
@@ -26,51 +30,88 @@ if "log_save_count" not in st.session_state: st.session_state.log_save_count = 1
 # === 🔑 API設定 ===
 try:
     MY_API_KEY = st.secrets["GEMINI_API_KEY"]
+    llm.configure(MY_API_KEY)
 except Exception:
-    st.error("⚠️ StreamlitのSettingsから「Secrets」を開き、GEMINI_API_KEY を設定してください！")
-    st.stop()
-genai.configure(api_key=MY_API_KEY.strip())
+    if not llm.FAKE_BACKEND:  # LLM_BACKEND=fake の時はキー無しでも動かせる
+        st.error("⚠️ StreamlitのSettingsから「Secrets」を開き、GEMINI_API_KEY を設定してください！")
+        st.stop()
 
 # === 🧹 便利ツール（キャッシュで無駄を徹底削減！） ===
-def clean_text_for_tts(text):
-    text = re.sub(r'[*_#~]', '', text)
-    text = re.sub(r"(?<!\w)['\"]|['\"](?!\w)", '', text)
-    return text.strip()
-
-# ✨ スピード調整対応 ＆ キャッシュ化
-@st.cache_data
-def get_tts_audio(text, voice="en-US-AriaNeural", rate="+0%"):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    async def _generate():
-        communicate = edge_tts.Communicate(text, voice, rate=rate)
-        audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-        return audio_data
-    result = loop.run_until_complete(_generate())
-    loop.close()
+# 【無駄②解消】PDFのテキスト抽出をページごとにキャッシュ化（ファイルのハッシュ＋ページ番号で、ディスクに）
+def pdf_page_range(uploaded_file, key):
+    # 読み込むページの範囲（1始まり）。ページ数は最初の1回だけ数えて覚えておく
+    data = uploaded_file.getvalue()
+    count = page_count(data, digest_of(data, uploaded_file.file_id))
+    if count <= 1: return 1, count
+    return st.slider(f"📑 読み込むページ（全{count}ページ）", 1, count, (1, count), key=key)
+
+def read_pdf_pages(uploaded_file, first, last):
+    # ページごとにディスクに覚えておき、読めたページから進み具合を出す
+    data = uploaded_file.getvalue()
+    progress = st.empty()
+    pages = []
+    for page_no, text in iter_pages(data, digest_of(data, uploaded_file.file_id), first - 1, last - 1):
+        pages.append(text)
+        progress.caption(f"📄 {page_no + 1}ページ目まで読み込みました（{len(pages)}/{last - first + 1}）")
+    progress.empty()
+    return pages
+
+# 【無駄③解消】翻訳と辞書の通信結果をディスクにキャッシュ化（表記ゆれをそろえて、全ページ・再起動後も共有）
+TRANSLATE_PROMPT = "以下を日本語に翻訳して:\n{text}"
+
+def get_cached_translation(text, model_name):
+    return cached_generate("translate_ja", text, TRANSLATE_PROMPT, model_name)
+
+# 🌐 [英語の質問] は届いた時点で裏で訳しておく（終了後の復習リストと「日本語訳を見る」がすぐ出る）
+# 質問 → 訳し終わる Future の表をセッションに持つ。訳はディスクキャッシュにも入る
+def translate_question_in_background(response_text, model_name):
+    if "[英語の質問]" not in response_text: return
+    q = response_text.split("[英語の質問]")[1].strip()
+    if "rp_question_ja" not in st.session_state: st.session_state.rp_question_ja = {}
+    if q and q not in st.session_state.rp_question_ja:
+        st.session_state.rp_question_ja[q] = cached_generate_in_background("translate_ja", q, TRANSLATE_PROMPT, model_name)
+
+def question_translations(qs, timeout=llm.TIMEOUT):
+    # 質問 → 訳。全部まとめて timeout 秒まで待ち、間に合わなかった・失敗した訳は ""
+    jobs = {q: st.session_state.get("rp_question_ja", {}).get(q) for q in qs}
+    concurrent.futures.wait([job for job in jobs.values() if job], timeout=timeout)
+    result = {}
+    for q, job in jobs.items():
+        try:
+            result[q] = job.result(0).strip() if job and job.done() else ""
+        except Exception:
+            result[q] = ""
     return result
 
-# 【無駄②解消】PDFのテキスト抽出をキャッシュ化
-@st.cache_data
-def extract_text_from_pdf(file_bytes):
-    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-    return "".join([page.extract_text() + "\n" for page in reader.pages])
+def question_translation(q, timeout=llm.TIMEOUT):
+    return question_translations([q], timeout)[q]
 
-# 【無駄③解消】翻訳と辞書の通信結果をキャッシュ化
-@st.cache_data
-def get_cached_translation(text, model_name):
-    t_ai = genai.GenerativeModel(model_name)
-    return t_ai.generate_content(f"以下を日本語に翻訳して:\n{text}").text
+def get_cached_english(jp_text, model_name):
+    return cached_generate("translate_en", jp_text, "以下の日本語を、英会話のセリフとして自然な英語に翻訳してください。出力は英語のセリフのみとし、解説や前置きは一切不要です。\n\n日本語: {text}", model_name)
 
-@st.cache_data
 def get_cached_dictionary(word, model_name):
-    d_ai = genai.GenerativeModel(model_name)
-    return d_ai.generate_content(f"「{word}」の意味と簡単な例文を1つ教えて。簡潔に。").text
-
+    return cached_generate("dictionary", word, "「{text}」の意味と簡単な例文を1つ教えて。簡潔に。", model_name)
+
+# 🗣️ 返事を書きながら読み上げる時の音声置き場（毎回同じ位置に描くので、直後の再実行でも再生が途切れない）
+def tee_to_speaker(stream, speaker, on_marker):
+    for piece in stream:
+        speaker.add(piece)
+        if on_marker and speaker.found:
+            on_marker()
+            on_marker = None
+        yield piece
+    speaker.finish()
+
+usage.set_page("roleplay")
 st.title("My English Roleplay AI 🗣️")
+voice_slot = st.empty()
+live_voice = st.session_state.get("rp_live_voice")
+# 読み上げの音声は、送り終えて言い終わるまで残す（until は、ブラウザが取りに来なかった時などの上限）
+voice_ends = live_voice["feed"].playing_until() if live_voice else None
+if live_voice and time.time() < live_voice["until"] and (voice_ends is None or time.time() < voice_ends + 1):
+    voice_slot.markdown(live_voice["html"], unsafe_allow_html=True)
+else:
+    st.session_state.pop("rp_live_voice", None)
 
 if "rp_audio_speed" not in st.session_state: st.session_state.rp_audio_speed = "🐰 ふつう"
 
@@ -113,10 +154,15 @@ with st.sidebar:
     uploaded_file = st.file_uploader("新しい資料 (PDF/TXT)", type=["pdf", "txt"])
     if uploaded_file:
         if uploaded_file.name.endswith('.pdf'):
-            doc_text = extract_text_from_pdf(uploaded_file.getvalue())
+            first, last = pdf_page_range(uploaded_file, "rp_pdf_pages")
+            doc_text = "".join([page + "\n" for page in read_pdf_pages(uploaded_file, first, last)])
         else:
             doc_text = uploaded_file.read().decode('utf-8')
         st.success("資料を読み込みました！")
+    if doc_text.strip():
+        doc_info = get_index(doc_text)
+        if doc_info.total_tokens > TOKEN_BUDGET:
+            st.caption(f"🔎 資料は {len(doc_info.passages)} 段落に分け、会話に関係する部分（約{TOKEN_BUDGET}トークンまで）だけを毎ターン送ります。")
 
     st.markdown("---")
     current_settings = {"level": level, "user_name": user_name, "questioner": questioner, "situation": situation, "focus_words": focus_words, "doc_text": doc_text}
@@ -132,18 +178,33 @@ with st.sidebar:
         st.session_state.stats_mistakes = 0
     st.write(f"- 発話ターン数: {st.session_state.stats_turns} 回")
     st.write(f"- リピート練習: {st.session_state.stats_mistakes} 回")
+    usage.render_usage_summary()
 
 # スピード設定の適用
 audio_rate = "-25%" if st.session_state.rp_audio_speed == "🐢 ゆっくり" else "+0%"
 
-system_instruction = f"""
+# 🔎 資料は段落ごとの索引にしておき、直近の会話に関係する段落だけを送る（短い資料は全文）
+doc_index = get_index(doc_text) if doc_text.strip() else None
+
+def recent_context(extra=""):
+    recent = [m["content"] for m in st.session_state.get("messages", [])[-4:]]
+    return "\n".join([situation, focus_words] + recent + [extra])
+
+# 🪟 履歴はトークンの上限まで。はみ出した昔のやりとりは要約にたたんで、system_instruction に入れる
+if "rp_memory" not in st.session_state: st.session_state.rp_memory = ConversationMemory(feature="summary_memory")
+
+def make_system_instruction(query=""):
+    doc_excerpt = doc_index.select(query or recent_context()) if doc_index else ""
+    memory_summary = st.session_state.rp_memory.summary or "（まだありません）"
+    return f"""
 あなたは英会話のロールプレイング相手です。
 【相手の役柄】: {questioner}
 【ユーザーの名前】: {user_name}
 【レベル】: {level}
 【状況】: {situation}
 【重点テーマ】: {focus_words}
-【資料】: {doc_text}
+【資料】: {doc_excerpt}
+【これまでの会話の要約】: {memory_summary}
 
 【絶対に守るべき厳格なルール】
 1. あなたの出力は、以下の「指定フォーマット」のブロックのみで構成してください。
@@ -176,16 +237,19 @@ if "last_played_msg_idx" not in st.session_state: st.session_state.last_played_m
 
 if start_button:
     try:
-        model = genai.GenerativeModel(selected_model, system_instruction=system_instruction)
-        st.session_state.chat_session = model.start_chat(history=[])
+        st.session_state.rp_memory = ConversationMemory(feature="summary_memory")
+        st.session_state.chat_session = llm.start_chat(selected_model, make_system_instruction())
         st.session_state.messages = []
+        st.session_state.rp_question_ja = {}
         st.session_state.last_played_msg_idx = -1
+        st.session_state.pop("rp_live_voice", None)
         st.session_state.stats_turns = 0
         st.session_state.stats_mistakes = 0
         st.session_state.is_review_mode = False 
         st.session_state.review_list = []
-        response = st.session_state.chat_session.send_message("シチュエーションを開始して、最初の質問を英語でしてください。")
-        st.session_state.messages.append({"role": "assistant", "content": response.text})
+        response_text = llm.send_message(st.session_state.chat_session, "シチュエーションを開始して、最初の質問を英語でしてください。", feature="start")
+        st.session_state.messages.append({"role": "assistant", "content": response_text})
+        translate_question_in_background(response_text, selected_model)
     except Exception as e:
         st.error(f"準備中にエラーが発生しました: {e}")
 
@@ -200,21 +264,23 @@ if "chat_session" in st.session_state:
                 elif "[リピート練習]" in message["content"]: raw_text = message["content"].split("[リピート練習]")[1].strip()
                 if raw_text:
                     try:
-                        speak_text = clean_text_for_tts(raw_text)
-                        # キャッシュ化＆スピード設定反映
-                        audio_bytes = get_tts_audio(speak_text, rate=audio_rate) 
+                        # キャッシュ化＆スピード設定反映（1文ずつの音声をつなぐので、返事の途中で読み上げ済みの文はそのまま使える）
+                        audio_bytes = get_long_tts_audio(raw_text, rate=audio_rate)
                         auto_play = False
                         if i == len(st.session_state.messages) - 1 and st.session_state.last_played_msg_idx != i:
                             auto_play = True
                             st.session_state.last_played_msg_idx = i
-                        st.audio(audio_bytes, format="audio/mp3", autoplay=auto_play)
+                        render_audio(audio_bytes, autoplay=auto_play)
                     except Exception: pass
+    if st.session_state.get("rp_llm_timing"): st.caption(st.session_state.rp_llm_timing)
 
     st.markdown("---")
     
-    # 【無駄④解消】過去の会話履歴を直近4ラリー（8件）に絞って送る
+    # 【無駄④解消】過去の会話履歴は、トークンの上限に収まる直近の分だけ送る（それより前は要約で渡す）
     def get_trimmed_history():
-        raw_history = st.session_state.messages[-8:] if len(st.session_state.messages) > 8 else st.session_state.messages
+        messages = st.session_state.messages
+        start = st.session_state.rp_memory.window_start([(m["role"], m["content"]) for m in messages])
+        raw_history = messages[start:]
         formatted = []
         for m in raw_history:
             formatted.append({"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]})
@@ -222,6 +288,7 @@ if "chat_session" in st.session_state:
 
     prompt = None
     display_prompt = None
+    turn_feature = "turn"   # 台帳に書く機能名（ギブアップなども同じ会話の1ターンとして送るので、ここで分ける）
     last_msg = st.session_state.messages[-1] if len(st.session_state.messages) > 0 else None
     
     is_practice = False
@@ -247,52 +314,62 @@ if "chat_session" in st.session_state:
             
             if review_audio:
                 if st.button("📤 回答を送信して添削してもらう", type="primary", use_container_width=True, key=f"review_btn_{selected_idx}"):
-                    with st.spinner("AIが回答を添削中..."):
-                        try:
-                            transcriber = genai.GenerativeModel(selected_model)
-                            res = transcriber.generate_content([{"mime_type": "audio/wav", "data": review_audio.getvalue()}, "英語を文字起こししてください。文字のみ出力。"])
-                            user_spoken = res.text.strip() if res.parts else ""
-                            st.write(f"🎤 あなたの回答: **{user_spoken}**")
-                            
-                            feedback_prompt = f"質問: {selected_q}\n生徒の回答: {user_spoken}\n以下のフォーマットで簡潔に日本語で出力。\n【評価】（良かった点）\n【改善点】（文法ミスなど）\n【模範解答】（より自然な英語の回答例を1〜2つ）"
-                            teacher_model = genai.GenerativeModel(selected_model)
-                            feedback_res = teacher_model.generate_content(feedback_prompt)
-                            st.success(f"🤖 **AIコーチからの添削:**\n\n{feedback_res.text.strip()}")
-                        except Exception:
-                            st.error("エラーが発生しました。")
+                    try:
+                        with st.spinner("文字に変換中..."):
+                            user_spoken = llm.transcribe(review_audio.getvalue(), selected_model)
+                        st.write(f"🎤 あなたの回答: **{user_spoken}**")
+                        
+                        feedback_prompt = f"質問: {selected_q}\n生徒の回答: {user_spoken}\n以下のフォーマットで簡潔に日本語で出力。\n【評価】（良かった点）\n【改善点】（文法ミスなど）\n【模範解答】（より自然な英語の回答例を1〜2つ）"
+                        with st.container(border=True):
+                            st.write("🤖 **AIコーチからの添削:**")
+                            stream = llm.stream_generate(feedback_prompt, selected_model, feature="review")
+                            st.write_stream(stream)
+                        st.caption(stream.timing_caption())
+                    except Exception:
+                        st.error("エラーが発生しました。")
 
     elif is_practice:
         st.info("🔄 **リピート練習モード**：マイクで発音してみましょう。")
         practice_audio = st.audio_input("発音を録音する")
         
         if practice_audio:
-            if st.button("🤖 AIに発音を判定してもらう", use_container_width=True):
-                with st.spinner("AIが発音を判定中..."):
+            if st.button("🎯 発音を判定する", use_container_width=True):
+                with st.spinner("発音を判定中..."):
                     try:
-                        transcriber = genai.GenerativeModel(selected_model)
-                        res = transcriber.generate_content([{"mime_type": "audio/wav", "data": practice_audio.getvalue()}, "英語を文字起こししてください。文字のみ出力。"])
-                        user_spoken = res.text.strip() if res.parts else ""
-                        st.write(f"🎤 あなたの発音: **{user_spoken}**")
-                        
-                        judge_prompt = f"お手本:「{target_practice_text}」\n発音:「{user_spoken}」\n【判定ルール】句読点や大文字小文字は無視。発音された単語に抜け漏れや違いがある場合のみ厳しく指摘。完全一致で合格。"
-                        judge_model = genai.GenerativeModel(selected_model)
-                        judge_res = judge_model.generate_content(judge_prompt)
-                        st.success(f"🤖 判定: {judge_res.text.strip()}")
+                        user_spoken = llm.transcribe(practice_audio.getvalue(), selected_model)
+                        # 🎯 単語の一致は手元で判定（AI に聞くのは「解説」を押した時だけ）
+                        st.session_state.rp_judge = {"target": target_practice_text, "spoken": user_spoken,
+                                                     "result": judge(target_practice_text, user_spoken), "explanation": ""}
                     except Exception:
                         st.error("聞き取れませんでした。")
+
+        rp_judge = st.session_state.get("rp_judge")
+        if rp_judge and rp_judge["target"] == target_practice_text:
+            st.write(f"🎤 あなたの発音: **{rp_judge['spoken']}**")
+            st.markdown(diff_html(rp_judge["result"]), unsafe_allow_html=True)
+            if rp_judge["result"]["perfect"]: st.success(f"🎯 判定: {judge_message(rp_judge['result'])}")
+            else: st.warning(f"🎯 判定: {judge_message(rp_judge['result'])}")
+            if rp_judge["explanation"]:
+                st.info(f"🤖 {rp_judge['explanation']}")
+            elif not rp_judge["result"]["perfect"] and st.button("🤖 AIに解説してもらう"):
+                with st.spinner("AIが解説を考えています..."):
+                    judge_prompt = f"お手本:「{target_practice_text}」\n発音:「{rp_judge['spoken']}」\n判定: {judge_message(rp_judge['result'])}\n【ルール】句読点や大文字小文字は無視。違っている単語について、どう発音を直せばよいかを日本語で簡潔に解説。"
+                    rp_judge["explanation"] = llm.generate(judge_prompt, selected_model, feature="judge_explain").strip()
+                st.rerun()
         
         col1, col2 = st.columns(2)
         with col1:
             if st.button("▶️ 練習完了！次へ進む", type="primary", use_container_width=True):
                 prompt = "（リピート練習完了。会話を続けるための新しい質問を【パターンB】の形式でしてください。）"
                 display_prompt = "（✅ 練習を完了し、次へ進みました）"
+                turn_feature = "next"
         with col2:
             if st.button("↩️ 練習せず1つ前の質問に答え直す (Undo)", use_container_width=True):
                 if len(st.session_state.messages) >= 3:
                     st.session_state.messages = st.session_state.messages[:-2]
                     st.session_state.stats_mistakes -= 1
-                    re_model = genai.GenerativeModel(selected_model, system_instruction=system_instruction)
-                    st.session_state.chat_session = re_model.start_chat(history=get_trimmed_history())
+                    history = get_trimmed_history()   # 先に履歴を切る（たたみ終わった要約が system_instruction に入るように）
+                    st.session_state.chat_session = llm.start_chat(selected_model, make_system_instruction(), history)
                     st.session_state.last_played_msg_idx = -1
                     st.rerun()
 
@@ -301,16 +378,16 @@ if "chat_session" in st.session_state:
         if st.button("🔄 今の質問をもう一度聞く（別の言い方で答え直したい時など）"):
             prompt = "すみません、あなたの今の質問にもう一度別の言い方で答えたいので、全く同じ質問文をもう一度言ってください。新しい質問はしないでください。"
             display_prompt = "（🔄 今の質問をもう一度繰り返してください）"
+            turn_feature = "repeat"
 
         audio_value = st.audio_input("マイクを押して回答を録音")
         if audio_value:
             if st.button("📤 この音声を文字起こしして送信する", type="primary", use_container_width=True):
                 with st.spinner("文字に変換中..."):
                     try:
-                        transcriber = genai.GenerativeModel(selected_model)
-                        res = transcriber.generate_content([{"mime_type": "audio/wav", "data": audio_value.getvalue()}, "英語を文字起こししてください。文字のみ出力。"])
-                        if res.parts:
-                            prompt = res.text.strip()
+                        user_spoken = llm.transcribe(audio_value.getvalue(), selected_model)
+                        if user_spoken:
+                            prompt = user_spoken
                             display_prompt = prompt
                             st.session_state.stats_turns += 1
                     except Exception:
@@ -325,7 +402,7 @@ if "chat_session" in st.session_state:
                 st.write("🇯🇵 **① 直前のセリフの日本語訳**")
                 if st.button("日本語訳を見る"):
                     with st.spinner("翻訳中..."):
-                        translation = get_cached_translation(current_q, selected_model)
+                        translation = question_translation(current_q) or get_cached_translation(current_q, selected_model)
                     st.info(f"🇯🇵 {translation}")
 
             st.write("💡 **② お助け翻訳（言いたいことが英語で出てこない時）**")
@@ -337,10 +414,8 @@ if "chat_session" in st.session_state:
             if trans_btn and jp_text:
                 with st.spinner("AIが英訳を考えています..."):
                     try:
-                        translator = genai.GenerativeModel(selected_model)
-                        trans_prompt = f"以下の日本語を、英会話のセリフとして自然な英語に翻訳してください。出力は英語のセリフのみとし、解説や前置きは一切不要です。\n\n日本語: {jp_text}"
-                        trans_res = translator.generate_content(trans_prompt)
-                        st.success(f"✨ こんな風に言ってみましょう！\n\n### {trans_res.text.strip()}")
+                        trans_text = get_cached_english(jp_text, selected_model)
+                        st.success(f"✨ こんな風に言ってみましょう！\n\n### {trans_text.strip()}")
                     except Exception as e:
                         st.error("翻訳中にエラーが発生しました。")
 
@@ -348,9 +423,16 @@ if "chat_session" in st.session_state:
                 st.write("📖 **③ 単語辞書 / 文法**")
                 dict_word = st.text_input("調べたい英単語や文法:", label_visibility="collapsed", placeholder="例: evidence, 現在完了形")
                 if st.form_submit_button("調べる🔍"):
-                    with st.spinner("検索中..."):
-                        res = get_cached_dictionary(dict_word, selected_model)
-                        st.info(res)
+                    # 📕 1単語なら内蔵辞書で即答、文法やフレーズの時だけ AI に聞く
+                    entry = local_lookup(dict_word)
+                    if entry:
+                        st.info(format_entry(dict_word, entry))
+                        st.caption("📕 内蔵辞書（通信なし）")
+                    else:
+                        with st.spinner("検索中..."):
+                            res = get_cached_dictionary(dict_word, selected_model)
+                            st.info(res)
+                            st.caption(hit_rate_caption("dictionary"))
 
             st.write("🧠 **④ ちょい足しヒント（自力で答えるためのアシスト）**")
             with st.form("hint_form", clear_on_submit=False):
@@ -361,11 +443,10 @@ if "chat_session" in st.session_state:
                 if hint_btn:
                     if current_q:
                         with st.spinner("ヒントを作成中..."):
-                            hint_ai = genai.GenerativeModel(selected_model)
                             if hint_type == "使うべき単語を3つ": hint_prompt = f"以下の質問に答えるために役立つ英単語（または熟語）を3つだけ、日本語の意味を添えて教えて。英語の正解は書かないで。\n質問: {current_q}"
                             elif hint_type == "文の出だし（3語）": hint_prompt = f"以下の質問に答えるための、自然な英文の書き出し（最初の3〜5語のみ）を1つ教えて。日本語訳や解説は不要。\n質問: {current_q}"
                             else: hint_prompt = f"以下の質問に対して、どのような内容を答えればよいか、日本語で簡潔に2つのアイデアを提案して。英語の解答例は書かないで。\n質問: {current_q}"
-                            st.info(f"💡 **ヒント:**\n{hint_ai.generate_content(hint_prompt).text.strip()}")
+                            st.info(f"💡 **ヒント:**\n{llm.generate(hint_prompt, selected_model, feature='hint').strip()}")
                     else:
                         st.warning("ヒントを出せる質問が見つかりませんでした。")
 
@@ -382,50 +463,61 @@ if "chat_session" in st.session_state:
                 （私がそのまま復唱して答えるための、英語の回答例のセリフのみ。複数の場合は一番標準的なものを1つだけ。絶対に新しい質問はしないこと）
                 """
                 display_prompt = "（🏳️ ギブアップして、解説と回答例をリクエストしました）"
+                turn_feature = "giveup"
 
     if prompt and display_prompt:
         st.session_state.messages.append({"role": "user", "content": display_prompt})
-        with st.spinner("AIが返答を考えています..."):
-            try:
-                trim_model = genai.GenerativeModel(selected_model, system_instruction=system_instruction)
-                st.session_state.chat_session = trim_model.start_chat(history=get_trimmed_history()[:-1])
-                response = st.session_state.chat_session.send_message(prompt)
-                st.session_state.messages.append({"role": "assistant", "content": response.text})
-                if "[リピート練習]" in response.text: st.session_state.stats_mistakes += 1
-                st.rerun() 
-            except Exception as e:
-                st.error("エラーが発生しました。")
+        try:
+            history = get_trimmed_history()[:-1]
+            st.session_state.chat_session = llm.start_chat(selected_model, make_system_instruction(recent_context(prompt)), history)
+            # 🌊 届いた文字から順に表示（[英語の質問] などの読み取りは、出そろった全文で行う）
+            # [英語の質問] / [リピート練習] が見えた時点で音声の置き場にストリームをつなぎ、言い終わった文から読み上げる
+            speaker = ReplySpeaker(["[英語の質問]", "[リピート練習]"], rate=audio_rate)
+            live_url = feed_audio_url(speaker.feed)
+            def start_voice():
+                voice_slot.markdown(audio_html(live_url, autoplay=True, hidden=True), unsafe_allow_html=True)
+            with st.chat_message("assistant"):
+                stream = llm.stream_message(st.session_state.chat_session, prompt, feature=turn_feature)
+                st.write_stream(tee_to_speaker(stream, speaker, start_voice if live_url else None))
+            response_text = stream.text
+            st.session_state.messages.append({"role": "assistant", "content": response_text})
+            translate_question_in_background(response_text, selected_model)
+            st.session_state.rp_llm_timing = stream.timing_caption()
+            if live_url and speaker.started:
+                # 読み上げ中の音声を次の再実行でも同じ場所に描き、メッセージ側の自動再生はしない
+                spoken_words = len(speaker.english.split())
+                st.session_state.rp_live_voice = {"html": audio_html(live_url, autoplay=True, hidden=True), "feed": speaker.feed,
+                                                  "until": time.time() + FEED_IDLE_TIMEOUT + 2 * spoken_words}
+                st.session_state.last_played_msg_idx = len(st.session_state.messages) - 1
+            if "[リピート練習]" in response_text: st.session_state.stats_mistakes += 1
+            st.rerun() 
+        except Exception as e:
+            st.error("エラーが発生しました。")
 
 if end_button and "chat_session" in st.session_state:
-    with st.spinner("成績をまとめています..."):
-        summary_prompt = "会話を終了します。通信量削減のため不要な前置きは省いてください。まずはたくさん褒めて、その後本日の評価を「本日のスコア(各項目100点満点)」「良かった点」「今後の課題」の構成で出力してください。"
-        try:
-            res = st.session_state.chat_session.send_message(summary_prompt)
+    summary_prompt = "会話を終了します。通信量削減のため不要な前置きは省いてください。まずはたくさん褒めて、その後本日の評価を「本日のスコア(各項目100点満点)」「良かった点」「今後の課題」の構成で出力してください。"
+    try:
+        review_qs = []
+        for m in st.session_state.messages:
+            if m["role"] == "assistant" and "[英語の質問]" in m["content"]:
+                q = m["content"].split("[英語の質問]")[1].strip()
+                if q not in review_qs: review_qs.append(q)
+        review_qs = review_qs[-50:]
+        # 訳がまだの質問（古いセッションなど）は、評価を流している間に裏で訳す
+        for q in review_qs:
+            translate_question_in_background(f"[英語の質問]{q}", selected_model)
+        with st.chat_message("assistant"):
+            stream = llm.stream_message(st.session_state.chat_session, summary_prompt, feature="summary")
+            st.write_stream(stream)
+        summary_text = stream.text
+        st.session_state.rp_llm_timing = stream.timing_caption()
+        with st.spinner("成績をまとめています..."):
             st.session_state.messages.append({"role": "user", "content": "（終了して評価をリクエスト）"})
-            st.session_state.messages.append({"role": "assistant", "content": res.text})
+            st.session_state.messages.append({"role": "assistant", "content": summary_text})
             
             st.session_state.is_review_mode = True
-            review_qs = []
-            for m in st.session_state.messages:
-                if m["role"] == "assistant" and "[英語の質問]" in m["content"]:
-                    q = m["content"].split("[英語の質問]")[1].strip()
-                    if q not in review_qs: review_qs.append(q)
-            review_qs = review_qs[-50:]
-            
-            st.session_state.review_list = []
-            if review_qs:
-                try:
-                    transl_prompt = "以下の英文を日本語に翻訳してください。出力は必ず「英語 || 日本語訳」という形式で1行ずつ出力し、余計な説明は一切省いてください。\n\n" + "\n".join(review_qs)
-                    t_model = genai.GenerativeModel(selected_model)
-                    t_res = t_model.generate_content(transl_prompt).text
-                    for line in t_res.split("\n"):
-                        if "||" in line:
-                            en, ja = line.split("||", 1)
-                            st.session_state.review_list.append({"en": en.strip(), "ja": ja.strip()})
-                except Exception:
-                    pass
-                if len(st.session_state.review_list) == 0:
-                    st.session_state.review_list = [{"en": q, "ja": ""} for q in review_qs]
+            translations = question_translations(review_qs)
+            st.session_state.review_list = [{"en": q, "ja": translations[q]} for q in review_qs]
             st.rerun()
-        except Exception:
-            st.error("評価の作成に失敗しました。")
+    except Exception:
+        st.error("評価の作成に失敗しました。")
@@ -1,11 +1,14 @@
 import streamlit as st
-import google.generativeai as genai
-import io
-import re
-import PyPDF2
+from common import llm, usage
 from datetime import datetime
-import asyncio
-import edge_tts
+from common.tts import clean_text_for_tts, get_long_tts_audio, get_tts_audio, prefetch_tts, sentence_segments, slice_tts_clips, split_sentences
+from common.media_routes import render_audio, render_audio_url, stream_audio_url
+from common.lookup_cache import cached_generate, hit_rate_caption
+from common.dictionary import format_entry, local_lookup
+from common.pronunciation import diff_html, judge, judge_message
+from common.script_split import SPLIT_BLOCK_WORDS, ready_prefix, split_in_parallel
+from common.line_filter import extract_english
+from common.pdf_pages import digest_of, iter_pages, page_count
 
 # === 🎨 デザインカスタマイズ ===
 st.markdown("""
@@ -22,19 +25,15 @@ if not st.session_state.get("password_correct", False):
 # === 🔑 API設定 ===
 try:
     MY_API_KEY = st.secrets["GEMINI_API_KEY"]
-    genai.configure(api_key=MY_API_KEY.strip())
+    llm.configure(MY_API_KEY)
 except Exception:
-    st.error("⚠️ Secretsから GEMINI_API_KEY を設定してください！")
-    st.stop()
+    if not llm.FAKE_BACKEND:  # LLM_BACKEND=fake の時はキー無しでも動かせる
+        st.error("⚠️ Secretsから GEMINI_API_KEY を設定してください！")
+        st.stop()
 
 # === 🧹 便利ツール（キャッシュで無駄を徹底削減！） ===
-def clean_text_for_tts(text):
-    text = re.sub(r'[*_#~]', '', text)
-    text = re.sub(r"(?<!\w)['\"]|['\"](?!\w)", '', text)
-    return text.strip()
-
 def split_script_into_blocks(text, max_words=130):
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    sentences = split_sentences(text)
     blocks = []
     current_block = []
     current_word_count = 0
@@ -51,40 +50,68 @@ def split_script_into_blocks(text, max_words=130):
     if current_block: blocks.append(" ".join(current_block))
     return blocks
 
-# ✨ スピード調整対応 ＆ キャッシュ化
-@st.cache_data
-def get_tts_audio(text, voice="en-US-AriaNeural", rate="+0%"):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    async def _generate():
-        communicate = edge_tts.Communicate(text, voice, rate=rate)
-        audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-        return audio_data
-    result = loop.run_until_complete(_generate())
-    loop.close()
-    return result
-
-@st.cache_data
-def extract_text_from_pdf(file_bytes):
-    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-    return "".join([page.extract_text() + "\n" for page in reader.pages])
+# 🚀 お手本音声を、描画より先にまとめて並列で作っておく
+# ブロック・全文は1文ずつの音声をつなげ、チャンクはそこから単語の時刻で切り出すので、先読みは1文単位だけでよい
+def ensure_tts_prefetch(rate):
+    texts = sentence_segments(st.session_state.shadowing_script)
+    signature = (tuple(texts), rate)
+    if st.session_state.get("sh_prefetch_sig") != signature:
+        st.session_state.sh_prefetch_job = prefetch_tts(texts, rate=rate)
+        st.session_state.sh_prefetch_sig = signature
+    return st.session_state.sh_prefetch_job
+
+def sliced_chunk_clips(chunks, rate):
+    # 全文を1回合成した音声から、チャンクごとに切り出す（追加の通信なし）。台本・チャンク・スピードが同じ間は切り直さない
+    signature = (st.session_state.shadowing_script, tuple(c["en"] for c in chunks), rate)
+    if st.session_state.get("sh_clips_sig") != signature:
+        st.session_state.sh_clips = slice_tts_clips(st.session_state.shadowing_script, [c["en"] for c in chunks], rate=rate)
+        st.session_state.sh_clips_sig = signature
+    return st.session_state.sh_clips
+
+@st.fragment(run_every=1.0)
+def show_prefetch_progress():
+    job = st.session_state.get("sh_prefetch_job")
+    if job is None: return
+    if job.is_running():
+        st.progress(job.done / max(job.total, 1), text=f"⏳ お手本音声を先読み中... ({job.done}/{job.total})")
+    elif st.session_state.get("sh_audio_waiting"):
+        # 「準備中」を出していた音声ができあがったので、画面を1回だけ描き直す
+        st.session_state.sh_audio_waiting = False
+        st.rerun()
+
+def pdf_page_range(uploaded_file, key):
+    # 読み込むページの範囲（1始まり）。ページ数は最初の1回だけ数えて覚えておく
+    data = uploaded_file.getvalue()
+    count = page_count(data, digest_of(data, uploaded_file.file_id))
+    if count <= 1: return 1, count
+    return st.slider(f"📑 読み込むページ（全{count}ページ）", 1, count, (1, count), key=key)
+
+def read_pdf_pages(uploaded_file, first, last):
+    # ページごとにディスクに覚えておき、読めたページから進み具合を出す
+    data = uploaded_file.getvalue()
+    progress = st.empty()
+    pages = []
+    for page_no, text in iter_pages(data, digest_of(data, uploaded_file.file_id), first - 1, last - 1):
+        pages.append(text)
+        progress.caption(f"📄 {page_no + 1}ページ目まで読み込みました（{len(pages)}/{last - first + 1}）")
+    progress.empty()
+    return pages
+
+def extract_pages(uploaded_file, page_range):
+    # ページごとの文字列（テキストファイルは改ページ \f で区切る）
+    if uploaded_file.name.endswith('.pdf'): return read_pdf_pages(uploaded_file, *page_range)
+    return uploaded_file.getvalue().decode('utf-8').split("\f")
 
-@st.cache_data
 def get_cached_dictionary(text):
-    dict_ai = genai.GenerativeModel("gemini-2.5-flash-lite")
-    dict_prompt = f"以下の英単語または英語フレーズの日本語の意味を、簡潔にわかりやすく教えてください。\n\n対象: {text}"
-    return dict_ai.generate_content(dict_prompt).text.strip()
+    return cached_generate("meaning", text, "以下の英単語または英語フレーズの日本語の意味を、簡潔にわかりやすく教えてください。\n\n対象: {text}", llm.LITE_MODEL)
 
 @st.cache_data
 def get_transcription(audio_bytes):
-    transcriber = genai.GenerativeModel("gemini-2.5-flash")
-    res = transcriber.generate_content([{"mime_type": "audio/wav", "data": audio_bytes}, "英語を文字起こししてください。文字のみ出力。"])
-    return res.text.strip() if res.parts else ""
+    return llm.transcribe(audio_bytes)
 
+usage.set_page("shadowing")
 st.title("🎧 シャドーイング道場")
+with st.sidebar: usage.render_usage_summary()
 st.write("お手本を聞いて、限界まで自力で練習！自信がついたらAIの厳格チェックに挑みましょう。")
 
 if "shadowing_history" not in st.session_state: st.session_state.shadowing_history = []
@@ -122,10 +149,9 @@ with setup_tab2:
     
     if st.button("AIにスクリプトを作ってもらう"):
         with st.spinner("台本を作成中..."):
-            ai = genai.GenerativeModel("gemini-2.5-flash")
             prompt = f"シャドーイング用の英語スクリプトを作成してください。レベル: {level}\n状況: {sit}\n長さ: {script_length}\n学習者の名前: {user_name}\n【厳守】プレースホルダーは絶対使用不可。出力は英語のセリフのみ（解説不要）。"
             try:
-                st.session_state.shadowing_script = ai.generate_content(prompt).text
+                st.session_state.shadowing_script = llm.generate(prompt, feature="script")
                 st.session_state.pop("shadowing_chunks", None)
                 st.session_state.shadowing_history = [] 
                 st.session_state.pop("shadowing_evaluation", None) 
@@ -149,6 +175,7 @@ with setup_tab4:
     st.write("📄 **PDFやテキストファイルから英文を読み込みます。**")
     uploaded_file = st.file_uploader("スクリプトや教材ファイル（.txt または .pdf）", type=["txt", "pdf"])
     if uploaded_file:
+        page_range = pdf_page_range(uploaded_file, "sh_pdf_pages") if uploaded_file.name.endswith('.pdf') else None
         st.markdown("---")
         st.write("📥 **どちらの方法で読み込みますか？**")
         col_direct, col_extract = st.columns(2)
@@ -157,7 +184,7 @@ with setup_tab4:
             if st.button("① そのまま台本にする\n(前回保存したファイル等)", use_container_width=True):
                 with st.spinner("読み込み中..."):
                     try:
-                        raw_text = extract_text_from_pdf(uploaded_file.getvalue()) if uploaded_file.name.endswith('.pdf') else uploaded_file.read().decode('utf-8')
+                        raw_text = "".join([page + "\n" for page in extract_pages(uploaded_file, page_range)])
                         if raw_text.strip():
                             st.session_state.shadowing_script = raw_text.strip()
                             st.session_state.pop("shadowing_chunks", None)
@@ -173,19 +200,21 @@ with setup_tab4:
             if st.button("② AIで英文のみ抽出\n(PDF教材などノイズが多い時)", use_container_width=True):
                 with st.spinner("ファイルから英文だけを抽出中..."):
                     try:
-                        raw_text = extract_text_from_pdf(uploaded_file.getvalue()) if uploaded_file.name.endswith('.pdf') else uploaded_file.read().decode('utf-8')
-                        if raw_text.strip():
-                            ai = genai.GenerativeModel("gemini-2.5-flash-lite")
-                            extracted_text = ai.generate_content(f"以下のテキストから英語の文章のみを抽出して。日本語解説や記号は除外。\n\n{raw_text}").text
-                            blocks = [b.strip() for b in extracted_text.split('\n') if b.strip()]
+                        pages = extract_pages(uploaded_file, page_range)
+                        if "".join(pages).strip():
+                            # 英文・日本語だけの行は手元で決め、迷う行だけを AI に送る
+                            blocks, report = extract_english(pages)
                             st.session_state.extracted_blocks = blocks
                             st.session_state.block_checks = [True] * len(blocks)
+                            st.session_state.extract_report = report
                             st.success("抽出完了！下のリストで不要な行のチェックを外してください。")
                     except Exception as e:
                         st.error(f"抽出エラー: {e}")
 
     if st.session_state.get("extracted_blocks"):
         st.markdown("### ✂️ ② 取捨選択（不要なものはチェックを外す）")
+        if report := st.session_state.get("extract_report"):
+            st.caption(f"🧹 {report['lines']}行のうち AI に聞いたのは {report.get('ask', 0)}行（送った量 約{report['raw_tokens']} → {report['sent_tokens']} トークン）")
         col_all, col_none = st.columns(2)
         if col_all.button("☑️ すべて選択"):
             st.session_state.block_checks = [True] * len(st.session_state.extracted_blocks)
@@ -273,7 +302,7 @@ if st.session_state.shadowing_script:
             st.session_state.shadowing_script = edited_script.strip()
             st.session_state.pop("shadowing_chunks", None)
             st.session_state.shadowing_history = []
-            get_tts_audio.clear() # 更新した時はキャッシュをクリアする
+            # 音声ストアは文の中身で引くので、クリア不要（変わった文だけ新しく作られる）
             st.success("スクリプトを更新しました！お手本音声も新しく作られます。")
             st.rerun()
     else:
@@ -281,18 +310,18 @@ if st.session_state.shadowing_script:
 
     st.write("") 
     script_blocks = split_script_into_blocks(st.session_state.shadowing_script)
+    ensure_tts_prefetch(audio_rate)
     for idx, block in enumerate(script_blocks):
         if block_display_mode == "英語を表示": st.info(block)
         else: st.info("🔒 *(Text Hidden - 耳だけを頼りに！)*")
             
         if st.button(f"🔊 パート {idx + 1} のお手本を聞く", key=f"play_part_{idx}"):
             with st.spinner("高品質な音声を生成中..."):
-                speak_text = clean_text_for_tts(block)
-                if speak_text:
+                if clean_text_for_tts(block):
                     try:
-                        # スピード設定反映
-                        audio_bytes = get_tts_audio(speak_text, rate=audio_rate)
-                        st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+                        # スピード設定反映（1文ずつの音声をつなげる）
+                        audio_bytes = get_long_tts_audio(block, rate=audio_rate)
+                        render_audio(audio_bytes, autoplay=True)
                     except Exception as e:
                         st.error(f"音声の生成に失敗しました。詳細: {e}")
     
@@ -303,11 +332,16 @@ if st.session_state.shadowing_script:
             q_text = st.text_input("意味が分からない単語やフレーズ:", placeholder="例: looking forward to")
             q_btn = st.form_submit_button("日本語の意味を調べる🔍")
             
-        if q_btn and q_text:
+        entry = local_lookup(q_text) if q_btn and q_text else None
+        if entry:
+            st.success(f"🇯🇵 **意味:**\n{format_entry(q_text, entry)}")
+            st.caption("📕 内蔵辞書（通信なし）")
+        elif q_btn and q_text:
             with st.spinner("AIがサクッと調べています..."):
                 try:
                     res_text = get_cached_dictionary(q_text)
                     st.success(f"🇯🇵 **意味:**\n{res_text}")
+                    st.caption(hit_rate_caption("meaning"))
                 except Exception as e:
                     st.error(f"検索に失敗しました: {e}")
                     
@@ -315,29 +349,36 @@ if st.session_state.shadowing_script:
     col1, col2 = st.columns(2)
     with col1:
         if st.button("🔊 全文のお手本を一気に通しで聞く", use_container_width=True):
-            with st.spinner("高品質な音声を生成中..."):
-                speak_text = clean_text_for_tts(st.session_state.shadowing_script)
-                if speak_text:
-                    try:
-                        # スピード設定反映
-                        audio_bytes = get_tts_audio(speak_text, rate=audio_rate)
-                        st.audio(audio_bytes, format="audio/mp3", autoplay=True)
-                    except Exception as e:
-                        st.error(f"音声の生成に失敗: {e}")
+            if clean_text_for_tts(st.session_state.shadowing_script):
+                # 📡 合成が終わるのを待たず、最初の文が届いた時点で再生を始める
+                stream_url = stream_audio_url(st.session_state.shadowing_script, rate=audio_rate)
+                if stream_url:
+                    render_audio_url(stream_url, autoplay=True)
+                else:
+                    with st.spinner("高品質な音声を生成中..."):
+                        try:
+                            # スピード設定反映（1文ずつの音声をつなげるので、直した文だけ作り直し）
+                            audio_bytes = get_long_tts_audio(st.session_state.shadowing_script, rate=audio_rate)
+                            render_audio(audio_bytes, autoplay=True)
+                        except Exception as e:
+                            st.error(f"音声の生成に失敗: {e}")
 
     with col2:
         if st.button("✂️ さらに「1文ずつ」に分割してAI特訓に進む", type="primary", use_container_width=True):
-            with st.spinner("AIが和訳と分割を行っています... (※ここで1回だけ通信します)"):
-                ai = genai.GenerativeModel("gemini-2.5-flash")
-                split_prompt = f"以下の英文を意味のまとまりに分割し、それぞれに日本語訳をつけてください。\n【出力フォーマット】\n英語 || 日本語訳\n\n英文:\n{st.session_state.shadowing_script}"
+            with st.spinner("AIが和訳と分割を行っています... (※ブロックごとに並列で通信します)"):
+                # ✂️ 手元でブロックに分けてから並列で分割し、終わった所から順番どおりに見せる
+                blocks = split_script_into_blocks(st.session_state.shadowing_script, SPLIT_BLOCK_WORDS)
+                preview = st.empty()
+                def show_split_progress(results):
+                    with preview.container():
+                        st.caption(f"✂️ {sum(r is not None for r in results)}/{len(results)} ブロック完了")
+                        for chunk in ready_prefix(results):
+                            st.markdown(f"- {chunk['en']}　<span style='color:#888;'>{chunk['ja']}</span>", unsafe_allow_html=True)
                 try:
-                    res = ai.generate_content(split_prompt).text
-                    chunks = []
-                    for line in res.split('\n'):
-                        if '||' in line:
-                            en, ja = line.split('||', 1)
-                            chunks.append({"en": en.strip(), "ja": ja.strip()})
+                    chunks, fallbacks = split_in_parallel(blocks, show_split_progress)
+                    preview.empty()
                     st.session_state.shadowing_chunks = chunks
+                    if fallbacks: st.warning(f"⚠️ {fallbacks}ブロックはAIの分割が間に合わなかったので、1文ずつに区切りました（和訳なし）。")
                 except Exception as e:
                     st.error(f"分割に失敗しました。詳細: {e}")
 
@@ -346,6 +387,18 @@ if st.session_state.shadowing_script:
 if "shadowing_chunks" in st.session_state and st.session_state.shadowing_chunks:
     st.write("🎯 **1文ずつの特訓＆AI判定**")
     display_mode = st.radio("👀 画面表示モード", ["英語 ＋ 和訳", "英語のみ", "ブラインド（文字を隠す）"], horizontal=True, key="chunk_display")
+    prefetch_job = ensure_tts_prefetch(audio_rate)
+    # ページ全体の再実行では下で描き直すので、前回の「準備中」は忘れる（ここで st.rerun するとボタンの押下が消える）
+    st.session_state.sh_audio_waiting = False
+    prefetching = prefetch_job.is_running()
+    # 進み具合は先読み中だけ描く（描かなかった再実行でフラグメントの毎秒の再実行も止まる）
+    # 「準備中」を出すのも先読み中だけなので、できあがった時の描き直しもこのフラグメントが受け持つ
+    if prefetching: show_prefetch_progress()
+    chunk_clips = [None] * len(st.session_state.shadowing_chunks)
+    if not prefetching:
+        try:
+            chunk_clips = sliced_chunk_clips(st.session_state.shadowing_chunks, audio_rate)
+        except Exception: pass
 
     for i, chunk in enumerate(st.session_state.shadowing_chunks):
         with st.container(border=True):
@@ -359,29 +412,47 @@ if "shadowing_chunks" in st.session_state and st.session_state.shadowing_chunks:
 
             speak_text = clean_text_for_tts(chunk['en'])
             if speak_text:
-                try:
-                    # ここもスピード設定反映
-                    audio_bytes = get_tts_audio(speak_text, rate=audio_rate)
-                    st.audio(audio_bytes, format="audio/mp3")
-                except Exception: pass
+                # 先読み済みの音声だけを使う（まだなら「準備中」を出して描画を止めない）
+                audio_bytes = chunk_clips[i]
+                if audio_bytes:
+                    render_audio(audio_bytes)
+                elif prefetching:
+                    st.caption("⏳ お手本音声を準備中...")
+                    st.session_state.sh_audio_waiting = True
+                else:
+                    try:
+                        # 切り出せなかった分だけ、ここで個別に作る
+                        audio_bytes = get_tts_audio(speak_text, rate=audio_rate)
+                        render_audio(audio_bytes)
+                    except Exception: pass
 
             test_audio = st.audio_input("マイクで録音する", key=f"sh_mic_{i}")
             if test_audio:
-                if st.button("📤 この発音をAIに判定してもらう", key=f"sh_btn_{i}", type="primary"):
+                if st.button("📤 この発音を鬼判定する", key=f"sh_btn_{i}", type="primary"):
                     with st.spinner("鬼判定中..."):
                         try:
                             user_spoken = get_transcription(test_audio.getvalue())
-                            st.write(f"🎤 あなたの発音: **{user_spoken}**")
-
-                            judge_prompt = f"お手本:「{chunk['en']}」\n発音:「{user_spoken}」\n【判定ルール】句読点や大文字小文字の違いは【絶対に無視】してください。純粋に「発音された単語」に違いや抜け漏れがある場合のみ、日本語で1文で厳しく指摘してください。完全に一致していれば合格としてください。"
-                            judge_model = genai.GenerativeModel("gemini-2.5-flash")
-                            judge_text = judge_model.generate_content(judge_prompt).text.strip()
-                            st.success(f"🤖 判定: {judge_text}")
-                            
-                            st.session_state.shadowing_history.append({"お手本": chunk['en'], "ユーザー発音": user_spoken, "AI判定": judge_text})
+                            # 🎯 単語の一致は手元で判定（AI に聞くのは「解説」を押した時だけ）
+                            result = judge(chunk['en'], user_spoken)
+                            st.session_state.setdefault("sh_judges", {})[i] = {"en": chunk['en'], "spoken": user_spoken, "result": result, "explanation": ""}
+                            st.session_state.shadowing_history.append({"お手本": chunk['en'], "ユーザー発音": user_spoken, "AI判定": judge_message(result)})
                         except Exception as e:
                             st.error(f"判定エラーが発生しました: {e}")
 
+            sh_judge = st.session_state.get("sh_judges", {}).get(i)
+            if sh_judge and sh_judge["en"] == chunk['en']:
+                st.write(f"🎤 あなたの発音: **{sh_judge['spoken']}**")
+                st.markdown(diff_html(sh_judge["result"]), unsafe_allow_html=True)
+                if sh_judge["result"]["perfect"]: st.success(f"🎯 判定: {judge_message(sh_judge['result'])}")
+                else: st.warning(f"🎯 判定: {judge_message(sh_judge['result'])}")
+                if sh_judge["explanation"]:
+                    st.info(f"🤖 {sh_judge['explanation']}")
+                elif not sh_judge["result"]["perfect"] and st.button("🤖 AIに解説してもらう", key=f"sh_explain_{i}"):
+                    with st.spinner("AIが解説を考えています..."):
+                        judge_prompt = f"お手本:「{chunk['en']}」\n発音:「{sh_judge['spoken']}」\n判定: {judge_message(sh_judge['result'])}\n【判定ルール】句読点や大文字小文字の違いは【絶対に無視】してください。違っている単語について、どう発音を直せばよいかを日本語で1〜2文で厳しく指摘してください。"
+                        sh_judge["explanation"] = llm.generate(judge_prompt, feature="judge_explain").strip()
+                    st.rerun()
+
     st.markdown("---")
     
     st.header("🏆 3. 今日の総評")
@@ -391,15 +462,21 @@ if "shadowing_chunks" in st.session_state and st.session_state.shadowing_chunks:
         if not st.session_state.shadowing_history:
             st.warning("まだAI判定を受けていないようです。まずは上のチャンクごとにマイクで発音を判定してみましょう！")
         else:
-            with st.spinner("AIコーチが今日の頑張りを評価しています..."):
-                try:
-                    history_text = "".join([f"\n【{idx}回目】\nお手本: {r['お手本']}\n発音: {r['ユーザー発音']}\n判定: {r['AI判定']}\n" for idx, r in enumerate(st.session_state.shadowing_history, 1)])
-                    evaluation_prompt = f"あなたは情熱的な発音コーチ。以下の履歴をもとに褒めて総評を出力。\n{history_text}\n\n【本日のシャドーイングスコア】\n- 発音の正確さ: 〇/100点\n- 流暢さ・再現度: 〇/100点\n- 練習への熱意: 〇/100点\n- 総合スコア: 〇/100点\n\n【良かった点・褒めポイント】\n（具体的に箇条書き）\n\n【今後の課題・アドバイス】\n（傾向があれば指摘）"
-                    eval_model = genai.GenerativeModel("gemini-2.5-flash")
-                    st.session_state.shadowing_evaluation = eval_model.generate_content(evaluation_prompt).text.strip()
-                except Exception as e:
-                    st.error(f"評価の作成に失敗: {e}")
+            try:
+                history_text = "".join([f"\n【{idx}回目】\nお手本: {r['お手本']}\n発音: {r['ユーザー発音']}\n判定: {r['AI判定']}\n" for idx, r in enumerate(st.session_state.shadowing_history, 1)])
+                evaluation_prompt = f"あなたは情熱的な発音コーチ。以下の履歴をもとに褒めて総評を出力。\n{history_text}\n\n【本日のシャドーイングスコア】\n- 発音の正確さ: 〇/100点\n- 流暢さ・再現度: 〇/100点\n- 練習への熱意: 〇/100点\n- 総合スコア: 〇/100点\n\n【良かった点・褒めポイント】\n（具体的に箇条書き）\n\n【今後の課題・アドバイス】\n（傾向があれば指摘）"
+                # 🌊 書き上がった所から順に表示し、出そろった全文を総評として残す
+                stream = llm.stream_generate(evaluation_prompt, feature="evaluation")
+                live_box = st.empty()
+                with live_box.container():
+                    st.write_stream(stream)
+                live_box.empty()
+                st.session_state.shadowing_evaluation = stream.text.strip()
+                st.session_state.shadowing_eval_timing = stream.timing_caption()
+            except Exception as e:
+                st.error(f"評価の作成に失敗: {e}")
                     
     if "shadowing_evaluation" in st.session_state:
         st.success("🎉 **AIコーチからの総評**")
         st.markdown(st.session_state.shadowing_evaluation)
+        if st.session_state.get("shadowing_eval_timing"): st.caption(st.session_state.shadowing_eval_timing)
@@ -1,11 +1,14 @@
 import streamlit as st
-import google.generativeai as genai
-import io
+from common import llm, usage
 import re
 import json
 from datetime import datetime
-import asyncio
-import edge_tts
+from common.tts import clean_text_for_tts, get_long_tts_audio, get_tts_audio, get_tts_service
+from common.media_routes import render_audio
+from common.pronunciation import diff_html, judge, kids_message
+from common.speculation import SpeculativeTurn
+from common.structured import KidsTurn, as_dict, send_structured
+from common.context_window import ConversationMemory, chat_turns
 
 # === 🎨 キッズ専用・縦型スリム化デザイン ===
 st.markdown("""
@@ -34,55 +37,66 @@ if not st.session_state.get("password_correct", False):
 # === 🔑 API設定 ===
 try:
     MY_API_KEY = st.secrets["GEMINI_API_KEY"]
-    genai.configure(api_key=MY_API_KEY.strip())
+    llm.configure(MY_API_KEY)
 except Exception:
-    st.error("⚠️ APIキーが ないみたい！パパかママに きいてみてね。")
-    st.stop()
+    if not llm.FAKE_BACKEND:  # LLM_BACKEND=fake の時はキー無しでも動かせる
+        st.error("⚠️ APIキーが ないみたい！パパかママに きいてみてね。")
+        st.stop()
 
 # === 🧹 便利ツール（キャッシュで無駄を削減！） ===
-def clean_text_for_tts(text):
-    text = re.sub(r'[*_#~]', '', text)
-    text = re.sub(r"(?<!\w)['\"]|['\"](?!\w)", '', text)
-    return text.strip()
-
 def apply_ruby_html(text):
     return re.sub(r'([A-Za-z.,!?\']+)\(([\u30A0-\u30FF\u3040-\u309F]+)\)', r'<ruby>\1<rt>\2</rt></ruby>', text)
 
-def extract_tag(text, tag):
-    pattern = f"<{tag}>(.*?)</{tag}>"
-    match = re.search(pattern, text, re.DOTALL)
-    return match.group(1).strip() if match else ""
-
 def get_hint_length_rule(level):
     if level <= 2: return "1文のみ"
     elif level <= 4: return "2文"
     else: return "3文"
 
-# ✨ スピード調整対応 ＆ キャッシュ化
-@st.cache_data
-def get_tts_audio(text, voice="en-US-AriaNeural", rate="+0%"):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    async def _generate():
-        communicate = edge_tts.Communicate(text, voice, rate=rate)
-        audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
-        return audio_data
-    result = loop.run_until_complete(_generate())
-    loop.close()
-    return result
-
-@st.cache_data
-def get_transcription(audio_bytes):
+def transcribe_kids(audio_bytes):
     try:
-        transcriber = genai.GenerativeModel("gemini-2.5-flash-lite")
-        res = transcriber.generate_content([{"mime_type": "audio/wav", "data": audio_bytes}, "英語を文字起こししてください。文字のみ出力。"])
-        return res.text.strip() if res.parts else "（がんばって こえ を だしたよ！）"
+        return llm.transcribe(audio_bytes, llm.LITE_MODEL) or "（がんばって こえ を だしたよ！）"
     except Exception:
         return "（うまくききとれなかったみたい）"
 
+@st.cache_data
+def get_transcription(audio_bytes):
+    return transcribe_kids(audio_bytes)
+
+def next_turn_prompt(user_spoken, hint_rule):
+    return f"子供は「{user_spoken}」と言いました。\n【重要】次の展開の質問を出してください。絶対に直近と同じ質問や回答パターンにならないよう、物語を進行させてください。\n子供のヒント（hint_en）は【{hint_rule}】で。"
+
+def make_kids_instruction(memory_summary=""):
+    # 答えの形は response_schema（common/structured.KidsTurn）で決まるので、ここでは各項目の中身だけを伝える
+    return f"""
+        あなたは日本の子供に英語を教える優しい先生です。シチュエーション: {st.session_state.final_sit}、子供の名前: {st.session_state.child_name}
+        これまでのおはなしの要約: {memory_summary or "（まだありません）"}
+        【厳守フォーマット】JSON のみ。
+        ai_en: あなたが子供に投げかける英語の質問。1文のみ
+        ai_ja: 上の英語の【日本語の意味】をひらがなで
+        ai_ruby: 上の英語に「Word(カタカナ)」でルビを振ったもの
+        hint_en: 子供が真似して答えるための英語の答え
+        hint_ja: 上の答えの【日本語の意味】をひらがなで
+        hint_ruby: 上の答えのルビ付き
+        """
+
+def trim_kids_chat(chat):
+    # 履歴がトークンの上限を超えたら、上限に収まる直近の分と「これまでの要約」を持った新しいチャットにする
+    # (チャット, 先頭から捨てた件数)。捨てた件数は、そのチャットを使うと決めた時に memory.forget() に渡す
+    if "kids_memory" not in st.session_state: st.session_state.kids_memory = ConversationMemory(feature="story_memory")
+    memory = st.session_state.kids_memory
+    start = memory.window_start(chat_turns(chat.history))
+    if start == 0: return chat, 0
+    return llm.start_chat(llm.DEFAULT_MODEL, make_kids_instruction(memory.summary), chat.history[start:]), start
+
+def next_turn_chat(chat):
+    chat, dropped = trim_kids_chat(chat)
+    st.session_state.kids_memory.forget(dropped)
+    return chat
+
+# 💬 1ターン分を送って、画面用の dict（ai_en / ai_ja / ai_ruby / hint_en / hint_ja / hint_ruby）で受け取る
+def kids_turn(chat, message, feature):
+    return as_dict(send_structured(chat, message, KidsTurn, feature=feature))
+
 # === 💾 データの初期化 ===
 if "kids_state" not in st.session_state: st.session_state.kids_state = "setup"
 if "kids_stamps" not in st.session_state: st.session_state.kids_stamps = 0
@@ -116,6 +130,7 @@ sit_options = {
 # ==========================================
 # ⚙️ サイドバー（おうちのひと専用メニュー）
 # ==========================================
+usage.set_page("kids")
 with st.sidebar:
     st.header("🔒 おうちのひとへ")
     st.write("※あそぶときは、このメニューをとじてね！")
@@ -161,26 +176,12 @@ with st.sidebar:
         st.session_state.kids_history_log = [] 
         st.session_state.kids_state = "playing"
         
-        kids_instruction = f"""
-        あなたは日本の子供に英語を教える優しい先生です。シチュエーション: {st.session_state.final_sit}、子供の名前: {st.session_state.child_name}
-        【厳守フォーマット】XMLタグのみ。
-        <ai_en>（あなたが子供に投げかける英語の質問。1文のみ）</ai_en>
-        <ai_ja>（上の英語の【日本語の意味】をひらがなで）</ai_ja>
-        <ai_ruby>（上の英語に「Word(カタカナ)」でルビを振ったもの）</ai_ruby>
-        <hint_en>（子供が真似して答えるための英語の答え）</hint_en>
-        <hint_ja>（上の答えの【日本語の意味】をひらがなで）</hint_ja>
-        <hint_ruby>（上の答えのルビ付き）</hint_ruby>
-        """
         with st.spinner("じゅんびちゅう..."):
             try:
-                model = genai.GenerativeModel("gemini-2.5-flash", system_instruction=kids_instruction)
-                st.session_state.kids_chat = model.start_chat(history=[])
+                st.session_state.kids_memory = ConversationMemory(feature="story_memory")
+                st.session_state.kids_chat = llm.start_chat(llm.DEFAULT_MODEL, make_kids_instruction())
                 hint_rule = get_hint_length_rule(st.session_state.kids_level)
-                res = st.session_state.kids_chat.send_message(f"ゲームスタート。レベル1の超簡単な質問をしてください。\n子供の答えのヒント（<hint_en>）は【{hint_rule}】で作成してください。")
-                st.session_state.kids_data = {
-                    "ai_en": extract_tag(res.text, "ai_en"), "ai_ja": extract_tag(res.text, "ai_ja"), "ai_ruby": extract_tag(res.text, "ai_ruby"),
-                    "hint_en": extract_tag(res.text, "hint_en"), "hint_ja": extract_tag(res.text, "hint_ja"), "hint_ruby": extract_tag(res.text, "hint_ruby"),
-                }
+                st.session_state.kids_data = kids_turn(st.session_state.kids_chat, f"ゲームスタート。レベル1の超簡単な質問をしてください。\n子供の答えのヒント（hint_en）は【{hint_rule}】で作成してください。", "start")
                 st.rerun()
             except Exception:
                 st.error("エラーがおきました。")
@@ -204,8 +205,8 @@ with st.sidebar:
                 st.session_state.pending_levelup = False
                 history_data = save_data.get("history", [])
                 formatted_history = [{"role": msg["role"], "parts": msg["parts"]} for msg in history_data]
-                model = genai.GenerativeModel("gemini-2.5-flash")
-                st.session_state.kids_chat = model.start_chat(history=formatted_history)
+                st.session_state.kids_memory = ConversationMemory(summary=save_data.get("memory_summary", ""), feature="story_memory")
+                st.session_state.kids_chat = llm.start_chat(llm.DEFAULT_MODEL, make_kids_instruction(st.session_state.kids_memory.summary), formatted_history)
                 st.session_state.kids_state = "playing"
                 st.success("よみこみ完了！")
                 st.rerun()
@@ -218,10 +219,12 @@ with st.sidebar:
             "child_name": st.session_state.child_name, "final_sit": st.session_state.final_sit,
             "kids_stamps": st.session_state.kids_stamps, "kids_total_stamps": st.session_state.kids_total_stamps,
             "kids_level": st.session_state.kids_level, "kids_data": st.session_state.kids_data, 
-            "kids_history_log": st.session_state.kids_history_log, "history": history_to_save
+            "kids_history_log": st.session_state.kids_history_log, "history": history_to_save,
+            "memory_summary": st.session_state.kids_memory.summary if "kids_memory" in st.session_state else ""
         }
         today_str = datetime.now().strftime("%Y-%m-%d")
         st.download_button("💾 データをセーブ", data=json.dumps(save_data, ensure_ascii=False, indent=2), file_name=f"{today_str}_kids_save.json", mime="application/json", use_container_width=True)
+    usage.render_usage_summary()
 
 # 音声のスピード設定を適用（-25%で自然なゆっくりに）
 audio_rate = "-25%" if st.session_state.kids_audio_speed == "🐢 ゆっくり" else "+0%"
@@ -282,10 +285,11 @@ if st.session_state.get("pending_levelup"):
             if st.button("🔊 ぜんぶ とおして きく", use_container_width=True):
                 with st.spinner("おんせいを つくっているよ..."):
                     try:
-                        full_text = "".join([f"{item['q_en']} {item['a_en']}. " for item in recent_history])
+                        # しつもん・こたえ は1文ずつ作った音声（さっき再生したもの）をつなげるだけ
+                        full_text = " ".join([f"{item['q_en']} {item['a_en'] if item['a_en'].rstrip()[-1:] in '.!?' else item['a_en'] + '.'}" for item in recent_history])
                         # 通し再生もスピード設定を反映！
-                        audio_bytes_all = get_tts_audio(clean_text_for_tts(full_text), rate=audio_rate)
-                        st.audio(audio_bytes_all, format="audio/mp3", autoplay=True)
+                        audio_bytes_all = get_long_tts_audio(full_text, rate=audio_rate)
+                        render_audio(audio_bytes_all, autoplay=True)
                     except Exception:
                         pass
         
@@ -307,11 +311,7 @@ if st.session_state.get("pending_levelup"):
                     st.session_state.kids_stamps = 0 
                     hint_rule = get_hint_length_rule(st.session_state.kids_level)
                     prompt_msg = f"子供は「{st.session_state.last_user_spoken}」と言いました。\n【重要】レベルが{st.session_state.kids_level}に上がりました。さっきより少しだけ難しい質問をして、場面を次に進めてください。\n子供のヒントは【{hint_rule}】で。"
-                    next_res = st.session_state.kids_chat.send_message(prompt_msg)
-                    st.session_state.kids_data = {
-                        "ai_en": extract_tag(next_res.text, "ai_en"), "ai_ja": extract_tag(next_res.text, "ai_ja"), "ai_ruby": extract_tag(next_res.text, "ai_ruby"),
-                        "hint_en": extract_tag(next_res.text, "hint_en"), "hint_ja": extract_tag(next_res.text, "hint_ja"), "hint_ruby": extract_tag(next_res.text, "hint_ruby"),
-                    }
+                    st.session_state.kids_data = kids_turn(st.session_state.kids_chat, prompt_msg, "turn")
                     st.rerun()
         with col_same:
             if st.button("🔄 おなじ レベルを もういっかい！", use_container_width=True):
@@ -320,11 +320,7 @@ if st.session_state.get("pending_levelup"):
                     st.session_state.kids_stamps = 0 
                     hint_rule = get_hint_length_rule(st.session_state.kids_level)
                     prompt_msg = f"子供は「{st.session_state.last_user_spoken}」と言いました。\n【重要】レベルは維持します。絶対に直近と同じ質問や回答パターンにならないよう、物語を進行させてください。\n子供のヒントは【{hint_rule}】で。"
-                    next_res = st.session_state.kids_chat.send_message(prompt_msg)
-                    st.session_state.kids_data = {
-                        "ai_en": extract_tag(next_res.text, "ai_en"), "ai_ja": extract_tag(next_res.text, "ai_ja"), "ai_ruby": extract_tag(next_res.text, "ai_ruby"),
-                        "hint_en": extract_tag(next_res.text, "hint_en"), "hint_ja": extract_tag(next_res.text, "hint_ja"), "hint_ruby": extract_tag(next_res.text, "hint_ruby"),
-                    }
+                    st.session_state.kids_data = kids_turn(st.session_state.kids_chat, prompt_msg, "turn")
                     st.rerun()
         st.markdown('</div>', unsafe_allow_html=True)
     st.stop()
@@ -344,7 +340,7 @@ with st.container(border=True):
         try:
             # AIの質問にもスピード設定を反映
             audio_bytes = get_tts_audio(clean_text_for_tts(data["ai_en"]), rate=audio_rate)
-            st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+            render_audio(audio_bytes, autoplay=True)
         except Exception: pass
 
     if mode == "🗣️ カタカナも":
@@ -379,7 +375,7 @@ with col_play_hint:
         try:
             # お手本にもスピード設定を反映
             audio_bytes_h = get_tts_audio(clean_text_for_tts(data["hint_en"]), rate=audio_rate)
-            st.audio(audio_bytes_h, format="audio/mp3", autoplay=True)
+            render_audio(audio_bytes_h, autoplay=True)
         except Exception: pass
 
 with col_mic:
@@ -391,9 +387,25 @@ if kids_audio:
         st.audio(kids_audio.getvalue(), format="audio/wav", autoplay=True)
         st.session_state.last_audio_hash = current_audio_hash
         st.session_state.kids_feedback = "" 
+        # 🔮 こどもが ボタンを おすまえに、もじおこし と「おてほんどおりに いえた時の つぎの しつもん（と おと）」を さきに つくりはじめる
+        # （5かいめ は レベルアップの がめんに なるので、さきよみ しない）
+        st.session_state.kids_spec = None
+        if not st.session_state.pending_levelup and (st.session_state.kids_stamps + 1) % 5 != 0 and data.get("hint_en"):
+            audio_bytes_in = kids_audio.getvalue()
+            # 先読みが捨てられるかもしれないので、ここでは履歴の位置をずらさない（使うと決めた時に forget する）
+            spec_chat, spec_dropped = trim_kids_chat(llm.fork_chat(st.session_state.kids_chat))
+            spec_prompt = next_turn_prompt(data["hint_en"], get_hint_length_rule(st.session_state.kids_level))
+            def speculate_turn(chat=spec_chat, prompt_msg=spec_prompt, rate=audio_rate, dropped=spec_dropped):
+                turn = kids_turn(chat, prompt_msg, "turn_speculative")
+                for key in ("ai_en", "hint_en"):
+                    text = clean_text_for_tts(turn[key])
+                    if text: get_tts_service().submit(text, rate=rate)
+                return chat, turn, dropped
+            st.session_state.kids_spec = SpeculativeTurn(current_audio_hash, data["hint_en"], lambda: transcribe_kids(audio_bytes_in), speculate_turn)
         
     if st.session_state.kids_feedback:
         st.info(st.session_state.kids_feedback)
+        if st.session_state.get("kids_feedback_diff"): st.markdown(st.session_state.kids_feedback_diff, unsafe_allow_html=True)
 
 # ==========================================
 # 🔘 アクションボタン
@@ -404,12 +416,14 @@ with col_b1:
     if st.button("🤖 はつおん\nチェック", use_container_width=True):
         if kids_audio:
             with st.spinner("判定中..."):
-                user_spoken = get_transcription(kids_audio.getvalue())
-                judge_prompt = f"お手本:「{data['hint_en']}」\n子供の発音:「{user_spoken}」\n【絶対ルール】相手は6歳の子供。記号や大文字小文字の違いは絶対無視して、英単語が完全一致か判定。完全一致：「パーフェクト！すごい！」不一致：褒めずに「おしい！『〇〇』っていってみてね！」と優しくひらがなで。"
-                judge_model = genai.GenerativeModel("gemini-2.5-flash")
-                judge_res = judge_model.generate_content(judge_prompt)
-                st.session_state.kids_feedback = f"🎤 きみ: **{user_spoken}**\n\n🌟 AI: **{judge_res.text.strip()}**"
-                st.rerun()
+                spec = st.session_state.get("kids_spec")
+                if spec and spec.key == hash(kids_audio.getvalue()): user_spoken = spec.transcript.result()
+                else: user_spoken = get_transcription(kids_audio.getvalue())
+            # 🎯 たんごが あっているかは、AIに きかずに その場で しらべる
+            result = judge(data['hint_en'], user_spoken)
+            st.session_state.kids_feedback = f"🎤 きみ: **{user_spoken}**\n\n🌟 AI: **{kids_message(result)}**"
+            st.session_state.kids_feedback_diff = diff_html(result)
+            st.rerun()
         else:
             st.warning("マイクでおはなししてね！")
 
@@ -417,7 +431,13 @@ with col_b2:
     if st.button("🌟 つぎへ\nすすむ！", type="primary", use_container_width=True):
         if kids_audio:
             with st.spinner("じゅんびちゅう..."):
-                user_spoken = get_transcription(kids_audio.getvalue())
+                # 🔮 さきよみ が おてほんどおり だったら、つくっておいた つぎの しつもん を そのまま つかう
+                spec = st.session_state.get("kids_spec")
+                st.session_state.kids_spec = None
+                if spec and spec.key == hash(kids_audio.getvalue()) and spec.expected == data["hint_en"]:
+                    user_spoken, spec_turn = spec.resolve()
+                else:
+                    user_spoken, spec_turn = get_transcription(kids_audio.getvalue()), None
                 
                 turn_data = {
                     "q_en": data["ai_en"], "q_ja": data["ai_ja"], "q_ruby": data["ai_ruby"],
@@ -430,24 +450,19 @@ with col_b2:
                 st.session_state.kids_feedback = ""
                 st.session_state.last_audio_hash = None
                 
-                if len(st.session_state.kids_chat.history) > 6:
-                    kids_instruction = f"あなたは日本の子供に英語を教える優しい先生です。シチュエーション: {st.session_state.final_sit}、子供の名前: {st.session_state.child_name}\n【厳守フォーマット】XMLタグのみ。\n<ai_en>（英語の質問。1文のみ）</ai_en><ai_ja>（日本語の意味）</ai_ja><ai_ruby>（ルビ）</ai_ruby>\n<hint_en>（英語の答え）</hint_en><hint_ja>（日本語の意味）</hint_ja><hint_ruby>（ルビ）</hint_ruby>"
-                    trimmed_history = st.session_state.kids_chat.history[-6:]
-                    model = genai.GenerativeModel("gemini-2.5-flash", system_instruction=kids_instruction)
-                    st.session_state.kids_chat = model.start_chat(history=trimmed_history)
-
                 if st.session_state.kids_stamps > 0 and st.session_state.kids_stamps % 5 == 0:
+                    st.session_state.kids_chat = next_turn_chat(st.session_state.kids_chat)
                     st.session_state.pending_levelup = True
                     st.session_state.last_user_spoken = user_spoken
                     st.rerun()
+                elif spec_turn:
+                    st.session_state.kids_chat, st.session_state.kids_data, dropped = spec_turn
+                    st.session_state.kids_memory.forget(dropped)
+                    st.rerun()
                 else:
+                    st.session_state.kids_chat = next_turn_chat(st.session_state.kids_chat)
                     hint_rule = get_hint_length_rule(st.session_state.kids_level)
-                    prompt_msg = f"子供は「{user_spoken}」と言いました。\n【重要】次の展開の質問を出してください。絶対に直近と同じ質問や回答パターンにならないよう、物語を進行させてください。\n子供のヒント（<hint_en>）は【{hint_rule}】で。"
-                    next_res = st.session_state.kids_chat.send_message(prompt_msg)
-                    st.session_state.kids_data = {
-                        "ai_en": extract_tag(next_res.text, "ai_en"), "ai_ja": extract_tag(next_res.text, "ai_ja"), "ai_ruby": extract_tag(next_res.text, "ai_ruby"),
-                        "hint_en": extract_tag(next_res.text, "hint_en"), "hint_ja": extract_tag(next_res.text, "hint_ja"), "hint_ruby": extract_tag(next_res.text, "hint_ruby"),
-                    }
+                    st.session_state.kids_data = kids_turn(st.session_state.kids_chat, next_turn_prompt(user_spoken, hint_rule), "turn")
                     st.rerun()
         else:
             st.warning("マイクでおはなししてね！")
@@ -458,11 +473,8 @@ with col_b3:
             st.session_state.kids_feedback = ""
             st.session_state.last_audio_hash = None
             hint_rule = get_hint_length_rule(st.session_state.kids_level)
-            next_res = st.session_state.kids_chat.send_message(f"子供がパスしました。優しく励まして、さっきとは違う展開の質問をしてください。\n子供のヒントは【{hint_rule}】で。")
-            st.session_state.kids_data = {
-                "ai_en": extract_tag(next_res.text, "ai_en"), "ai_ja": extract_tag(next_res.text, "ai_ja"), "ai_ruby": extract_tag(next_res.text, "ai_ruby"),
-                "hint_en": extract_tag(next_res.text, "hint_en"), "hint_ja": extract_tag(next_res.text, "hint_ja"), "hint_ruby": extract_tag(next_res.text, "hint_ruby"),
-            }
+            st.session_state.kids_chat = next_turn_chat(st.session_state.kids_chat)
+            st.session_state.kids_data = kids_turn(st.session_state.kids_chat, f"子供がパスしました。優しく励まして、さっきとは違う展開の質問をしてください。\n子供のヒントは【{hint_rule}】で。", "pass")
             st.rerun()
 
 with col_b4:
@@ -473,11 +485,8 @@ with col_b4:
                 st.session_state.kids_feedback = ""
                 st.session_state.last_audio_hash = None
                 hint_rule = get_hint_length_rule(st.session_state.kids_level)
-                next_res = st.session_state.kids_chat.send_message(f"レベルを{st.session_state.kids_level}に下げました。簡単な文にして優しく励ましてください。\n子供のヒントは【{hint_rule}】で。")
-                st.session_state.kids_data = {
-                    "ai_en": extract_tag(next_res.text, "ai_en"), "ai_ja": extract_tag(next_res.text, "ai_ja"), "ai_ruby": extract_tag(next_res.text, "ai_ruby"),
-                    "hint_en": extract_tag(next_res.text, "hint_en"), "hint_ja": extract_tag(next_res.text, "hint_ja"), "hint_ruby": extract_tag(next_res.text, "hint_ruby"),
-                }
+                st.session_state.kids_chat = next_turn_chat(st.session_state.kids_chat)
+                st.session_state.kids_data = kids_turn(st.session_state.kids_chat, f"レベルを{st.session_state.kids_level}に下げました。簡単な文にして優しく励ましてください。\n子供のヒントは【{hint_rule}】で。", "level_down")
                 st.rerun()
         else:
             st.warning("これいじょう さげられないよ！")
@@ -498,16 +507,11 @@ with st.expander("🎒 べつの おはなし に かえる（レベルは そ
         st.session_state.final_sit = change_final_sit
         st.session_state.kids_feedback = ""
         st.session_state.last_audio_hash = None
-        kids_instruction = f"あなたは、日本の子供に英語を教える優しい先生です。シチュエーション: {st.session_state.final_sit}、子供の名前: {st.session_state.child_name}\n【厳守フォーマット】XMLタグのみ。\n<ai_en>（英語の質問。1文のみ）</ai_en><ai_ja>（日本語の意味）</ai_ja><ai_ruby>（ルビ）</ai_ruby>\n<hint_en>（英語の答え）</hint_en><hint_ja>（日本語の意味）</hint_ja><hint_ruby>（ルビ）</hint_ruby>"
         with st.spinner("じゅんびちゅう..."):
-            model = genai.GenerativeModel("gemini-2.5-flash", system_instruction=kids_instruction)
-            st.session_state.kids_chat = model.start_chat(history=[])
+            st.session_state.kids_memory = ConversationMemory(feature="story_memory")
+            st.session_state.kids_chat = llm.start_chat(llm.DEFAULT_MODEL, make_kids_instruction())
             hint_rule = get_hint_length_rule(st.session_state.kids_level)
-            res = st.session_state.kids_chat.send_message(f"シチュエーションが変わりました。レベル{st.session_state.kids_level}の質問をしてください。\n子供の答えのヒント（<hint_en>）は【{hint_rule}】で作成。")
-            st.session_state.kids_data = {
-                "ai_en": extract_tag(res.text, "ai_en"), "ai_ja": extract_tag(res.text, "ai_ja"), "ai_ruby": extract_tag(res.text, "ai_ruby"),
-                "hint_en": extract_tag(res.text, "hint_en"), "hint_ja": extract_tag(res.text, "hint_ja"), "hint_ruby": extract_tag(res.text, "hint_ruby"),
-            }
+            st.session_state.kids_data = kids_turn(st.session_state.kids_chat, f"シチュエーションが変わりました。レベル{st.session_state.kids_level}の質問をしてください。\n子供の答えのヒント（hint_en）は【{hint_rule}】で作成。", "start")
             st.rerun()
 
 st.markdown("---")
@@ -1,8 +1,8 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import google.generativeai as genai
+from common import llm, usage
+from common.structured import Pair, StructuredOutputError, as_dict, generate_structured
 import json
-import re
 import uuid
 
 # === 🎨 デザイン設定（PC横画面最適化） ===
@@ -33,12 +33,15 @@ if not st.session_state.get("password_correct", False):
 # === 🔑 API設定 ===
 try:
     MY_API_KEY = st.secrets["GEMINI_API_KEY"]
-    genai.configure(api_key=MY_API_KEY.strip())
+    llm.configure(MY_API_KEY)
 except Exception:
-    st.error("⚠️ Secretsに GEMINI_API_KEY を設定してください！")
-    st.stop()
+    if not llm.FAKE_BACKEND:  # LLM_BACKEND=fake の時はキー無しでも動かせる
+        st.error("⚠️ Secretsに GEMINI_API_KEY を設定してください！")
+        st.stop()
 
+usage.set_page("typing")
 st.title("⌨️ えいごタイピングであそぼう！")
+with st.sidebar: usage.render_usage_summary()
 
 # === 💾 状態管理 ===
 if "typing_words" not in st.session_state:
@@ -74,16 +77,12 @@ with st.expander("📝 もんだいを つくる / えらぶ", expanded=not bool
         if st.button("🚀 AIでもんだいをつくる！", type="primary", use_container_width=True):
             with st.spinner("AIが作成中..."):
                 try:
-                    prompt = f"子供向け英語タイピング用。テーマ『{theme}』の英単語と日本語訳を{word_count}個、小文字JSON形式で。例: [{{'en':'dog','ja':'いぬ'}}]"
-                    model = genai.GenerativeModel("gemini-2.5-flash")
-                    res = model.generate_content(prompt)
-                    json_match = re.search(r'\[.*\]', res.text, re.DOTALL)
-                    if json_match:
-                        generated_words = json.loads(json_match.group(0))
-                        st.session_state.typing_words = generated_words
-                        st.session_state.current_problem_id = str(uuid.uuid4())
-                        st.session_state.loaded_ranking = []
-                        st.rerun()
+                    prompt = f"子供向け英語タイピング用。テーマ『{theme}』の英単語（小文字）と日本語訳を{word_count}個。"
+                    generated_words = as_dict(generate_structured(prompt, Pair, many=True, feature="words"))
+                    st.session_state.typing_words = generated_words
+                    st.session_state.current_problem_id = str(uuid.uuid4())
+                    st.session_state.loaded_ranking = []
+                    st.rerun()
                 except Exception as e:
                     st.error(f"エラー: {e}")
                     
@@ -106,19 +105,15 @@ with st.expander("📝 もんだいを つくる / えらぶ", expanded=not bool
                 with st.spinner("AIが日本語を調べています..."):
                     try:
                         words_to_translate = [t[1] for t in targets]
-                        prompt = f"子供向けアプリ用。以下の英単語の簡単な日本語訳（ひらがな多め）をJSON配列のみで返してください。 単語: [{', '.join(words_to_translate)}] 出力例: [{{\\\"en\\\":\\\"dog\\\",\\\"ja\\\":\\\"いぬ\\\"}}]"
-                        model = genai.GenerativeModel("gemini-2.5-flash")
-                        res = model.generate_content(prompt)
-                        json_match = re.search(r'\[.*\]', res.text, re.DOTALL)
-                        if json_match:
-                            translated = json.loads(json_match.group(0))
-                            trans_dict = {item["en"].lower(): item["ja"] for item in translated}
-                            for idx, en in targets:
-                                if en.lower() in trans_dict:
-                                    st.session_state.edit_words[idx]["ja"] = trans_dict[en.lower()]
-                            st.success("日本語を補完しました！")
-                        else:
-                            st.error("⚠️ AIが正しい形式で返答しませんでした。")
+                        prompt = f"子供向けアプリ用。以下の英単語の簡単な日本語訳（ひらがな多め）を返してください。 単語: [{', '.join(words_to_translate)}]"
+                        translated = generate_structured(prompt, Pair, many=True, feature="words_ja")
+                        trans_dict = {item.en.lower(): item.ja for item in translated}
+                        for idx, en in targets:
+                            if en.lower() in trans_dict:
+                                st.session_state.edit_words[idx]["ja"] = trans_dict[en.lower()]
+                        st.success("日本語を補完しました！")
+                    except StructuredOutputError:
+                        st.error("⚠️ AIが正しい形式で返答しませんでした。")
                     except Exception as e:
                         st.error(f"⚠️ 翻訳中にエラーが発生しました: {e}")
             else:
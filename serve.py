@@ -0,0 +1,9 @@
+import streamlit as st
+
+from common.media_routes import routes
+
+# === 🚀 音声の URL 配信ルート（/tts-media/...）つきで起動する ===
+# Streamlit の st.App（1.65.0 で確認）に routes を渡して足す。起動は
+#   streamlit run serve.py
+# streamlit run app.py でも動くが、ルートが無いので音声は従来の st.audio で配る。
+app = st.App("app.py", routes=routes())
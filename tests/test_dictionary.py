@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.dictionary import BUNDLED_PATH, Dictionary, build_index, lemma_candidates
+
+# === 📕 内蔵辞書：活用形を原形に戻す時の取り違え（見出し語がたまたま短い別の単語と同じ形になるもの） ===
+
+@pytest.fixture(scope="module")
+def dictionary(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("dictionary") / "en_ja.idx")
+    build_index([BUNDLED_PATH], path)
+    return Dictionary(path)
+
+@pytest.mark.parametrize("word, wrong", [
+    ("cares", "car"), ("cared", "car"), ("caring", "car"), ("notes", "not"), ("ones", "on"), ("toes", "to"),
+    ("seed", "see"), ("shed", "she"), ("weed", "we"), ("butter", "but"), ("manner", "man"), ("bitter", "bit"),
+    ("its", "it"), ("homely", "home"), ("timely", "time"), ("bodily", "body"),
+])
+def test_no_false_inflection(dictionary, word, wrong):
+    entry = dictionary.lookup(word)
+    assert entry is None or entry[0] != wrong
+
+@pytest.mark.parametrize("word, head", [
+    ("cares", "care"), ("caring", "care"), ("notes", "note"), ("went", "go"), ("studies", "study"),
+    ("stopped", "stop"), ("running", "run"), ("played", "play"), ("boxes", "box"), ("making", "make"),
+])
+def test_inflections_still_found(dictionary, word, head):
+    assert dictionary.lookup(word)[0] == head
+
+def test_plus_e_stem_comes_first():
+    candidates = list(lemma_candidates("cares"))
+    assert candidates.index("care") < candidates.index("car")
+
+def test_unknown_surface_falls_back_to_llm(dictionary):
+    # そのままの形が無く、原形も安全に決められない → None（呼び出し側が LLM に聞く）
+    for word in ["butter", "homely", "weed"]:
+        assert dictionary.lookup(word) is None or dictionary.lookup(word)[0] == word
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.mp3 import audio_frames, concat_mp3, duration, parse_header, slice_mp3
+
+# === 🎵 MP3 のフレーム単位の連結・切り出し（edge-tts と同じ MPEG-2 Layer III / 24kHz / 48kbps の固定ビットレート） ===
+
+HEADER = bytes.fromhex("fff364c4")
+FRAME_BYTES = 144
+FRAME_SECONDS = 576 / 24000
+
+def stream(n, first=0):
+    # フレームごとに中身を変えておく（どのフレームが残ったか後で分かるように）
+    return b"".join(HEADER + bytes([(first + i) % 256]) * (FRAME_BYTES - 4) for i in range(n))
+
+def frame_ids(data):
+    assert len(data) % FRAME_BYTES == 0
+    frames = [data[i:i + FRAME_BYTES] for i in range(0, len(data), FRAME_BYTES)]
+    assert all(frame.startswith(HEADER) for frame in frames)
+    return [frame[4] for frame in frames]
+
+def test_header():
+    assert parse_header(HEADER + b"\x00" * 140, 0) == (FRAME_BYTES, 24000, 576)
+    assert parse_header(b"\x00" * 144, 0) is None
+
+def test_duration():
+    assert abs(duration(stream(100)) - 100 * FRAME_SECONDS) < 1e-9
+
+def test_concat_keeps_frame_order():
+    assert frame_ids(concat_mp3([stream(3), stream(2, first=3)])) == [0, 1, 2, 3, 4]
+
+def test_concat_drops_id3_info_frame_and_garbage():
+    id3 = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"\x00" * 5
+    info = HEADER + b"Info" + b"\x00" * (FRAME_BYTES - 8)
+    part = id3 + info + stream(2) + b"\x12\x34garbage" + stream(2, first=2)
+    assert frame_ids(concat_mp3([part, b"", None])) == [0, 1, 2, 3]
+
+def test_concat_drops_truncated_last_frame():
+    assert frame_ids(concat_mp3([stream(3)[:-10]])) == [0, 1]
+
+def test_slice_is_frame_aligned():
+    # [0.5, 1.0] 秒にかかるフレーム：20番（0.480〜0.504秒）から 41番（0.984〜1.008秒）まで
+    clip = slice_mp3(stream(100), 0.5, 1.0)
+    assert frame_ids(clip) == list(range(20, 42))
+    assert len(audio_frames(clip)) == 22
+
+def test_slice_on_frame_boundaries():
+    # ちょうど境目の時刻は、その前後のフレームを余分に含めない
+    assert frame_ids(slice_mp3(stream(100), 10 * FRAME_SECONDS, 20 * FRAME_SECONDS)) == list(range(10, 20))
+
+def test_slice_out_of_range():
+    assert slice_mp3(stream(10), 5.0, 6.0) == b""
+    assert frame_ids(slice_mp3(stream(10), 0.0, 99.0)) == list(range(10))
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import tts
+from common.tts import locate_spans, slice_tts_clips
+
+# === ✂️ 全文の音声から、チャンクごとの音声を単語の時刻で切り出す ===
+
+def timeline(text, gap=0.1, length=0.3):
+    # [開始秒, 終了秒, 単語]。単語の間は gap 秒あける
+    words, t = [], 0.0
+    for word in text.split():
+        words.append([t, t + length, word])
+        t += length + gap
+    return words
+
+def test_spans_in_order():
+    words = timeline("Hello there. How are you?")
+    assert locate_spans(words, ["Hello there.", "How are you?"]) == [(0, 1), (2, 4)]
+
+def test_spans_with_repeated_words():
+    # 同じ単語が何度も出ても、前のチャンクの続きから探す
+    words = timeline("I said no. No, I said yes. I said no again.")
+    pieces = ["I said no.", "No, I said yes.", "I said no again."]
+    assert locate_spans(words, pieces) == [(0, 2), (3, 6), (7, 10)]
+
+def test_spans_piece_ending_in_repeated_word():
+    # チャンクの最後の単語がすぐ後にもう一度出ても、チャンクの長さから見込んだ位置のものを取る（後ろまで伸ばさない）
+    words = timeline("the cat saw the dog the end")
+    assert locate_spans(words, ["the cat saw the", "dog the end"]) == [(0, 3), (4, 6)]
+
+def test_spans_when_speech_has_extra_words():
+    # 読み上げの単語数がチャンクと違う時（$5 → five dollars）は、少し先の最後の単語まで
+    words = timeline("It costs five dollars today. See you.")
+    assert locate_spans(words, ["It costs $5 today.", "See you."]) == [(0, 4), (5, 6)]
+
+def test_spans_skip_missing_and_empty_pieces():
+    words = timeline("Good morning everyone.")
+    assert locate_spans(words, ["Good morning everyone.", "", "Extra text."]) == [(0, 2), None, None]
+
+@pytest.fixture
+def cut(monkeypatch):
+    # slice_tts_clips が切り出しに渡す (開始秒, 終了秒) を記録する
+    def install(words):
+        calls = []
+        monkeypatch.setattr(tts, "get_tts_timeline", lambda text, voice, rate: (b"audio", words))
+        monkeypatch.setattr(tts, "slice_mp3", lambda audio, start, end: calls.append((round(start, 6), round(end, 6))) or b"clip")
+        return calls
+    return install
+
+def test_padding_with_room(cut):
+    calls = cut([[0.0, 0.5, "Hello"], [0.55, 0.9, "there."], [1.5, 1.8, "How"], [1.8, 2.0, "are"], [2.1, 2.4, "you?"]])
+    assert slice_tts_clips("", ["Hello there.", "How are you?"], pad=0.15) == [b"clip", b"clip"]
+    # 1つ目：頭は 0 秒より前に出ない、後ろは 0.15 秒足す。2つ目：前に 0.15 秒、最後のチャンクの後ろにも 0.15 秒
+    assert calls == [(0.0, 1.05), (1.35, 2.55)]
+
+def test_padding_clamped_by_neighbours(cut):
+    # 単語の間が余白より短い時は、隣の単語にかからないところで止める
+    calls = cut([[0.0, 0.5, "Hello"], [0.55, 0.9, "there."], [0.95, 1.2, "How"], [1.25, 1.4, "are"], [1.45, 1.7, "you?"]])
+    slice_tts_clips("", ["Hello there.", "How are you?"], pad=0.15)
+    assert calls == [(0.0, 0.95), (0.9, 1.85)]
+
+def test_unmatched_piece_is_none(cut):
+    calls = cut([[0.0, 0.5, "Hello"], [0.55, 0.9, "there."]])
+    assert slice_tts_clips("", ["Hello there.", "Goodbye."], pad=0.15) == [b"clip", None]
+    assert len(calls) == 1